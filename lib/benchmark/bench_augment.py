@@ -0,0 +1,56 @@
+"""Compares the throughput of per-item and batched augmentation on the FSDD test recordings.
+
+Usage::
+
+    python lib/benchmark/bench_augment.py [--path lib/test/data/v1.0.10] [--batch-size 32] [--repeats 3]
+"""
+
+import argparse, glob, os, torch
+from torchfsdd import TorchFSDD, Augment, TimeShift, Gain, AddNoise, SpeedPerturb, TimeMask
+from timing import timeit
+
+def augmentations():
+    return Augment([TimeShift(max_shift=400), Gain(), AddNoise(p=0.5), SpeedPerturb(), TimeMask(max_width=400)], seed=0)
+
+def per_item(recordings):
+    augment = augmentations()
+    return [augment(x, index=i) for i, x in enumerate(recordings)]
+
+def batched(recordings, batch_size):
+    from torchfsdd.batching import transform_batch
+    augment = augmentations()
+    outputs = []
+    for start in range(0, len(recordings), batch_size):
+        indices = list(range(start, min(start + batch_size, len(recordings))))
+        outputs.extend(transform_batch(recordings[start:start + batch_size], augment, indices=indices))
+    return outputs
+
+def run(path='lib/test/data/v1.0.10', batch_size=32, repeats=3):
+    """Runs the benchmark and returns the throughput (items per second) of each method."""
+    fsdd = TorchFSDD(sorted(glob.glob(os.path.join(path, '*.wav'))), load_all=True)
+    recordings = [fsdd[i][0] for i in range(len(fsdd))]
+    n = len(recordings)
+
+    t_item = timeit(lambda: per_item(recordings), repeats)
+    t_batch = timeit(lambda: batched(recordings, batch_size), repeats)
+    return {
+        'n_recordings': n,
+        'batch_size': batch_size,
+        'per_item_items_per_s': n / t_item,
+        'batched_items_per_s': n / t_batch,
+        'speedup': t_item / t_batch
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--path', default='lib/test/data/v1.0.10')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--threads', type=int, default=1)
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    results = run(args.path, args.batch_size, args.repeats)
+    print(f"{results['n_recordings']} recordings, TimeShift + Gain + AddNoise + SpeedPerturb + TimeMask (batch size {results['batch_size']})")
+    print(f"  per-item: {results['per_item_items_per_s']:10.1f} items/s")
+    print(f"  batched:  {results['batched_items_per_s']:10.1f} items/s ({results['speedup']:.2f}x)")
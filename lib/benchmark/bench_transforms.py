@@ -0,0 +1,61 @@
+"""Compares the throughput of per-item, batched and fused (:class:`TrimMFCC`) transformations on the FSDD test recordings.
+
+Usage::
+
+    python lib/benchmark/bench_transforms.py [--path lib/test/data/v1.0.10] [--batch-size 32] [--repeats 3]
+"""
+
+import argparse, glob, os, torch
+from torchaudio.transforms import MFCC
+from torchvision.transforms import Compose
+from torchfsdd import TorchFSDD, TrimSilence, TrimMFCC, Batched, BatchCompose
+from timing import timeit
+
+def per_item(recordings, threshold, n_mfcc):
+    transforms = Compose([TrimSilence(threshold=threshold), MFCC(sample_rate=8e3, n_mfcc=n_mfcc)])
+    return [transforms(x) for x in recordings]
+
+def batched(recordings, threshold, n_mfcc, batch_size, fused=False):
+    from torchfsdd.batching import transform_batch
+    if fused:
+        transforms = TrimMFCC(threshold=threshold, sample_rate=8000, n_mfcc=n_mfcc)
+    else:
+        transforms = BatchCompose([TrimSilence(threshold=threshold), Batched(MFCC(sample_rate=8e3, n_mfcc=n_mfcc))])
+    outputs = []
+    for start in range(0, len(recordings), batch_size):
+        outputs.extend(transform_batch(recordings[start:start + batch_size], transforms))
+    return outputs
+
+def run(path='lib/test/data/v1.0.10', batch_size=32, repeats=3, threshold=0.05, n_mfcc=13):
+    """Runs the benchmark and returns the throughput (items per second) of each method."""
+    fsdd = TorchFSDD(sorted(glob.glob(os.path.join(path, '*.wav'))), load_all=True)
+    recordings = [fsdd[i][0] for i in range(len(fsdd))]
+    n = len(recordings)
+
+    t_item = timeit(lambda: per_item(recordings, threshold, n_mfcc), repeats)
+    t_batch = timeit(lambda: batched(recordings, threshold, n_mfcc, batch_size), repeats)
+    t_fused = timeit(lambda: batched(recordings, threshold, n_mfcc, batch_size, fused=True), repeats)
+    return {
+        'n_recordings': n,
+        'batch_size': batch_size,
+        'per_item_items_per_s': n / t_item,
+        'batched_items_per_s': n / t_batch,
+        'fused_items_per_s': n / t_fused,
+        'speedup': t_item / t_batch,
+        'fused_speedup': t_item / t_fused
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--path', default='lib/test/data/v1.0.10')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--threads', type=int, default=1)
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    results = run(args.path, args.batch_size, args.repeats)
+    print(f"{results['n_recordings']} recordings, TrimSilence + MFCC (batch size {results['batch_size']})")
+    print(f"  per-item: {results['per_item_items_per_s']:10.1f} items/s")
+    print(f"  batched:  {results['batched_items_per_s']:10.1f} items/s ({results['speedup']:.2f}x)")
+    print(f"  fused:    {results['fused_items_per_s']:10.1f} items/s ({results['fused_speedup']:.2f}x)")
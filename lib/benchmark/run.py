@@ -0,0 +1,191 @@
+"""Runs the TorchFSDD benchmark suite on local recordings and writes the results as JSON.
+
+The suite does not require network access, and by default uses the test recordings in ``lib/test/data/v1.0.10``.
+Results of different releases (or commits) can be compared with ``--compare``.
+
+Usage::
+
+    python lib/benchmark/run.py [--path lib/test/data/v1.0.10] [--output results.json] [--repeats 3]
+                                [--only generator splits ...] [--num-workers 0 2 4] [--batch-sizes 16 64]
+                                [--compare baseline.json]
+"""
+
+import argparse, glob, json, os, sys, time, platform, datetime, subprocess, numpy as np, torch, torchaudio
+from torch.utils.data import DataLoader
+import torchfsdd
+from torchfsdd import TorchFSDD, TorchFSDDGenerator, TrimSilence, collate_padded
+from timing import timeit, latencies
+
+FORMAT_VERSION = 1
+
+def bench_generator(options):
+    seconds = timeit(lambda: TorchFSDDGenerator(version='local', path=options.path), options.repeats)
+    return {'seconds': seconds}
+
+def bench_splits(options):
+    fsdd = TorchFSDDGenerator(version='local', path=options.path)
+    fsdd.full()
+    return {
+        'full_seconds': timeit(fsdd.full, options.repeats),
+        'train_test_split_seconds': timeit(fsdd.train_test_split, options.repeats),
+        'train_val_test_split_seconds': timeit(fsdd.train_val_test_split, options.repeats),
+        'kfold_seconds': timeit(lambda: list(fsdd.kfold(n_splits=5)), options.repeats),
+        'select_seconds': timeit(lambda: fsdd.select(digits=[0, 1, 2], rec_nums=range(10)), options.repeats)
+    }
+
+def bench_getitem(options):
+    files = sorted(glob.glob(os.path.join(options.path, '*.wav')))
+    n = min(options.n_items, len(files))
+    lazy = TorchFSDD(files)
+    start = time.perf_counter()
+    eager = TorchFSDD(files, load_all=True)
+    load_seconds = time.perf_counter() - start
+    return {
+        'n_items': n,
+        'lazy': latencies(lazy.__getitem__, n),
+        'load_all': dict(latencies(eager.__getitem__, n), load_seconds=load_seconds)
+    }
+
+def bench_trim_silence(options):
+    files = sorted(glob.glob(os.path.join(options.path, '*.wav')))
+    fsdd = TorchFSDD(files, load_all=True)
+    recordings = [fsdd[i][0] for i in range(len(fsdd))]
+    n_samples = sum(len(x) for x in recordings)
+    trim = TrimSilence(threshold=options.threshold)
+    seconds = timeit(lambda: [trim(x) for x in recordings], options.repeats)
+    return {
+        'n_items': len(recordings),
+        'items_per_s': len(recordings) / seconds,
+        'samples_per_s': n_samples / seconds
+    }
+
+def bench_dataloader(options):
+    fsdd = TorchFSDDGenerator(version='local', path=options.path, transforms=TrimSilence(threshold=options.threshold))
+    dataset = fsdd.full()
+    results = []
+    for num_workers in options.num_workers:
+        for batch_size in options.batch_sizes:
+            loader = DataLoader(dataset, batch_size=batch_size, shuffle=True, num_workers=num_workers, collate_fn=collate_padded,
+                generator=torch.Generator().manual_seed(0))
+            seconds = timeit(lambda: sum(1 for _ in loader), options.repeats)
+            results.append({
+                'num_workers': num_workers,
+                'batch_size': batch_size,
+                'epoch_seconds': seconds,
+                'items_per_s': len(dataset) / seconds
+            })
+    return {'n_items': len(dataset), 'configurations': results}
+
+def bench_batches(options):
+    files = sorted(glob.glob(os.path.join(options.path, '*.wav')))
+    fsdd = TorchFSDD(files, load_all=True)
+    results = []
+    for batch_size in options.batch_sizes:
+        loader = DataLoader(fsdd, batch_size=batch_size, collate_fn=collate_padded)
+        dataloader_seconds = timeit(lambda: sum(1 for _ in loader), options.repeats)
+        batches_seconds = timeit(lambda: sum(1 for _ in fsdd.batches(batch_size)), options.repeats)
+        results.append({
+            'batch_size': batch_size,
+            'dataloader_items_per_s': len(fsdd) / dataloader_seconds,
+            'batches_items_per_s': len(fsdd) / batches_seconds
+        })
+    return {'n_items': len(fsdd), 'configurations': results}
+
+def bench_batch_transforms(options):
+    import bench_transforms
+    return bench_transforms.run(options.path, batch_size=options.batch_sizes[0], repeats=options.repeats, threshold=options.threshold)
+
+def bench_augment(options):
+    import bench_augment
+    return bench_augment.run(options.path, batch_size=options.batch_sizes[0], repeats=options.repeats)
+
+BENCHMARKS = {
+    'generator': bench_generator,
+    'splits': bench_splits,
+    'getitem': bench_getitem,
+    'trim_silence': bench_trim_silence,
+    'dataloader': bench_dataloader,
+    'batches': bench_batches,
+    'batch_transforms': bench_batch_transforms,
+    'augment': bench_augment
+}
+
+def environment():
+    """Describes the environment that the benchmarks were run in."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'torchfsdd': torchfsdd.__version__,
+        'torch': torch.__version__,
+        'torchaudio': torchaudio.__version__,
+        'numpy': np.__version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'torch_threads': torch.get_num_threads(),
+        'commit': commit,
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat()
+    }
+
+def run(options, names=None):
+    """Runs the selected benchmarks (all of them by default) and returns the results as a JSON-serializable dictionary."""
+    names = list(BENCHMARKS) if names is None else names
+    results = {}
+    for name in names:
+        print(f'Running {name}...', file=sys.stderr)
+        results[name] = BENCHMARKS[name](options)
+    return {'format_version': FORMAT_VERSION, 'environment': environment(), 'options': vars(options), 'results': results}
+
+def flatten(results, prefix=''):
+    """Flattens nested results into a dictionary of numeric metrics, keyed by dotted paths."""
+    metrics = {}
+    if isinstance(results, dict):
+        for key, value in results.items():
+            metrics.update(flatten(value, f'{prefix}{key}.'))
+    elif isinstance(results, list):
+        for item in results:
+            # Configurations are keyed by their parameters rather than their position
+            label = ','.join(f'{key}={item[key]}' for key in ('num_workers', 'batch_size') if key in item)
+            metrics.update(flatten({k: v for k, v in item.items() if k not in ('num_workers', 'batch_size')}, f'{prefix}[{label}].'))
+    elif isinstance(results, (int, float)) and not isinstance(results, bool):
+        metrics[prefix[:-1]] = results
+    return metrics
+
+def compare(baseline, current, file=sys.stdout):
+    """Prints the relative change of every metric that is present in both results."""
+    old, new = flatten(baseline['results']), flatten(current['results'])
+    for key in sorted(set(old) & set(new)):
+        if old[key] != 0:
+            print(f'{key:70s} {old[key]:14.4f} -> {new[key]:14.4f} ({(new[key] - old[key]) / abs(old[key]):+.1%})', file=file)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--path', default='lib/test/data/v1.0.10', help='Folder containing the WAV recordings.')
+    parser.add_argument('--output', default=None, help='Path of the JSON file to write (defaults to standard output).')
+    parser.add_argument('--repeats', type=int, default=3, help='Number of repeats of each timing (the minimum is reported).')
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), default=None, help='Benchmarks to run (defaults to all).')
+    parser.add_argument('--n-items', type=int, default=500, help='Number of items to measure __getitem__ latency over.')
+    parser.add_argument('--num-workers', type=int, nargs='+', default=[0, 2, 4], help='DataLoader worker counts.')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[16, 64], help='DataLoader batch sizes.')
+    parser.add_argument('--threshold', type=float, default=0.05, help='TrimSilence threshold.')
+    parser.add_argument('--threads', type=int, default=1, help='Number of PyTorch intra-op threads.')
+    parser.add_argument('--compare', default=None, help='Path of baseline results to compare against.')
+    options = parser.parse_args()
+
+    torch.set_num_threads(options.threads)
+    baseline_path, output = options.compare, options.output
+    results = run(options, options.only)
+
+    if output is None:
+        print(json.dumps(results, indent=2))
+    else:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if baseline_path is not None:
+        with open(baseline_path, 'r') as f:
+            # Keep standard output valid JSON if the results are written to it
+            compare(json.load(f), results, file=sys.stderr if output is None else sys.stdout)
@@ -0,0 +1,28 @@
+"""Timing helpers shared by the benchmark scripts."""
+
+import time, numpy as np
+
+def timeit(fn, repeats):
+    """Returns the minimum wall time (in seconds) of ``repeats`` calls of ``fn``."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def latencies(fn, n):
+    """Returns summary statistics (in milliseconds) of the wall time of ``fn(i)`` for ``i`` in ``range(n)``."""
+    times = np.zeros(n)
+    for i in range(n):
+        start = time.perf_counter()
+        fn(i)
+        times[i] = time.perf_counter() - start
+    times *= 1e3
+    return {
+        'mean_ms': float(times.mean()),
+        'p50_ms': float(np.percentile(times, 50)),
+        'p95_ms': float(np.percentile(times, 95)),
+        'max_ms': float(times.max()),
+        'items_per_s': float(n / (times.sum() / 1e3))
+    }
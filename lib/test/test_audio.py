@@ -0,0 +1,94 @@
+import glob, wave, struct, pytest, numpy as np, torch, torchaudio
+from torchfsdd import TorchFSDD, FSDDArchive, FileLoader, Normalize
+from torchfsdd.audio import read_wav, UnsupportedWavFormat
+
+files = sorted(glob.glob('lib/test/data/v1.0.10/*.wav'))
+
+def write_wav(path, data, sample_rate=8000, channels=1, bits=16):
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(channels)
+        f.setsampwidth(bits // 8)
+        f.setframerate(sample_rate)
+        f.writeframes(data)
+
+def test_read_wav():
+    x, sr = read_wav(files[0])
+    expected, expected_sr = torchaudio.load(files[0])
+    assert sr == expected_sr == 8000
+    assert x.dtype == np.float32
+    assert torch.eq(torch.from_numpy(x), expected).all()
+
+def test_read_wav_int16():
+    x, _ = read_wav(files[0], normalize=False)
+    assert x.dtype == np.int16
+    expected, _ = torchaudio.load(files[0], normalize=False)
+    assert torch.eq(torch.from_numpy(x), expected).all()
+
+def test_read_wav_stereo_8bit(tmpdir):
+    path = str(tmpdir.join('stereo.wav'))
+    write_wav(path, bytes([128, 0, 255, 128]), channels=2, bits=8)
+    x, _ = read_wav(path)
+    assert x.shape == (2, 2)
+    assert x.tolist() == [[0., 127 / 128], [-1., 0.]]
+
+def test_read_wav_unsupported(tmpdir):
+    path = str(tmpdir.join('24bit.wav'))
+    write_wav(path, struct.pack('<3B', 0, 0, 64) * 10, bits=24)
+    with pytest.raises(UnsupportedWavFormat):
+        read_wav(path)
+    with pytest.raises(UnsupportedWavFormat):
+        FileLoader([path], decoder='native')(0)
+    # The default decoder falls back to torchaudio
+    x = FileLoader([path])(0)
+    assert x.shape == (10,)
+    assert torch.allclose(x, torch.full((10,), 0.5))
+
+@pytest.mark.parametrize('decoder', ['auto', 'native', 'torchaudio'])
+def test_file_loader_decoders(decoder):
+    loader = FileLoader(files[:10], decoder=decoder)
+    for i, file in enumerate(files[:10]):
+        assert torch.eq(loader(i), torchaudio.load(file)[0].flatten()).all()
+    assert torch.eq(loader.lengths(range(10)), torch.tensor([len(loader(i)) for i in range(10)])).all()
+
+def test_file_loader_torchaudio_args():
+    # Keyword arguments such as normalize and backend are passed on to torchaudio.load
+    loader = FileLoader(files[:2], normalize=False)
+    x = loader(0)
+    assert x.dtype == torchaudio.load(files[0], normalize=False)[0].dtype != torch.float32
+    assert torch.eq(x, torchaudio.load(files[0], normalize=False)[0].flatten()).all()
+
+def test_file_loader_callable():
+    loader = FileLoader(files[:2], decoder=lambda file: torch.ones(1, 5))
+    assert torch.eq(loader(0), torch.ones(5)).all()
+
+def test_int16_dataset():
+    fsdd = TorchFSDD(files[:20], dtype=torch.int16)
+    x, _ = fsdd[0]
+    assert x.dtype == torch.int16
+    normalized, _ = TorchFSDD(files[:20])[0]
+    assert torch.eq(Normalize()(x), normalized).all()
+
+def test_int16_load_all():
+    eager = TorchFSDD(files[:20], load_all=True, dtype=torch.int16)
+    assert eager.recordings.data.dtype == torch.int16
+    assert eager.recordings.data.element_size() == 2
+    lazy = TorchFSDD(files[:20], dtype=torch.int16)
+    for i in range(20):
+        assert torch.eq(eager[i][0], lazy[i][0]).all()
+
+def test_normalize_batch():
+    x = torch.tensor([[-32768, 0, 16384], [32767, 0, 0]], dtype=torch.int16)
+    normalized, lengths = Normalize().batch(x, torch.tensor([3, 1]))
+    assert normalized.dtype == torch.float32 and lengths.tolist() == [3, 1]
+    assert normalized.tolist() == [[-1., 0., 0.5], [32767 / 32768, 0., 0.]]
+    # Floating point samples are unchanged
+    assert torch.eq(Normalize()(normalized), normalized).all()
+
+def test_int16_archive(tmpdir):
+    path = str(tmpdir.join('fsdd.bin'))
+    archive = FSDDArchive.write(path, files[:10], dtype=np.int16)
+    assert archive.dtype == np.int16
+    for i in range(10):
+        x = archive[archive.position(files[i])]
+        assert x.dtype == torch.int16
+        assert torch.eq(x, torchaudio.load(files[i], normalize=False)[0].flatten()).all()
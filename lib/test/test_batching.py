@@ -0,0 +1,69 @@
+import glob, torch
+from torch.nn.utils.rnn import pack_padded_sequence
+from torch.utils.data import DataLoader
+from torchaudio.transforms import MFCC
+from torchfsdd import TorchFSDD, BucketBatchSampler, collate_padded
+
+files = sorted(glob.glob('lib/test/data/v1.0.10/*.wav'))[:200]
+lengths = torch.randint(100, 5000, (1000,), generator=torch.Generator().manual_seed(0))
+
+def test_sampler_covers_indices():
+    sampler = BucketBatchSampler(lengths, batch_size=32)
+    batches = list(sampler)
+    assert len(batches) == len(sampler)
+    assert sorted(i for batch in batches for i in batch) == list(range(1000))
+    assert all(len(batch) <= 32 for batch in batches)
+
+def test_sampler_reduces_padding():
+    def padding(batches):
+        return sum(int(lengths[batch].max()) * len(batch) - int(lengths[batch].sum()) for batch in batches)
+    bucketed = list(BucketBatchSampler(lengths, batch_size=32, n_buckets=20))
+    random = torch.randperm(1000, generator=torch.Generator().manual_seed(0)).split(32)
+    assert padding(bucketed) < padding([batch.tolist() for batch in random]) / 4
+
+def test_sampler_drop_last():
+    sampler = BucketBatchSampler(lengths, batch_size=32, drop_last=True)
+    batches = list(sampler)
+    assert len(batches) == len(sampler)
+    assert all(len(batch) == 32 for batch in batches)
+
+def test_sampler_epochs_and_seed():
+    a, b = BucketBatchSampler(lengths, batch_size=32, seed=1), BucketBatchSampler(lengths, batch_size=32, seed=1)
+    epoch0, epoch1 = list(a), list(a)
+    assert epoch0 != epoch1
+    assert list(b) == epoch0
+    b.set_epoch(1)
+    assert list(b) == epoch1
+    assert list(BucketBatchSampler(lengths, batch_size=32, seed=2)) != epoch0
+
+def test_sampler_no_shuffle():
+    batches = list(BucketBatchSampler(lengths, batch_size=32, shuffle=False))
+    flattened = [int(lengths[i]) for batch in batches for i in batch]
+    assert flattened == sorted(flattened)
+
+def test_collate_audio():
+    batch = [(torch.ones(3), 1), (torch.ones(5), 2), (torch.ones(4), 3)]
+    x, x_lengths, y, order = collate_padded(batch)
+    assert x.shape == (3, 5)
+    assert x_lengths.tolist() == [5, 4, 3]
+    assert y.tolist() == [2, 3, 1]
+    assert order.tolist() == [1, 2, 0]
+    assert x[2, 3:].eq(0).all()
+
+def test_collate_features():
+    batch = [(torch.randn(13, 7), 0), (torch.randn(13, 9), 1)]
+    x, x_lengths, y, order = collate_padded(batch)
+    assert x.shape == (2, 9, 13)
+    assert torch.eq(x[1, :7], batch[0][0].T).all()
+    pack_padded_sequence(x, x_lengths, batch_first=True)
+
+def test_dataloader():
+    fsdd = TorchFSDD(files, transforms=MFCC(sample_rate=8e3, n_mfcc=13))
+    sampler = BucketBatchSampler(fsdd.lengths(), batch_size=16)
+    loader = DataLoader(fsdd, batch_sampler=sampler, collate_fn=collate_padded)
+    n_items = 0
+    for x, x_lengths, y, order in loader:
+        assert x.ndim == 3 and x.shape[2] == 13
+        assert x.shape[1] == x_lengths[0]
+        n_items += len(x)
+    assert n_items == len(fsdd)
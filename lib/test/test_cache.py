@@ -0,0 +1,107 @@
+import os, glob, operator, functools, pytest, torch
+from torchaudio.transforms import MFCC
+from torchvision.transforms import Compose
+from torchfsdd import TorchFSDD, TorchFSDDGenerator, TrimSilence, FeatureCache
+from torchfsdd.cache import fingerprint
+
+files = sorted(glob.glob('lib/test/data/v1.0.10/*.wav'))[:10]
+
+def test_fingerprint_deterministic():
+    a = Compose([TrimSilence(threshold=0.1), MFCC(sample_rate=8e3, n_mfcc=13)])
+    b = Compose([TrimSilence(threshold=0.1), MFCC(sample_rate=8e3, n_mfcc=13)])
+    c = Compose([TrimSilence(threshold=0.2), MFCC(sample_rate=8e3, n_mfcc=13)])
+    assert fingerprint(a) == fingerprint(b)
+    assert fingerprint(a) != fingerprint(c)
+
+def test_fingerprint_functions():
+    from torchvision.transforms import Lambda
+    assert fingerprint(lambda x: x + 1) == fingerprint(lambda x: x + 1)
+    assert fingerprint(lambda x: x + 1) != fingerprint(lambda x: x * 2)
+    assert fingerprint(Lambda(lambda x: x.abs())) != fingerprint(Lambda(lambda x: x.neg()))
+    # Closure variables, default arguments and partial arguments are part of the fingerprint
+    scale = lambda k: (lambda x: x * k)
+    assert fingerprint(scale(1)) != fingerprint(scale(2))
+    assert fingerprint(lambda x, k=1: x * k) != fingerprint(lambda x, k=2: x * k)
+    assert fingerprint(functools.partial(torch.clamp, min=0.)) != fingerprint(functools.partial(torch.clamp, min=1.))
+
+def test_cache_unfingerprintable(tmpdir):
+    with pytest.raises(TypeError):
+        fingerprint(operator.itemgetter(0))
+    with pytest.raises(TypeError):
+        TorchFSDD(files, transforms=operator.itemgetter(slice(None)), cache=FeatureCache(str(tmpdir)))
+
+def test_cache_hits_and_misses(tmpdir):
+    cache = FeatureCache(str(tmpdir))
+    fsdd = TorchFSDD(files, transforms=TrimSilence(threshold=0.1), cache=cache)
+    first = [fsdd[i] for i in range(len(fsdd))]
+    assert (cache.hits, cache.misses) == (0, len(files))
+    assert len(cache) == len(files)
+    second = [fsdd[i] for i in range(len(fsdd))]
+    assert (cache.hits, cache.misses) == (len(files), len(files))
+    for (x1, y1), (x2, y2) in zip(first, second):
+        assert torch.eq(x1, x2).all() and y1 == y2
+
+def test_cache_namespaced_by_transforms(tmpdir):
+    cache = FeatureCache(str(tmpdir))
+    TorchFSDD(files, transforms=TrimSilence(threshold=0.1), cache=cache)[0]
+    TorchFSDD(files, transforms=TrimSilence(threshold=0.2), cache=cache)[0]
+    assert cache.misses == 2
+    assert len(cache) == 2
+
+def test_cache_namespaced_by_decoder(tmpdir):
+    cache = FeatureCache(str(tmpdir))
+    TorchFSDD(files, cache=cache)[0]
+    TorchFSDD(files, cache=cache, decoder='torchaudio')[0]
+    TorchFSDD(files, cache=cache, decoder=lambda file: torch.zeros(1, 10))[0]
+    assert cache.misses == 3
+    assert len(cache) == 3
+
+def test_cache_invalidate(tmpdir):
+    cache = FeatureCache(str(tmpdir))
+    transforms = TrimSilence(threshold=0.1)
+    fsdd = TorchFSDD(files, transforms=transforms, cache=cache)
+    fsdd[0], fsdd[1]
+    TorchFSDD(files, cache=cache)[0]
+    assert len(cache) == 3
+    cache.invalidate(transforms)
+    assert len(cache) == 1
+    cache.clear()
+    assert len(cache) == 0
+    fsdd[0]
+    assert cache.misses == 4
+
+def test_cache_lru_eviction(tmpdir):
+    fsdd = TorchFSDD(files, cache=FeatureCache(str(tmpdir.join('unbounded'))))
+    for i in range(len(files)):
+        fsdd[i]
+    max_size = 2 * max(fsdd.cache._entries.values())
+    cache = FeatureCache(str(tmpdir.join('bounded')), max_size=max_size)
+    fsdd = TorchFSDD(files, cache=cache)
+    for i in range(len(files)):
+        fsdd[i]
+    assert cache.evictions > 0
+    assert 0 < len(cache) < len(files)
+    assert cache.size <= max_size
+
+    # The most recently used item is never evicted
+    key = cache.key(files[-1], fsdd._namespace)
+    assert os.path.isfile(key)
+
+def test_cache_shared_size_cap(tmpdir):
+    fsdd = TorchFSDD(files, cache=FeatureCache(str(tmpdir.join('unbounded'))))
+    for i in range(len(files)):
+        fsdd[i]
+    max_size = 3 * max(fsdd.cache._entries.values())
+    # Separate instances sharing a directory, as in DataLoader worker processes, enforce a single cap
+    path = str(tmpdir.join('bounded'))
+    caches = [FeatureCache(path, max_size=max_size), FeatureCache(path, max_size=max_size)]
+    datasets = [TorchFSDD(files, cache=cache) for cache in caches]
+    for i in range(len(files)):
+        datasets[i % 2][i]
+    assert sum(cache.evictions for cache in caches) > 0
+    assert sum(os.path.getsize(file) for file in glob.glob(os.path.join(path, '*', '*.pt'))) <= max_size
+
+def test_generator_cache_path(tmpdir):
+    fsdd = TorchFSDDGenerator(version='local', path='lib/test/data/v1.0.10', cache=str(tmpdir))
+    assert isinstance(fsdd.cache, FeatureCache)
+    assert fsdd.full().cache is fsdd.cache
@@ -1,7 +1,7 @@
-import os, shutil, pytest, glob, torch
+import os, shutil, asyncio, threading, pytest, glob, numpy as np, torch
 from torchaudio.transforms import MFCC
 from torchvision.transforms import Compose
-from torchfsdd import TorchFSDD, TorchFSDDGenerator, TrimSilence
+from torchfsdd import TorchFSDD, TorchFSDDGenerator, TrimSilence, PackedRecordings, collate_padded
 
 def fetch_rec_num(file):
     name = os.path.splitext(os.path.basename(file))[0]
@@ -292,10 +292,187 @@ def test_dataset_load_all_true():
     files = glob.glob('lib/test/data/v1.0.10/*.wav')
     fsdd = TorchFSDD(files, load_all=True)
     assert hasattr(fsdd, 'recordings')
-    assert isinstance(fsdd.recordings, list)
+    assert isinstance(fsdd.recordings, PackedRecordings)
     assert isinstance(fsdd.recordings[0], torch.Tensor)
     assert len(fsdd.recordings) == len(files)
     assert hasattr(fsdd, 'labels')
-    assert isinstance(fsdd.labels, list)
-    assert isinstance(fsdd.labels[0], int)
+    assert isinstance(fsdd.labels, torch.Tensor)
+    assert fsdd.labels.dtype == torch.int8
     assert len(fsdd.labels) == len(files)
+
+def test_dataset_load_all_packed():
+    files = sorted(glob.glob('lib/test/data/v1.0.10/*.wav'))[:20]
+    lazy, packed = TorchFSDD(files), TorchFSDD(files, load_all=True)
+    assert fsdd_storage_is_shared(packed)
+    for i in range(len(files)):
+        (x_lazy, y_lazy), (x_packed, y_packed) = lazy[i], packed[i]
+        assert torch.eq(x_lazy, x_packed).all()
+        assert isinstance(y_packed, int) and y_lazy == y_packed
+
+def fsdd_storage_is_shared(fsdd):
+    ptr = fsdd.recordings.data.data_ptr()
+    size = fsdd.recordings.data.element_size()
+    return all(x.data_ptr() == ptr + size * int(offset) for x, offset in zip(fsdd.recordings, fsdd.recordings.offsets))
+
+def test_dataset_load_all_num_workers():
+    files = sorted(glob.glob('lib/test/data/v1.0.10/*.wav'))[:50]
+    serial, parallel = TorchFSDD(files, load_all=True), TorchFSDD(files, load_all=True, num_workers=4)
+    assert torch.eq(serial.recordings.offsets, parallel.recordings.offsets).all()
+    assert torch.eq(serial.recordings.data, parallel.recordings.data).all()
+    assert torch.eq(serial.labels, parallel.labels).all()
+    assert parallel.load_time > 0
+
+def test_dataset_load_all_errors():
+    files = sorted(glob.glob('lib/test/data/v1.0.10/*.wav'))[:5] + ['lib/test/data/v1.0.10/missing.wav']
+    with pytest.raises(RuntimeError) as e:
+        TorchFSDD(files, load_all=True, num_workers=2)
+    assert 'missing.wav' in str(e.value)
+
+def test_generator_num_workers():
+    fsdd = TorchFSDDGenerator(version='local', path='lib/test/data/v1.0.10', load_all=True, num_workers=4)
+    train, test = fsdd.train_test_split(test_size=0.5)
+    assert len(train) == len(test) == 1500
+    assert train.recordings is test.recordings
+    assert len(train.recordings) == 3000
+
+def test_dataset_lengths():
+    files = sorted(glob.glob('lib/test/data/v1.0.10/*.wav'))[:20]
+    lazy, packed = TorchFSDD(files), TorchFSDD(files, load_all=True)
+    expected = [len(lazy[i][0]) for i in range(len(files))]
+    assert lazy.lengths().tolist() == expected
+    assert packed.lengths().tolist() == expected
+
+def test_dataset_subset():
+    files = sorted(glob.glob('lib/test/data/v1.0.10/*.wav'))[:20]
+    for load_all in (False, True):
+        fsdd = TorchFSDD(files, load_all=load_all)
+        subset = fsdd.subset([3, 5, 7, 9])
+        assert len(subset) == 4
+        assert subset.files == [files[i] for i in (3, 5, 7, 9)]
+        nested = subset.subset([1, 3])
+        assert nested.files == [files[5], files[9]]
+        x, y = nested[1]
+        x_expected, y_expected = fsdd[9]
+        assert torch.eq(x, x_expected).all() and y == y_expected
+        assert nested.lengths().tolist() == fsdd.lengths()[[5, 9]].tolist()
+        assert len(fsdd) == 20
+
+def test_dataset_batch_transforms():
+    from torchfsdd import Batched, BatchCompose, TransformCollate
+    files = sorted(glob.glob('lib/test/data/v1.0.10/*.wav'))[:16]
+    transforms = BatchCompose([TrimSilence(threshold=0.05), Batched(MFCC(sample_rate=8e3, n_mfcc=13))])
+    fsdd = TorchFSDD(files, batch_transforms=transforms)
+    items = fsdd.__getitems__(list(range(16)))
+    assert len(items) == 16
+    for i, (x, y) in enumerate(items):
+        x_single, y_single = fsdd[i]
+        assert x.shape == x_single.shape and x.shape[0] == 13
+        assert y == y_single
+
+    loader = torch.utils.data.DataLoader(TorchFSDD(files), batch_size=8, collate_fn=TransformCollate(transforms))
+    x, lengths, y, order = next(iter(loader))
+    assert x.shape[0] == 8 and x.shape[2] == 13
+
+def test_dataset_mixed_loading_modes():
+    files = sorted(glob.glob('lib/test/data/v1.0.10/*.wav'))[:10]
+    packed = TorchFSDD(files[:5], load_all=True)
+    lazy = TorchFSDD(files[5:], load_all=False)
+    assert not hasattr(lazy, 'recordings')
+    assert len(packed) == len(lazy) == 5
+    x_packed, _ = packed[0]
+    x_lazy, _ = lazy[0]
+    assert torch.eq(x_packed, TorchFSDD(files[:1])[0][0]).all()
+    assert torch.eq(x_lazy, TorchFSDD(files[5:6])[0][0]).all()
+
+def test_dataset_pickle():
+    import pickle
+    files = sorted(glob.glob('lib/test/data/v1.0.10/*.wav'))[:10]
+    for load_all in (False, True):
+        fsdd = TorchFSDD(files, transforms=TrimSilence(threshold=0.1), load_all=load_all).subset([2, 4, 6])
+        restored = pickle.loads(pickle.dumps(fsdd))
+        assert len(restored) == 3
+        for i in range(3):
+            assert torch.eq(restored[i][0], fsdd[i][0]).all()
+            assert restored[i][1] == fsdd[i][1]
+
+def test_dataset_spawn_workers():
+    files = sorted(glob.glob('lib/test/data/v1.0.10/*.wav'))[:8]
+    for load_all in (False, True):
+        fsdd = TorchFSDD(files, load_all=load_all)
+        loader = torch.utils.data.DataLoader(fsdd, batch_size=1, num_workers=2, multiprocessing_context='spawn')
+        labels = [int(y) for _, y in loader]
+        assert labels == [fsdd[i][1] for i in range(len(fsdd))]
+
+def run_async(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+
+def test_aget():
+    files = sorted(glob.glob('lib/test/data/v1.0.10/*.wav'))[:10]
+    fsdd = TorchFSDD(files)
+    async def fetch():
+        return await asyncio.gather(*[fsdd.aget(i) for i in range(10)])
+    for i, (x, y) in enumerate(run_async(fetch())):
+        expected, label = fsdd[i]
+        assert torch.eq(x, expected).all() and y == label
+
+def test_abatches():
+    files = sorted(glob.glob('lib/test/data/v1.0.10/*.wav'))[:25]
+    fsdd = TorchFSDD(files, transforms=TrimSilence(threshold=0.05))
+    indices = list(reversed(range(25)))
+    async def iterate(**kwargs):
+        return [batch async for batch in fsdd.abatches(**kwargs)]
+    batches = run_async(iterate(batch_size=4, indices=indices, prefetch=3))
+    assert [len(batch) for batch in batches] == [4] * 6 + [1]
+    items = [item for batch in batches for item in batch]
+    for index, (x, y) in zip(indices, items):
+        assert torch.eq(x, fsdd[index][0]).all() and y == fsdd[index][1]
+    # Batches can be collated in the loading threads
+    batches = run_async(iterate(batch_size=10, collate_fn=collate_padded, max_workers=1))
+    assert [x.shape[0] for x, _, _, _ in batches] == [10, 10, 5]
+
+def test_abatches_early_exit():
+    fsdd = TorchFSDD(sorted(glob.glob('lib/test/data/v1.0.10/*.wav'))[:50])
+    async def first():
+        async for batch in fsdd.abatches(batch_size=5, prefetch=4):
+            return batch
+    assert len(run_async(first())) == 5
+
+def test_batches():
+    files = sorted(glob.glob('lib/test/data/v1.0.10/*.wav'))[:30]
+    indices = np.random.default_rng(0).permutation(25)
+    for load_all in (False, True):
+        fsdd = TorchFSDD(files, load_all=load_all).subset(range(5, 30))
+        batches = list(fsdd.batches(8, indices=indices, prefetch=2))
+        assert [len(x) for x, _, _, _ in batches] == [8, 8, 8, 1]
+        for start, batch in zip(range(0, 25, 8), batches):
+            expected = collate_padded(fsdd.__getitems__(indices[start:start + 8].tolist()))
+            for tensor, expected_tensor in zip(batch, expected):
+                assert tensor.shape == expected_tensor.shape and torch.eq(tensor, expected_tensor).all()
+        assert len(list(fsdd.batches(8, drop_last=True))) == 3
+
+def test_batches_batch_transforms():
+    from torchfsdd import Batched, BatchCompose
+    files = sorted(glob.glob('lib/test/data/v1.0.10/*.wav'))[:20]
+    transforms = BatchCompose([TrimSilence(threshold=0.05), Batched(MFCC(sample_rate=8e3, n_mfcc=13))])
+    fsdd = TorchFSDD(files, load_all=True, batch_transforms=transforms)
+    for start, (x, lengths, y, order) in zip(range(0, 20, 10), fsdd.batches(10)):
+        assert x.shape[0] == 10 and x.shape[2] == 13 and x.shape[1] == lengths[0]
+        items = fsdd.__getitems__(list(range(start, start + 10)))
+        for i, position in enumerate(order.tolist()):
+            expected, label = items[position]
+            assert lengths[i] == expected.shape[1] and y[i] == label
+            assert torch.allclose(x[i, :lengths[i]], expected.T, atol=1e-4)
+            assert (x[i, lengths[i]:] == 0).all()
+
+def test_batches_early_exit():
+    fsdd = TorchFSDD(sorted(glob.glob('lib/test/data/v1.0.10/*.wav'))[:50], load_all=True)
+    batches = fsdd.batches(5, prefetch=1)
+    x, lengths, y, order = next(batches)
+    batches.close()
+    assert x.shape[0] == 5
+    assert not any(thread.name == 'TorchFSDD.batches' for thread in threading.enumerate())
@@ -0,0 +1,86 @@
+import os, glob, pickle, pytest, torch
+from torchaudio.transforms import MFCC
+from torchvision.transforms import Compose
+from torchfsdd import TorchFSDD, TorchFSDDGenerator, TrimSilence, FeatureShards, MetadataIndex
+
+files = sorted(glob.glob('lib/test/data/v1.0.10/*.wav'))[:50]
+transforms = Compose([TrimSilence(threshold=1e-6), MFCC(sample_rate=8e3, n_mfcc=13)])
+
+@pytest.fixture
+def shards(tmpdir):
+    dataset = TorchFSDD(files, transforms=transforms)
+    return FeatureShards.write(str(tmpdir.join('features')), dataset, MetadataIndex.build(files), shard_size=16)
+
+def test_write(shards):
+    assert len(shards) == 50
+    assert shards.feature_shape == (13,)
+    assert len(glob.glob(os.path.join(shards.path, 'shard-*.npy'))) == 4
+    assert shards.files == [os.path.basename(file) for file in files]
+    dataset = TorchFSDD(files, transforms=transforms)
+    for i in range(len(shards)):
+        x, y = dataset[i]
+        assert shards[i].shape == x.shape
+        assert torch.allclose(shards[i], x)
+        assert shards.labels[i] == y
+    assert shards.lengths.tolist() == [dataset[i][0].shape[-1] for i in range(len(dataset))]
+
+def test_write_parallel(tmpdir, shards):
+    dataset = TorchFSDD(files, transforms=transforms)
+    parallel = FeatureShards.write(str(tmpdir.join('parallel')), dataset, MetadataIndex.build(files), shard_size=16, num_workers=4)
+    for i in range(len(shards)):
+        assert torch.equal(parallel[i], shards[i])
+
+def test_raw_audio(tmpdir):
+    dataset = TorchFSDD(files[:5])
+    shards = FeatureShards.write(str(tmpdir.join('audio')), dataset, MetadataIndex.build(files[:5]))
+    assert shards.feature_shape == ()
+    for i in range(5):
+        assert torch.equal(shards[i], dataset[i][0])
+
+def test_in_memory_and_pickle(shards):
+    in_memory = FeatureShards(shards.path, mmap=False)
+    assert torch.equal(in_memory[-1], shards[-1])
+    restored = pickle.loads(pickle.dumps(shards))
+    assert torch.equal(restored[3], shards[3])
+
+def test_invalid(tmpdir):
+    with pytest.raises(ValueError):
+        FeatureShards(str(tmpdir))
+
+def test_write_empty(tmpdir):
+    with pytest.raises(ValueError):
+        FeatureShards.write(str(tmpdir.join('empty')), TorchFSDD([]), MetadataIndex.build([]))
+    assert not tmpdir.join('empty').exists()
+
+def test_transforms_fingerprint(tmpdir):
+    from torchvision.transforms import Lambda
+    fingerprints = []
+    for transform in (Lambda(lambda x: x.abs()), Lambda(lambda x: x.neg())):
+        dataset = TorchFSDD(files[:2], transforms=Compose([transform, MFCC(sample_rate=8e3, n_mfcc=13)]))
+        fingerprints.append(FeatureShards.write(str(tmpdir.join('features')), dataset, MetadataIndex.build(files[:2])).transforms)
+    assert fingerprints[0] != fingerprints[1]
+
+def test_generator_features(tmpdir):
+    fsdd = TorchFSDDGenerator(version='local', path='lib/test/data/v1.0.10')
+    subset = fsdd.select(speakers='george', rec_nums=range(5))
+    path = str(tmpdir.join('features'))
+    fsdd.export_features(path, transforms=transforms, num_workers=2)
+
+    features = TorchFSDDGenerator(version='features', path=path)
+    assert len(features.all_files) == 3000
+    assert features.index.speaker_names == fsdd.index.speaker_names
+    selected = features.select(speakers='george', rec_nums=range(5))
+    assert len(selected) == len(subset) == 50
+
+    expected = TorchFSDD(subset.files, transforms=transforms)
+    for i in range(len(selected)):
+        x, y = selected[i]
+        assert torch.allclose(x, expected[i][0])
+        assert y == expected[i][1]
+    assert selected.lengths().tolist() == [expected[i][0].shape[-1] for i in range(len(expected))]
+
+    train_set, test_set = TorchFSDDGenerator(version='features', path=path, load_all=True).train_test_split()
+    assert len(train_set) == 2700 and len(test_set) == 300
+    assert train_set[0][0].shape[0] == 13
+    with pytest.raises(ValueError):
+        features.export(str(tmpdir.join('fsdd.bin')))
@@ -1,6 +1,6 @@
-import torch
+import pytest, torch
 from torchaudio import load
-from torchfsdd import TrimSilence
+from torchfsdd import TrimSilence, TrimMFCC, Batched, BatchCompose, Augment, TimeShift, Gain, AddNoise, SpeedPerturb, TimeMask, FrequencyMask
 
 original, sr = load('lib/test/data/sample.wav')
 original = original.flatten()
@@ -16,4 +16,178 @@ def test_min_threshold():
 def test_normal_threshold():
     trimmed = TrimSilence(threshold=0.1)(original)
     assert len(trimmed) != len(original)
-    assert torch.eq(trimmed, original[9:2301]).all()
\ No newline at end of file
+    assert torch.eq(trimmed, original[9:2301]).all()
+
+def test_batch_matches_single():
+    trim = TrimSilence(threshold=0.1)
+    recordings = [original, original[:1000], original[500:], torch.zeros(300)]
+    lengths = torch.tensor([len(r) for r in recordings])
+    padded = torch.nn.utils.rnn.pad_sequence(recordings, batch_first=True)
+    trimmed, trimmed_lengths = trim.batch(padded, lengths)
+    for row, length, recording in zip(trimmed, trimmed_lengths, recordings):
+        expected = trim(recording)
+        assert length == len(expected)
+        assert torch.eq(row[:length], expected).all()
+        assert (row[length:] == 0).all()
+
+def test_batch_silence():
+    trimmed, trimmed_lengths = TrimSilence(threshold=1.).batch(original.unsqueeze(0), torch.tensor([len(original)]))
+    assert trimmed.shape == (1, 0)
+    assert trimmed_lengths.tolist() == [0]
+
+def test_batched_mfcc():
+    from torchaudio.transforms import MFCC
+    mfcc = Batched(MFCC(sample_rate=8e3, n_mfcc=13))
+    recordings = [original, original[:1000], original[500:2101]]
+    lengths = torch.tensor([len(r) for r in recordings])
+    padded = torch.nn.utils.rnn.pad_sequence(recordings, batch_first=True)
+    x, x_lengths = mfcc.batch(padded, lengths)
+    assert x.shape[:2] == (3, 13)
+    for row, recording, length in zip(x, recordings, x_lengths):
+        expected = mfcc(recording)
+        assert expected.shape[-1] == length
+        # Frames with windows that do not overlap the padding are identical
+        n_frames = (len(recording) - 200) // 200
+        assert torch.allclose(row[:, :n_frames], expected[:, :n_frames], atol=1e-3)
+
+def test_batch_compose():
+    from torchaudio.transforms import MFCC
+    transforms = BatchCompose([TrimSilence(threshold=0.1), Batched(MFCC(sample_rate=8e3, n_mfcc=13))])
+    x = transforms(original)
+    assert x.shape == (13, (2301 - 9) // 200 + 1)
+    batch, lengths = transforms.batch(original.unsqueeze(0), torch.tensor([len(original)]))
+    assert lengths.tolist() == [x.shape[-1]]
+    assert torch.allclose(batch[0], x, atol=1e-4)
+
+recordings = [original, original[:1000], original[500:], torch.zeros(300)]
+augmentations = [TimeShift(max_shift=200), Gain(), AddNoise(p=0.5), SpeedPerturb(), TimeMask(max_width=100, n_masks=2)]
+
+def augment_batch(augment, recordings, indices):
+    lengths = torch.tensor([len(r) for r in recordings])
+    padded = torch.nn.utils.rnn.pad_sequence(recordings, batch_first=True)
+    return augment.batch(padded, lengths, indices=indices)
+
+def test_augment_matches_single():
+    augment = Augment(augmentations, seed=1)
+    x, lengths = augment_batch(augment, recordings, [10, 11, 12, 13])
+    for i, (row, length, recording) in enumerate(zip(x, lengths, recordings)):
+        expected = augment(recording, index=10 + i)
+        assert length == len(expected)
+        assert torch.allclose(row[:length], expected, atol=1e-6)
+        assert (row[length:] == 0).all()
+
+def test_augment_reproducible():
+    augment = Augment(augmentations, seed=1)
+    x, _ = augment_batch(augment, recordings, [0, 1, 2, 3])
+    # The parameters of each recording do not depend on the rest of the batch
+    y, _ = augment_batch(augment, recordings[2:], [2, 3])
+    assert torch.allclose(x[2:, :y.shape[1]], y, atol=1e-6)
+    assert torch.equal(augment_batch(Augment(augmentations, seed=1), recordings, [0, 1, 2, 3])[0], x)
+    # Different epochs and seeds give different parameters
+    augment.set_epoch(1)
+    assert not torch.equal(augment_batch(augment, recordings, [0, 1, 2, 3])[0], x)
+    assert not torch.equal(augment_batch(Augment(augmentations, seed=2), recordings, [0, 1, 2, 3])[0], x)
+
+def test_augment_probability():
+    x, lengths = augment_batch(Augment([TimeShift(200, p=0.), Gain(p=0.), AddNoise(p=0.), SpeedPerturb(p=0.)]), recordings, [0, 1, 2, 3])
+    assert lengths.tolist() == [len(r) for r in recordings]
+    for row, recording in zip(x, recordings):
+        assert torch.equal(row[:len(recording)], recording)
+
+def test_add_noise():
+    augment = Augment([AddNoise(min_snr_db=0., max_snr_db=0.)])
+    x, _ = augment_batch(augment, [torch.ones(20000), torch.ones(5000)], [0, 1])
+    noise = x[0] - 1.
+    # Unit signal power at 0 dB gives standard normal noise, which is only added to the samples of each recording
+    assert abs(float(noise.mean())) < 0.05 and abs(float(noise.std()) - 1.) < 0.05
+    assert (x[1, 5000:] == 0).all()
+    # The noise of a recording does not depend on the padded length of the batch
+    assert torch.equal(x[1, :5000], augment_batch(augment, [torch.ones(5000)], [1])[0][0])
+
+def test_time_shift():
+    x, lengths = augment_batch(Augment([TimeShift(max_shift=50)]), [original[:1000]] * 8, range(8))
+    assert lengths.tolist() == [1000] * 8
+    for row in x:
+        # Each row is a (zero-filled) shifted copy of the recording
+        shift = next(s for s in range(-50, 51) if torch.equal(row[max(s, 0):1000 + min(s, 0)], original[max(-s, 0):1000 - max(s, 0)]))
+        assert (row[:max(shift, 0)] == 0).all() and (row[1000 + min(shift, 0):] == 0).all()
+
+def test_speed_perturb():
+    x, lengths = augment_batch(Augment([SpeedPerturb(factors=[2.])]), [original[:1001], original[:10]], [0, 1])
+    assert lengths.tolist() == [501, 5]
+    assert torch.allclose(x[0, :501], original[:1001:2])
+
+def test_frequency_mask():
+    features = torch.ones(4, 2, 20, 30)
+    x, lengths = Augment([FrequencyMask(max_width=5)]).batch(features, torch.full((4,), 30), indices=range(4))
+    assert x.shape == features.shape
+    for row in x:
+        masked = (row[0, :, 0] == 0)
+        assert masked.sum() <= 5
+        assert torch.equal(row == 0, masked.view(1, 20, 1).expand(2, 20, 30))
+
+def test_augment_dataset():
+    import glob
+    from torch.utils.data import DataLoader
+    from torchfsdd import TorchFSDD
+    files = sorted(glob.glob('lib/test/data/v1.0.10/*.wav'))[:24]
+    transforms = BatchCompose([TrimSilence(threshold=0.05), Augment(augmentations, seed=0)])
+    dataset = TorchFSDD(files, batch_transforms=transforms).subset(range(4, 24))
+    # Items are augmented identically for any batch size and number of workers
+    items = [[x for batch in DataLoader(dataset, batch_size=batch_size, num_workers=num_workers, collate_fn=list) for x, _ in batch]
+        for batch_size, num_workers in [(4, 0), (5, 2)]]
+    for x, y in zip(*items):
+        assert torch.allclose(x, y, atol=1e-6)
+    # Items are indexed by their position in the full data set
+    assert torch.allclose(dataset[0][0], TorchFSDD(files, batch_transforms=transforms)[4][0], atol=1e-6)
+
+def trim_mfcc_reference(x, threshold, hop=200, n_fft=400):
+    # Chained TrimSilence and MFCC, with the kept region extended to the enclosing hop_length blocks,
+    # and frames computed from the neighbouring samples (or zeros) rather than from reflection padding
+    from torchaudio.transforms import MFCC
+    loud = (x.abs() > threshold).nonzero().flatten()
+    if len(loud) == 0:
+        return torch.zeros(13, 0)
+    first, last = int(loud[0]), int(loud[-1])
+    assert torch.eq(TrimSilence(threshold=threshold)(x), x[first:last + 1]).all()
+    start, end = first // hop * hop, min(-(-(last + 1) // hop) * hop, len(x))
+    n_frames = (end - start) // hop + 1
+    padded = torch.nn.functional.pad(x, (n_fft // 2, n_fft // 2))
+    return MFCC(sample_rate=8000, n_mfcc=13, melkwargs={'center': False})(padded[start:start + (n_frames - 1) * hop + n_fft])
+
+def test_trim_mfcc():
+    mfcc = TrimMFCC(threshold=0.05, sample_rate=8000, n_mfcc=13)(original)
+    # Frames are centered on the samples of the kept blocks, as with a non-centered MFCC of the zero-padded recording
+    expected = trim_mfcc_reference(original, 0.05)
+    assert mfcc.shape == expected.shape and expected.shape[1] > 0
+    assert torch.allclose(mfcc, expected, atol=1e-3)
+
+def test_trim_mfcc_recordings():
+    import glob
+    recordings = [load(file)[0].flatten() for file in sorted(glob.glob('lib/test/data/v1.0.10/*.wav'))[:16]]
+    lengths = torch.tensor([len(x) for x in recordings])
+    transform = TrimMFCC(threshold=0.05, sample_rate=8000, n_mfcc=13)
+    mfcc, n_frames = transform.batch(torch.nn.utils.rnn.pad_sequence(recordings, batch_first=True), lengths)
+    assert (n_frames > 0).all()
+    for i, x in enumerate(recordings):
+        expected = trim_mfcc_reference(x, 0.05)
+        assert n_frames[i] == expected.shape[1]
+        assert torch.allclose(mfcc[i, :, :n_frames[i]], expected, rtol=1e-4, atol=1e-3)
+        assert (mfcc[i, :, n_frames[i]:] == 0).all()
+
+def test_trim_mfcc_batch():
+    transform = TrimMFCC(threshold=0.05, sample_rate=8000, n_mfcc=13)
+    xs = [original, original[1000:], torch.zeros(500), original[:1500]]
+    lengths = torch.tensor([len(x) for x in xs])
+    mfcc, n_frames = transform.batch(torch.nn.utils.rnn.pad_sequence(xs, batch_first=True), lengths)
+    assert mfcc.shape == (4, 13, int(n_frames.max())) and n_frames[2] == 0
+    for i, x in enumerate(xs):
+        single = transform(x)
+        assert single.shape[1] == n_frames[i]
+        assert torch.allclose(mfcc[i, :, :n_frames[i]], single, atol=1e-4)
+        assert (mfcc[i, :, n_frames[i]:] == 0).all()
+
+@pytest.mark.parametrize('melkwargs', [{'center': False}, {'pad_mode': 'constant'}, {'power': 1.}])
+def test_trim_mfcc_unsupported(melkwargs):
+    with pytest.raises(AssertionError):
+        TrimMFCC(threshold=0.05, melkwargs=melkwargs)
@@ -0,0 +1,34 @@
+import sys, subprocess, torch
+import torchfsdd
+
+# Generous budget for importing the package alone (which should not import torch, torchaudio or pkg_resources)
+IMPORT_BUDGET = 0.5
+
+def run(code):
+    return subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE, check=True, universal_newlines=True).stdout.split()
+
+def test_import_is_lazy():
+    heavy = run("import sys, torchfsdd; print(*[m for m in ('torch', 'torchaudio', 'numpy', 'pkg_resources') if m in sys.modules] or ['none'])")
+    assert heavy == ['none']
+
+def test_import_budget():
+    code = "import time; start = time.perf_counter(); import torchfsdd; print(time.perf_counter() - start)"
+    assert min(float(run(code)[0]) for _ in range(3)) < IMPORT_BUDGET
+
+def test_torch_free_names():
+    assert run("import sys, torchfsdd; torchfsdd.MetadataIndex; torchfsdd.DatasetMirror; torchfsdd.file_lock; print('torch' in sys.modules)") == ['False']
+
+def test_lazy_access():
+    assert run("import sys, torchfsdd; torchfsdd.TorchFSDD; print('torch' in sys.modules)") == ['True']
+    from torchfsdd.dataset import TorchFSDD
+    assert torchfsdd.TorchFSDD is TorchFSDD
+    assert set(torchfsdd.__all__) <= set(dir(torchfsdd))
+    namespace = {}
+    exec('from torchfsdd import *', namespace)
+    assert all(name in namespace for name in torchfsdd.__all__)
+
+def test_parse_version():
+    assert torchfsdd.parse_version('1.13.1+cu117') == (1, 13, 1)
+    assert torchfsdd.parse_version('2.1.0.dev20230801') == (2, 1, 0)
+    assert torchfsdd.parse_version('0.8') < torchfsdd.parse_version('0.13')
+    assert torchfsdd.parse_version(torch.__version__) >= torchfsdd.parse_version(torchfsdd.MIN_TORCH_VERSION)
@@ -0,0 +1,156 @@
+import os, glob, shutil, numpy as np
+from torchfsdd import TorchFSDDGenerator, MetadataIndex
+from torchfsdd.audio import read_wav_header
+
+files = glob.glob('lib/test/data/v1.0.10/*.wav')
+
+def test_build():
+    index = MetadataIndex.build(files)
+    assert len(index) == 3000
+    assert index.paths.tolist() == sorted(files)
+    assert set(index.digits.tolist()) == set(range(10))
+    assert set(index.rec_nums.tolist()) == set(range(50))
+    assert len(index.speaker_names) == 6
+    for path, digit, speaker, rec_num in zip(index.paths, index.digits, index.speakers, index.rec_nums):
+        assert os.path.basename(path) == f'{digit}_{index.speaker_names[speaker]}_{rec_num}.wav'
+    assert not index.has_headers
+
+def test_build_headers():
+    index = MetadataIndex.build(files[:10], headers=True)
+    assert index.has_headers
+    assert (index.sample_rates == 8000).all()
+    assert (index.num_samples > 0).all()
+
+def test_wav_header():
+    header = read_wav_header('lib/test/data/sample.wav')
+    assert (header.format, header.num_channels, header.sample_rate, header.bits_per_sample) == (1, 1, 8000, 16)
+    assert header.num_frames == 2384
+
+def test_save_load(tmpdir):
+    index = MetadataIndex.build(files[:100], headers=True)
+    path = str(tmpdir.join('index.npz'))
+    index.save(path)
+    loaded = MetadataIndex.load(path)
+    for column in MetadataIndex.COLUMNS:
+        assert np.array_equal(getattr(index, column), getattr(loaded, column))
+    assert loaded.speaker_names == index.speaker_names
+    assert loaded.matches(files[:100])
+    assert not loaded.matches(files[:99])
+
+def test_generator_saved_index(tmpdir):
+    path = str(tmpdir.join('recordings'))
+    shutil.copytree('lib/test/data/v1.0.10', path)
+    fsdd = TorchFSDDGenerator(version='local', path=path, read_headers=True, save_index=True)
+    assert os.path.isfile(os.path.join(path, '.torchfsdd-index.npz'))
+    assert fsdd.index.has_headers
+
+    # The saved index is reused while the recordings are unchanged
+    reloaded = TorchFSDDGenerator(version='local', path=path, save_index=True)
+    assert reloaded.index.has_headers
+    assert reloaded.all_files == fsdd.all_files
+
+    # ... and rebuilt once they change
+    os.remove(os.path.join(path, '0_george_0.wav'))
+    rebuilt = TorchFSDDGenerator(version='local', path=path, save_index=True)
+    assert len(rebuilt.all_files) == 2999
+    assert not rebuilt.index.has_headers
+
+def test_generator_labels():
+    fsdd = TorchFSDDGenerator(version='local', path='lib/test/data/v1.0.10')
+    full = fsdd.full()
+    assert full._labels.tolist() == [int(os.path.basename(file)[0]) for file in full.files]
+
+def test_generator_select():
+    fsdd = TorchFSDDGenerator(version='local', path='lib/test/data/v1.0.10')
+    subset = fsdd.select(digits=[0, 1], speakers='george', rec_nums=range(10))
+    assert len(subset) == 20
+    assert all(os.path.basename(file).split('_')[:2] in (['0', 'george'], ['1', 'george']) for file in subset.files)
+
+    test = fsdd.select(speakers='jackson')
+    train = fsdd.select(speakers='jackson', exclude=True)
+    assert len(test) == 500 and len(train) == 2500
+    assert not set(test.files) & set(train.files)
+
+def test_generator_select_unknown_speaker():
+    fsdd = TorchFSDDGenerator(version='local', path='lib/test/data/v1.0.10')
+    try:
+        fsdd.select(speakers='nobody')
+        assert False
+    except ValueError:
+        pass
+
+def test_generator_kfold():
+    fsdd = TorchFSDDGenerator(version='local', path='lib/test/data/v1.0.10')
+    folds = list(fsdd.kfold(n_splits=5, shuffle=True, seed=0))
+    assert len(folds) == 5
+    test_files = []
+    for train, test in folds:
+        assert len(train) == 2400 and len(test) == 600
+        assert not set(train.files) & set(test.files)
+        test_files.extend(test.files)
+    assert sorted(test_files) == sorted(fsdd.all_files)
+
+def test_generator_group_kfold():
+    fsdd = TorchFSDDGenerator(version='local', path='lib/test/data/v1.0.10')
+    folds = list(fsdd.group_kfold(n_splits=3, groups='speaker'))
+    assert len(folds) == 3
+    for train, test in folds:
+        speakers = lambda dataset: {os.path.basename(file).split('_')[1] for file in dataset.files}
+        assert len(test) == 1000
+        assert not speakers(train) & speakers(test)
+
+def test_generator_splits_share_store():
+    fsdd = TorchFSDDGenerator(version='local', path='lib/test/data/v1.0.10', load_all=True, num_workers=4)
+    train, test = fsdd.train_test_split()
+    folds = list(fsdd.kfold(n_splits=3))
+    assert all(dataset.recordings is train.recordings for fold in folds for dataset in fold)
+    assert test.recordings is train.recordings
+
+def test_update(tmpdir):
+    path = str(tmpdir)
+    for file in sorted(files)[:10]:
+        shutil.copy(file, path)
+    index = MetadataIndex.build(glob.glob(os.path.join(path, '*.wav')), headers=True)
+    os.remove(index.paths[0])
+    shutil.copy(sorted(files)[20], path)
+    os.utime(index.paths[3], ns=(0, 0))
+    updated, changes = index.update(glob.glob(os.path.join(path, '*.wav')))
+    assert changes == {'added': [os.path.join(path, os.path.basename(sorted(files)[20]))], 'removed': [index.paths[0]], 'changed': [index.paths[3]]}
+    rebuilt = MetadataIndex.build(glob.glob(os.path.join(path, '*.wav')), headers=True)
+    for column in MetadataIndex.COLUMNS:
+        assert np.array_equal(getattr(updated, column), getattr(rebuilt, column))
+    assert updated.speaker_names == rebuilt.speaker_names
+    assert updated.update(updated.paths.tolist())[1] == {'added': [], 'removed': [], 'changed': []}
+
+def test_generator_refresh(tmpdir, monkeypatch):
+    import torch
+    from torchfsdd import TorchFSDD, FileLoader
+    path = str(tmpdir)
+    for file in sorted(files)[:30]:
+        shutil.copy(file, path)
+    fsdd = TorchFSDDGenerator(version='local', path=path, load_all=True)
+    assert len(fsdd.full()) == 30
+
+    # Add a recording of a new speaker, remove one and overwrite one with different audio
+    new = [file for file in sorted(files) if os.path.basename(file).split('_')[1] not in fsdd.index.speaker_names][0]
+    shutil.copy(new, path)
+    removed, changed = fsdd.all_files[0], fsdd.all_files[5]
+    os.remove(removed)
+    shutil.copy(sorted(files)[40], changed)
+
+    decoded = []
+    call = FileLoader.__call__
+    monkeypatch.setattr(FileLoader, '__call__', lambda self, position: decoded.append(self.files[position]) or call(self, position))
+    changes = fsdd.refresh()
+    assert changes['added'] == [os.path.join(path, os.path.basename(new))]
+    assert changes['removed'] == [removed] and changes['changed'] == [changed]
+    # Only the delta is decoded
+    assert sorted(decoded) == sorted(changes['added'] + changes['changed'])
+
+    full = fsdd.full()
+    assert len(full) == 30 and full.files == sorted(glob.glob(os.path.join(path, '*.wav')))
+    expected = TorchFSDD(full.files)
+    for i in range(len(full)):
+        assert torch.eq(full[i][0], expected[i][0]).all() and full[i][1] == expected[i][1]
+    train_set, test_set = fsdd.train_test_split()
+    assert changes['added'][0] in train_set.files + test_set.files
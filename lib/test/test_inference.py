@@ -0,0 +1,95 @@
+import os, sys, time, threading, pytest, torch
+from concurrent.futures import CancelledError
+
+# The inference utilities are part of the example notebooks rather than the package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, 'notebooks'))
+from model import DeepGRU
+from inference import DigitClassifier, MicroBatcher
+
+class Recorder:
+    """A classifier that records the size of each batch, and outputs the sum of each clip."""
+    def __init__(self, error=None):
+        self.batches = []
+        self.error = error
+
+    def features(self, clip):
+        return clip
+
+    def predict_features(self, features):
+        self.batches.append(len(features))
+        if self.error is not None:
+            raise self.error
+        return torch.stack([x.sum(dim=0) for x in features])
+
+def test_classifier_order():
+    torch.manual_seed(0)
+    model = DeepGRU(n_features=4, n_classes=3, dims={'gru1': 8, 'gru2': 8, 'gru3': 8, 'fc': 8})
+    classifier = DigitClassifier(model, max_batch_size=3)
+    clips = [torch.randn(length, 4) for length in (5, 12, 7, 12, 3, 9, 1)]
+    outputs = classifier.predict(clips)
+    assert outputs.shape == (7, 3)
+    for clip, output in zip(clips, outputs):
+        assert torch.allclose(classifier.predict([clip])[0], output, atol=1e-5)
+    assert all(len(batch) <= 3 for batch in classifier.batches([len(clip) for clip in clips]))
+
+def test_max_batch_size():
+    classifier = Recorder()
+    with MicroBatcher(classifier, max_batch_size=4, max_latency=0.5) as batcher:
+        futures = [batcher.submit(torch.full((3, 2), float(i))) for i in range(10)]
+        results = [future.result(timeout=5) for future in futures]
+    assert classifier.batches == [4, 4, 2]
+    for i, result in enumerate(results):
+        assert result.tolist() == [3. * i] * 2
+
+def test_deadline():
+    classifier = Recorder()
+    with MicroBatcher(classifier, max_batch_size=100, max_latency=0.05) as batcher:
+        start = time.monotonic()
+        batcher.submit(torch.ones(1, 2)).result(timeout=5)
+        assert time.monotonic() - start >= 0.05
+    assert classifier.batches == [1]
+
+def test_cancellation():
+    classifier = Recorder()
+    with MicroBatcher(classifier, max_batch_size=100, max_latency=0.2) as batcher:
+        cancelled, kept = batcher.submit(torch.ones(1, 2)), batcher.submit(torch.ones(1, 2))
+        assert cancelled.cancel()
+        assert kept.result(timeout=5).tolist() == [1., 1.]
+    with pytest.raises(CancelledError):
+        cancelled.result()
+    assert classifier.batches == [1]
+
+def test_exceptions():
+    classifier = Recorder(error=ValueError('failed'))
+    with MicroBatcher(classifier, max_batch_size=3, max_latency=0.5) as batcher:
+        futures = [batcher.submit(torch.ones(1, 2)) for _ in range(3)]
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result(timeout=5)
+
+def test_submit_after_close():
+    batcher = MicroBatcher(Recorder())
+    batcher.close()
+    batcher.close()
+    with pytest.raises(RuntimeError):
+        batcher.submit(torch.ones(1, 2))
+
+def test_close_during_submissions():
+    # Every accepted clip is classified, even if the batcher is closed while clips are being submitted
+    batcher, futures, lock = MicroBatcher(Recorder(), max_batch_size=8, max_latency=0.001), [], threading.Lock()
+    def submit():
+        for _ in range(200):
+            try:
+                future = batcher.submit(torch.ones(1, 2))
+            except RuntimeError:
+                return
+            with lock:
+                futures.append(future)
+    threads = [threading.Thread(target=submit) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.01)
+    batcher.close()
+    for thread in threads:
+        thread.join()
+    assert all(future.result(timeout=5).tolist() == [1., 1.] for future in futures)
@@ -0,0 +1,97 @@
+import os, glob, time, shutil, tarfile, threading, subprocess, pytest
+from torchfsdd import TorchFSDDGenerator, DatasetMirror, file_lock
+
+files = sorted(glob.glob('lib/test/data/v1.0.10/*.wav'))[:20]
+
+@pytest.fixture
+def tarball(tmpdir):
+    path = str(tmpdir.join('fsdd.tar.gz'))
+    with tarfile.open(path, 'w:gz') as tar:
+        for file in files:
+            tar.add(file, arcname='free-spoken-digit-dataset-1.0.10/recordings/' + os.path.basename(file))
+    return path
+
+@pytest.fixture
+def repo(tmpdir):
+    path = str(tmpdir.join('repo'))
+    os.makedirs(os.path.join(path, 'recordings'))
+    for file in files:
+        shutil.copy(file, os.path.join(path, 'recordings'))
+    git = lambda *args: subprocess.run(['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com', *args], cwd=path, check=True, capture_output=True)
+    git('init', '-q')
+    git('add', '.')
+    git('commit', '-q', '-m', 'Add recordings')
+    git('tag', 'v1.0.10')
+    subprocess.run(['git', 'clone', '-q', '--bare', path, path + '.git'], check=True)
+    return path + '.git'
+
+def test_fetch_tarball(tmpdir, tarball):
+    mirror = DatasetMirror(str(tmpdir.join('cache')))
+    path = mirror.fetch('v1.0.10', source=tarball)
+    assert sorted(glob.glob(os.path.join(path, '*.wav'))) == sorted(os.path.join(path, os.path.basename(file)) for file in files)
+    assert mirror.verify(mirror.digest('v1.0.10'), checksums=True)
+    assert os.listdir(str(tmpdir.join('cache', 'tmp'))) == []
+
+    # The installed version is reused without the source
+    os.remove(tarball)
+    assert mirror.fetch('v1.0.10', source=tarball) == path
+
+def test_fetch_checksum(tmpdir, tarball):
+    mirror = DatasetMirror(str(tmpdir.join('cache')))
+    with pytest.raises(ValueError):
+        mirror.fetch('v1.0.10', source=tarball, checksum='0' * 64)
+    assert mirror.digest('v1.0.10') is None
+
+def test_fetch_repo(tmpdir, tarball, repo):
+    mirror = DatasetMirror(str(tmpdir.join('cache')))
+    path = mirror.fetch('v1.0.10', source=repo)
+    assert len(glob.glob(os.path.join(path, '*.wav'))) == 20
+
+    # Identical recordings from different sources share the same content-addressed directory
+    assert mirror.fetch('tarball', source=tarball) == path
+    with pytest.raises(ValueError):
+        mirror.fetch('v0.0.0', source=repo)
+
+def test_fetch_concurrent(tmpdir, tarball):
+    mirror = DatasetMirror(str(tmpdir.join('cache')))
+    paths = []
+    threads = [threading.Thread(target=lambda: paths.append(mirror.fetch('v1.0.10', source=tarball))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(paths) == 4 and len(set(paths)) == 1
+    assert len(os.listdir(str(tmpdir.join('cache', 'objects')))) == 1
+
+def test_fetch_repairs(tmpdir, tarball):
+    mirror = DatasetMirror(str(tmpdir.join('cache')))
+    path = mirror.fetch('v1.0.10', source=tarball)
+    file = os.path.join(path, os.path.basename(files[0]))
+    os.chmod(file, 0o644)
+    with open(file, 'r+b') as f:
+        f.seek(100)
+        f.write(b'\x00\x01\x02')
+    assert mirror.verify(mirror.digest('v1.0.10'))
+    assert not mirror.verify(mirror.digest('v1.0.10'), checksums=True)
+    assert mirror.fetch('v1.0.10', source=tarball, verify=True) == path
+    assert mirror.verify(mirror.digest('v1.0.10'), checksums=True)
+
+def test_generator_mirror(tmpdir, tarball):
+    fsdd = TorchFSDDGenerator(version='v1.0.10', cache_dir=str(tmpdir.join('cache')), source=tarball)
+    assert fsdd.path.startswith(str(tmpdir.join('cache', 'objects')))
+    assert len(fsdd.all_files) == 20
+
+def test_file_lock(tmpdir):
+    path, events = str(tmpdir.join('test.lock')), []
+    def hold(name):
+        with file_lock(path):
+            events.append(f'{name}-start')
+            time.sleep(0.05)
+            events.append(f'{name}-end')
+    threads = [threading.Thread(target=hold, args=(name,)) for name in 'ab']
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(zip(events[::2], events[1::2])) == [('a-start', 'a-end'), ('b-start', 'b-end')]
+    assert os.path.exists(path)
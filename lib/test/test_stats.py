@@ -0,0 +1,71 @@
+import glob, pickle
+from torch.utils.data import DataLoader
+from torchfsdd import TorchFSDD, TorchFSDDGenerator, TrimSilence, LoadingStats, FeatureCache
+
+files = sorted(glob.glob('lib/test/data/v1.0.10/*.wav'))[:40]
+
+def test_disabled():
+    fsdd = TorchFSDD(files)
+    fsdd[0]
+    assert fsdd.loading_stats() is None
+
+def test_record():
+    stats = LoadingStats(min_seconds=1e-3, max_seconds=1., bins_per_decade=1)
+    assert len(stats.bin_edges) == stats.n_bins + 1 == 6
+    for seconds in (1e-4, 2e-3, 2e-3, 0.5, 20.):
+        stats.record('load', seconds)
+    stats.count('items', 5)
+    summary = stats.summary()
+    load = summary['stages']['load']
+    assert load['count'] == 5
+    assert load['histogram'] == [1, 2, 0, 1, 1]
+    assert abs(load['total_s'] - 20.5041) < 1e-9
+    assert load['p50_ms'] == 10.
+    assert summary['counters']['items'] == 5
+    assert summary['workers'] == {0: 5}
+    assert summary['stages']['transforms']['mean_ms'] is None
+
+    stats.reset()
+    assert stats.summary()['counters']['items'] == 0
+
+def test_stages(tmpdir):
+    stats = LoadingStats()
+    fsdd = TorchFSDD(files, transforms=TrimSilence(threshold=0.05), cache=FeatureCache(str(tmpdir)), stats=stats)
+    for _ in range(2):
+        for i in range(len(fsdd)):
+            fsdd[i]
+    summary = fsdd.loading_stats()
+    assert summary['counters']['items'] == 80
+    assert summary['counters']['cache_misses'] == 40 and summary['counters']['cache_hits'] == 40
+    assert summary['counters']['bytes'] == 4 * int(fsdd.lengths().sum())
+    for stage in ('load', 'transforms', 'cache_put'):
+        assert summary['stages'][stage]['count'] == 40
+    assert summary['stages']['cache_get']['count'] == summary['stages']['total']['count'] == 80
+    assert summary['stages']['load']['total_s'] > 0
+
+def test_callbacks():
+    stats = LoadingStats()
+    reports = []
+    stats.add_callback(reports.append)
+    fsdd = TorchFSDD(files, stats=stats)
+    fsdd[0]
+    summary = stats.report()
+    assert reports == [summary]
+
+    # Callbacks are not sent to other processes
+    restored = pickle.loads(pickle.dumps(stats))
+    assert restored.callbacks == []
+    assert restored.summary()['counters']['items'] == 1
+
+def test_workers():
+    fsdd = TorchFSDDGenerator(version='local', path='lib/test/data/v1.0.10', stats=True)
+    train_set, test_set = fsdd.train_test_split()
+    loader = DataLoader(test_set, batch_size=10, num_workers=2, collate_fn=list)
+    assert sum(len(batch) for batch in loader) == 300
+
+    # Subsets share the statistics, and every worker process records into its own slot
+    summary = train_set.loading_stats()
+    assert summary['counters']['items'] == 300
+    assert summary['stages']['load']['count'] == 300
+    assert set(summary['workers']) == {1, 2}
+    assert sum(summary['workers'].values()) == 300
@@ -0,0 +1,201 @@
+import os, sys, glob, shutil, pickle, subprocess, pytest, torch, torchaudio
+from torch.utils.data import DataLoader
+from torchfsdd import TorchFSDD, TorchFSDDGenerator, PackedRecordings, SharedRecordings, FSDDArchive, MetadataIndex
+
+files = sorted(glob.glob('lib/test/data/v1.0.10/*.wav'))
+
+def test_packed_recordings():
+    recordings = [torch.arange(3.), torch.arange(5.), torch.zeros(0), torch.ones(2)]
+    packed = PackedRecordings.pack(recordings)
+    assert len(packed) == 4
+    assert packed.lengths.tolist() == [3, 5, 0, 2]
+    for x, y in zip(packed, recordings):
+        assert torch.eq(x, y).all()
+    assert torch.eq(packed[-1], recordings[-1]).all()
+    with pytest.raises(IndexError):
+        packed[4]
+
+def test_archive_roundtrip(tmpdir):
+    path = str(tmpdir.join('fsdd.bin'))
+    archive = FSDDArchive.write(path, files[:30])
+    assert os.path.isfile(path)
+    assert len(archive) == 30
+    assert archive.files == [os.path.basename(file) for file in files[:30]]
+    lazy = TorchFSDD(files[:30])
+    for i, file in enumerate(files[:30]):
+        x, y = lazy[i]
+        assert torch.eq(archive[archive.position(file)], x).all()
+        assert archive.labels[i] == y
+        assert archive.speakers[i] == os.path.basename(file).split('_')[1]
+
+def test_archive_zero_copy(tmpdir):
+    archive = FSDDArchive.write(str(tmpdir.join('fsdd.bin')), files[:5])
+    base = archive.recordings.data.data_ptr()
+    for i in range(len(archive)):
+        assert archive[i].data_ptr() == base + 4 * int(archive.recordings.offsets[i])
+
+def test_archive_pickle(tmpdir):
+    archive = FSDDArchive.write(str(tmpdir.join('fsdd.bin')), files[:5])
+    state = pickle.dumps(archive)
+    assert len(state) < 1000
+    restored = pickle.loads(state)
+    assert torch.eq(restored[3], archive[3]).all()
+
+def test_archive_invalid(tmpdir):
+    path = tmpdir.join('invalid.bin')
+    path.write('not an archive')
+    with pytest.raises(ValueError):
+        FSDDArchive(str(path))
+
+def test_generator_archive(tmpdir):
+    path = str(tmpdir.join('fsdd.bin'))
+    TorchFSDDGenerator(version='local', path='lib/test/data/v1.0.10').export(path)
+    fsdd = TorchFSDDGenerator(version='archive', path=path)
+    assert len(fsdd.all_files) == 3000
+    train, test = fsdd.train_test_split(test_size=0.1)
+    assert len(train) == 2700 and len(test) == 300
+    x, y = test[0]
+    expected, _ = TorchFSDD([os.path.join('lib/test/data/v1.0.10', test.files[0])])[0]
+    assert torch.eq(x, expected).all()
+    assert y == int(test.files[0][0])
+
+requires_shared_memory = pytest.mark.skipif(sys.version_info < (3, 8), reason='Shared memory requires Python 3.8 or later')
+
+@requires_shared_memory
+def test_shared_recordings():
+    name = f'tfsdd-test-{os.getpid()}'
+    packed = PackedRecordings.pack([torch.arange(3.), torch.arange(5.), torch.zeros(0)])
+    with SharedRecordings.share(name, packed) as owner:
+        attached = SharedRecordings.attach(name)
+        assert not attached.owner
+        assert attached.lengths.tolist() == [3, 5, 0]
+        assert torch.eq(attached.data, packed.data).all()
+        # Other processes attach by name, and do not remove the segment when they exit
+        code = f'from torchfsdd import SharedRecordings; print(float(SharedRecordings.attach({name!r}, timeout=10.).data.sum()))'
+        for _ in range(2):
+            assert subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE, check=True, universal_newlines=True).stdout.strip() == '13.0'
+        assert torch.eq(pickle.loads(pickle.dumps(attached))[1], packed[1]).all()
+        attached.close()
+    # The segment is removed once the creating process closes it
+    with pytest.raises(TimeoutError):
+        SharedRecordings.attach(name, timeout=0.)
+
+@requires_shared_memory
+def test_shared_recordings_exists():
+    name = f'tfsdd-test-{os.getpid()}'
+    with SharedRecordings.create(name, [1, 2]) as owner:
+        with pytest.raises(FileExistsError):
+            SharedRecordings.create(name, [1, 2])
+        # Waiting processes fail if the creating process fails to load the recordings
+        owner.fail()
+        with pytest.raises((RuntimeError, TimeoutError)):
+            SharedRecordings.attach(name, timeout=0.)
+
+@requires_shared_memory
+def test_shared_dataset():
+    name = f'tfsdd-test-{os.getpid()}'
+    expected = TorchFSDD(files[:30], load_all=True)
+    owner = TorchFSDD(files[:30], load_all=True, shared=name)
+    assert isinstance(owner.recordings, SharedRecordings) and owner.recordings.owner
+    attached = TorchFSDD(files[:30], load_all=True, shared=name)
+    assert not attached.recordings.owner
+    assert torch.eq(attached.recordings.data, expected.recordings.data).all()
+    for i in range(30):
+        assert torch.eq(attached[i][0], expected[i][0]).all()
+    loader = DataLoader(attached.subset(range(10)), batch_size=5, num_workers=2, collate_fn=list)
+    assert sum(len(batch) for batch in loader) == 10
+    # Data sets of different recordings do not attach to the segment
+    with pytest.raises(ValueError):
+        TorchFSDD(files[:20], load_all=True, shared=name)
+    # ... nor do data sets of recordings decoded with a different decoder
+    with pytest.raises(ValueError):
+        TorchFSDD(files[:30], load_all=True, shared=name, decoder=lambda file: torchaudio.load(file)[0] * 0.5)
+    attached.recordings.close()
+    owner.recordings.close()
+
+def test_shared_callable_decoders():
+    name = f'tfsdd-test-decoders-{os.getpid()}'
+    owner = TorchFSDD(files[:5], load_all=True, shared=name, decoder=lambda file: torchaudio.load(file)[0])
+    with pytest.raises(ValueError):
+        TorchFSDD(files[:5], load_all=True, shared=name, decoder=lambda file: torchaudio.load(file)[0].neg())
+    attached = TorchFSDD(files[:5], load_all=True, shared=name, decoder=lambda file: torchaudio.load(file)[0])
+    assert torch.eq(attached.recordings.data, owner.recordings.data).all()
+    attached.recordings.close()
+    owner.recordings.close()
+
+def test_archive_resample(tmpdir):
+    archive = FSDDArchive.write(str(tmpdir.join('fsdd.bin')), files[:5], sample_rate=16000, num_workers=2)
+    assert (archive.index['sample_rate'] == 16000).all()
+    for i, file in enumerate(files[:5]):
+        x, sr = torchaudio.load(file)
+        expected = torchaudio.functional.resample(x.flatten(), sr, 16000)
+        assert len(archive[i]) == len(expected)
+        assert torch.allclose(archive[i], expected, atol=1e-5)
+
+@pytest.mark.parametrize('normalize', ['peak', 'rms'])
+def test_archive_normalize(tmpdir, normalize):
+    archive = FSDDArchive.write(str(tmpdir.join('fsdd.bin')), files[:5], normalize_to=normalize)
+    for x in archive.recordings:
+        if normalize == 'peak':
+            assert torch.isclose(x.abs().max(), torch.tensor(1.))
+        assert x.abs().max() <= 1.
+    with pytest.raises(ValueError):
+        FSDDArchive.write(str(tmpdir.join('invalid.bin')), files[:5], normalize_to='invalid')
+
+def test_generator_ingest(tmpdir, monkeypatch):
+    options = dict(version='local', path='lib/test/data/v1.0.10', cache_dir=str(tmpdir), sample_rate=16000, dtype=torch.int16)
+    fsdd = TorchFSDDGenerator(**options)
+    assert fsdd.archive is not None and len(tmpdir.join('ingest').listdir()) == 1
+    x, y = fsdd.full()[0]
+    assert x.dtype == torch.int16
+    assert y == int(fsdd.all_files[0][0])
+    # Later runs reuse the converted recordings
+    monkeypatch.setattr(FSDDArchive, 'write', None)
+    assert TorchFSDDGenerator(**options).archive.path == fsdd.archive.path
+
+def test_generator_ingest_refresh(tmpdir):
+    path = tmpdir.mkdir('recordings')
+    for file in files[:10]:
+        shutil.copy(file, str(path))
+    fsdd = TorchFSDDGenerator(version='local', path=str(path), cache_dir=str(tmpdir), sample_rate=16000)
+    previous = fsdd.archive
+    shutil.copy(files[10], str(path))
+    changes = fsdd.refresh()
+    assert [os.path.basename(file) for file in changes['added']] == [os.path.basename(files[10])]
+    assert fsdd.archive.path != previous.path and len(fsdd.all_files) == 11
+    for name in previous.files:
+        assert torch.eq(fsdd.archive[fsdd.archive.position(name)], previous[previous.position(name)]).all()
+    expected = FSDDArchive.write(str(tmpdir.join('expected.bin')), [files[10]], sample_rate=16000)
+    assert torch.eq(fsdd.archive[fsdd.archive.position(files[10])], expected[0]).all()
+    assert fsdd.refresh(save_index=True) == {'added': [], 'removed': [], 'changed': []}
+    assert MetadataIndex.load(str(path.join('.torchfsdd-index.npz'))).matches(glob.glob(str(path.join('*.wav'))))
+
+    # Replaced archives are only removed on request, as other jobs sharing cache_dir may still use them
+    assert os.path.isfile(previous.path)
+    replaced = fsdd.archive
+    shutil.copy(files[11], str(path))
+    fsdd.refresh(remove_replaced=True)
+    assert os.path.isfile(previous.path) and not os.path.exists(replaced.path)
+    assert torch.eq(replaced[0], fsdd.archive[fsdd.archive.position(replaced.files[0])]).all()
+    assert len(tmpdir.join('ingest').listdir()) == 2
+
+def test_generator_ingest_callable_decoders(tmpdir):
+    path = tmpdir.mkdir('recordings')
+    for file in files[:5]:
+        shutil.copy(file, str(path))
+    options = dict(version='local', path=str(path), cache_dir=str(tmpdir), normalize_to='rms')
+    load = lambda file: torchaudio.load(file)[0]
+    clipped = TorchFSDDGenerator(decoder=lambda file: torchaudio.load(file)[0].clamp(-0.01, 0.01), **options)
+    original = TorchFSDDGenerator(decoder=load, **options)
+    assert clipped.archive.path != original.archive.path
+    assert not torch.eq(clipped.archive[0], original.archive[0]).all()
+    # The same decoder reuses the converted recordings
+    assert TorchFSDDGenerator(decoder=load, **options).archive.path == original.archive.path
+
+def test_generator_torchaudio_normalize(tmpdir):
+    # normalize is passed on to torchaudio.load, rather than converting the recordings at ingest
+    fsdd = TorchFSDDGenerator(version='local', path='lib/test/data/v1.0.10', cache_dir=str(tmpdir), normalize=False)
+    assert fsdd.archive is None and not tmpdir.join('ingest').check()
+    dataset = fsdd.full()
+    x, _ = dataset[0]
+    assert torch.eq(x, torchaudio.load(dataset.files[0], normalize=False)[0].flatten()).all()
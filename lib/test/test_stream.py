@@ -0,0 +1,59 @@
+import glob, torch
+from torch.utils.data import DataLoader
+from torchfsdd import TorchFSDD, TorchFSDDGenerator, TorchFSDDStream
+
+files = sorted(glob.glob('lib/test/data/v1.0.10/*.wav'))[:100]
+fsdd = TorchFSDD(files, load_all=True)
+
+def stream_indices(stream):
+    return list(stream._rank_stream())
+
+def test_sequential():
+    stream = TorchFSDDStream(fsdd)
+    assert stream_indices(stream) == list(range(100))
+    items = list(stream)
+    assert len(items) == len(stream) == 100
+    assert torch.eq(items[10][0], fsdd[10][0]).all()
+
+def test_shuffle_deterministic():
+    a = TorchFSDDStream(fsdd, shuffle=True, block_size=8, buffer_size=16, seed=0)
+    b = TorchFSDDStream(fsdd, shuffle=True, block_size=8, buffer_size=16, seed=0)
+    epoch0 = stream_indices(a)
+    assert epoch0 == stream_indices(b)
+    assert sorted(epoch0) == list(range(100))
+    assert epoch0 != list(range(100))
+    a.set_epoch(1)
+    assert stream_indices(a) != epoch0
+
+def test_rank_sharding():
+    streams = [TorchFSDDStream(fsdd, shuffle=True, seed=0, rank=rank, world_size=3) for rank in range(3)]
+    shards = [stream_indices(stream) for stream in streams]
+    assert all(len(shard) == len(stream) == 33 for shard, stream in zip(shards, streams))
+    assert len(set().union(*shards)) == 99
+
+def test_worker_sharding():
+    stream = TorchFSDDStream(fsdd, shuffle=True, seed=0, chunk_size=4)
+    expected = [fsdd[i][1] for i in stream_indices(stream)]
+    loader = DataLoader(stream, batch_size=4, num_workers=2)
+    labels = [int(label) for _, batch_labels in loader for label in batch_labels]
+    assert labels == expected
+
+def test_resume():
+    stream = TorchFSDDStream(fsdd, shuffle=True, seed=0)
+    stream.set_epoch(3)
+    expected = stream_indices(stream)
+    iterator = iter(stream)
+    for _ in range(40):
+        next(iterator)
+    state = stream.state_dict()
+    assert state == {'epoch': 3, 'position': 40}
+
+    resumed = TorchFSDDStream(fsdd, shuffle=True, seed=0)
+    resumed.load_state_dict(state)
+    resumed.set_epoch(3)
+    labels = [y for _, y in resumed]
+    assert labels == [fsdd[i][1] for i in expected[40:]]
+
+def test_generator_stream():
+    stream = TorchFSDDGenerator(version='local', path='lib/test/data/v1.0.10').stream(world_size=2, rank=1)
+    assert len(stream) == 1500
@@ -1,9 +1,4 @@
-import importlib, platform
-from pkg_resources import packaging
-if packaging.version.parse(platform.python_version()) < packaging.version.parse('3.8'):
-    import importlib_metadata as metadata
-else:
-    from importlib import metadata
+import sys, importlib
 
 __name__ = "torchfsdd"
 __version__ = "1.0.0"
@@ -14,6 +9,33 @@ __copyright__ = f"2019-2023, {__author__}"
 MIN_TORCH_VERSION = '1.8'
 MIN_TORCHAUDIO_VERSION = '0.8'
 
+def parse_version(version):
+    """Parses the leading numeric release components of a version string, e.g. `'1.13.1+cpu'` into `(1, 13, 1)`.
+
+    Parameters
+    ----------
+    version: str
+        The version string.
+
+    Returns
+    -------
+    release: tuple of int
+        The release components.
+    """
+    release = []
+    for part in version.split('+')[0].split('.'):
+        digits = ''
+        for char in part:
+            if not char.isdigit():
+                break
+            digits += char
+        if digits == '':
+            break
+        release.append(int(digits))
+        if len(digits) < len(part):
+            break
+    return tuple(release)
+
 def check_package(pkg, min_version, url):
     """Checks whether a specified package has been installed,
     and whether the installed version meets a specified minimum.
@@ -30,24 +52,71 @@ def check_package(pkg, min_version, url):
         Package installation page URL (for help).
     """
     try:
-        importlib.import_module(pkg)
+        module = importlib.import_module(pkg)
     except ImportError:
         msg = ("Could not find a valid installation of '{pkg}' (>={min_version}), which TorchFSDD depends on.\n"
         "Visit {url} for more instructions on installing this package.").format(pkg=pkg, url=url, min_version=min_version)
         raise ModuleNotFoundError(msg)
 
-    installed_version = metadata.version(pkg)
-    if packaging.version.parse(installed_version) < packaging.version.parse(min_version):
+    installed_version = getattr(module, '__version__', None)
+    if installed_version is None:
+        if sys.version_info < (3, 8):
+            import importlib_metadata as metadata
+        else:
+            from importlib import metadata
+        installed_version = metadata.version(pkg)
+
+    if parse_version(installed_version) < parse_version(min_version):
         msg = ("Could not find a compatible installation of '{pkg}' (>={min_version}), which TorchFSDD depends on - got version {installed_version}.\n"
         "Visit {url} for more instructions on installing this package.").format(pkg=pkg, url=url, min_version=min_version, installed_version=installed_version)
         raise ImportWarning(msg)
 
-# Check that the minimum dependency versions are installed
-check_package('torch', MIN_TORCH_VERSION, url='https://pytorch.org/')
-check_package('torchaudio', MIN_TORCHAUDIO_VERSION, url='https://github.com/pytorch/audio')
+# Module of each public name, which is only imported when the name is first accessed
+_MODULES = {
+    'TorchFSDD': 'dataset', 'TorchFSDDGenerator': 'dataset',
+    'TrimSilence': 'helpers', 'TrimMFCC': 'helpers', 'Normalize': 'helpers', 'Batched': 'helpers', 'BatchCompose': 'helpers',
+    'Augment': 'helpers', 'TimeShift': 'helpers', 'Gain': 'helpers', 'AddNoise': 'helpers', 'SpeedPerturb': 'helpers',
+    'TimeMask': 'helpers', 'FrequencyMask': 'helpers',
+    'FeatureCache': 'cache',
+    'PackedRecordings': 'storage', 'SharedRecordings': 'storage', 'FSDDArchive': 'storage',
+    'BucketBatchSampler': 'batching', 'collate_padded': 'batching', 'TransformCollate': 'batching',
+    'MetadataIndex': 'index',
+    'FileLoader': 'loaders', 'ArchiveLoader': 'loaders', 'PackedLoader': 'loaders', 'ShardLoader': 'loaders',
+    'TorchFSDDStream': 'stream',
+    'DatasetMirror': 'mirror', 'file_lock': 'locks',
+    'FeatureShards': 'features',
+    'LoadingStats': 'stats'
+}
+
+# Modules that do not depend on torch or torchaudio
+_TORCH_FREE_MODULES = {'index', 'mirror', 'locks'}
+
+__all__ = list(_MODULES)
+
+_checked = False
+
+def _check_dependencies():
+    # Check that the minimum dependency versions are installed (once, when they are first needed)
+    global _checked
+    if not _checked:
+        check_package('torch', MIN_TORCH_VERSION, url='https://pytorch.org/')
+        check_package('torchaudio', MIN_TORCHAUDIO_VERSION, url='https://github.com/pytorch/audio')
+        _checked = True
+
+def __getattr__(name):
+    module = _MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module 'torchfsdd' has no attribute {name!r}")
+    if module not in _TORCH_FREE_MODULES:
+        _check_dependencies()
+    value = getattr(importlib.import_module(f'.{module}', 'torchfsdd'), name)
+    globals()[name] = value
+    return value
 
-# Import classes from the package
-from .dataset import TorchFSDD, TorchFSDDGenerator
-from .helpers import TrimSilence
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
 
-__all__ = ['TorchFSDD', 'TorchFSDDGenerator', 'TrimSilence']
+# Module-level __getattr__ is not supported before Python 3.7, so everything is imported eagerly
+if sys.version_info < (3, 7):
+    for _name in __all__:
+        __getattr__(_name)
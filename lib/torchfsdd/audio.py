@@ -0,0 +1,124 @@
+import os, struct, collections, numpy as np
+
+__all__ = ['WavHeader', 'read_wav_header', 'read_wav', 'UnsupportedWavFormat']
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+WavHeader = collections.namedtuple('WavHeader', [
+    'format', 'num_channels', 'sample_rate', 'bits_per_sample', 'num_frames', 'data_offset', 'block_align'
+])
+WavHeader.__doc__ = """Properties of a WAV file, as read from its header by :func:`read_wav_header`."""
+
+# Sample data types (and the scale that normalizes them to [-1, 1)) of the formats that can be read natively
+SAMPLE_FORMATS = {
+    (WAVE_FORMAT_PCM, 8): (np.dtype('u1'), 2. ** -7),
+    (WAVE_FORMAT_PCM, 16): (np.dtype('<i2'), 2. ** -15),
+    (WAVE_FORMAT_PCM, 32): (np.dtype('<i4'), 2. ** -31),
+    (WAVE_FORMAT_IEEE_FLOAT, 32): (np.dtype('<f4'), None),
+    (WAVE_FORMAT_IEEE_FLOAT, 64): (np.dtype('<f8'), None)
+}
+
+class UnsupportedWavFormat(ValueError):
+    """Raised by :func:`read_wav` for WAV files with a sample format that cannot be read natively."""
+
+def read_wav_header(path):
+    """Reads the header of a RIFF WAV file, without reading or decoding any audio samples.
+
+    Parameters
+    ----------
+    path: str
+        Path to the WAV file.
+
+    Returns
+    -------
+    header: :class:`WavHeader`
+        The audio format tag (e.g. ``1`` for integer PCM, with extensible formats resolved to their sub-format),
+        number of channels, sample rate, bits per sample, number of frames, the byte offset of the sample data,
+        and the number of bytes per frame.
+    """
+    with open(path, 'rb') as f:
+        return _read_header(f, path)
+
+def _read_header(f, path):
+    riff = f.read(12)
+    if len(riff) < 12 or riff[:4] != b'RIFF' or riff[8:12] != b'WAVE':
+        raise ValueError(f'{path!r} is not a RIFF WAV file')
+
+    fmt = None
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            raise ValueError(f'{path!r} has no data chunk')
+        chunk_id, size = struct.unpack('<4sI', chunk)
+
+        if chunk_id == b'fmt ':
+            body = f.read(size + (size & 1))
+            fmt_tag, num_channels, sample_rate, _, block_align, bits_per_sample = struct.unpack('<HHIIHH', body[:16])
+            if fmt_tag == WAVE_FORMAT_EXTENSIBLE and size >= 40:
+                # The sub-format GUID starts with the actual format tag
+                fmt_tag = struct.unpack('<H', body[24:26])[0]
+            fmt = (fmt_tag, num_channels, sample_rate, bits_per_sample, block_align)
+        elif chunk_id == b'data':
+            if fmt is None:
+                raise ValueError(f'{path!r} has no fmt chunk before its data chunk')
+            data_offset = f.tell()
+            break
+        else:
+            f.seek(size + (size & 1), os.SEEK_CUR)
+
+    # Some writers leave the data chunk size unset (or too large), so never go beyond the end of the file
+    fmt_tag, num_channels, sample_rate, bits_per_sample, block_align = fmt
+    size = min(size, os.fstat(f.fileno()).st_size - data_offset)
+    num_frames = size // block_align if block_align > 0 else 0
+    return WavHeader(fmt_tag, num_channels, sample_rate, bits_per_sample, num_frames, data_offset, block_align)
+
+def read_wav(path, normalize=True):
+    """Reads the samples of an uncompressed (integer PCM or IEEE float) WAV file, without a general-purpose audio decoder.
+
+    The header is parsed and the data chunk is read with :py:func:`numpy:numpy.fromfile` using the same open file,
+    so reading a recording only costs a single ``open`` and two reads.
+
+    Parameters
+    ----------
+    path: str
+        Path to the WAV file.
+
+    normalize: bool
+        Whether or not to convert integer samples to ``float32`` samples in :math:`[-1, 1)`
+        (in the same way as :py:func:`torchaudio:torchaudio.load`). Otherwise, the samples are returned in their stored data type,
+        e.g. ``int16`` for 16-bit PCM.
+
+    Returns
+    -------
+    samples: :class:`numpy:numpy.ndarray`
+        A ``(num_channels, num_frames)`` array of samples.
+
+    sample_rate: int
+        The sample rate.
+
+    Raises
+    ------
+    UnsupportedWavFormat
+        If the samples are not stored as 8, 16 or 32-bit integer PCM, or 32 or 64-bit IEEE float.
+    """
+    with open(path, 'rb') as f:
+        header = _read_header(f, path)
+        sample_format = SAMPLE_FORMATS.get((header.format, header.bits_per_sample))
+        if sample_format is None or header.num_channels < 1 or sample_format[0].itemsize * header.num_channels != header.block_align:
+            raise UnsupportedWavFormat(f'{path!r} has an unsupported sample format (format tag {header.format}, {header.bits_per_sample} bits)')
+        dtype, scale = sample_format
+        f.seek(header.data_offset)
+        samples = np.fromfile(f, dtype=dtype, count=header.num_frames * header.num_channels)
+
+    # Samples are interleaved by frame
+    samples = samples.reshape(-1, header.num_channels).T
+    if normalize:
+        if dtype == np.uint8:
+            samples = samples.astype(np.float32) - 128.
+        if scale is None:
+            samples = samples.astype(np.float32, copy=False)
+        else:
+            samples = np.multiply(samples, scale, dtype=np.float32)
+    return samples, header.sample_rate
\ No newline at end of file
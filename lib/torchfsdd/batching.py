@@ -0,0 +1,189 @@
+import numpy as np, torch
+from torch.nn.utils.rnn import pad_sequence
+from .helpers import apply_batch
+
+__all__ = ['BucketBatchSampler', 'collate_padded', 'transform_batch', 'TransformCollate']
+
+class BucketBatchSampler(torch.utils.data.Sampler):
+    """A batch sampler that groups recordings of similar length into the same batches.
+
+    Recordings are sorted by length and split into ``n_buckets`` equally sized buckets.
+    Every epoch, the indices within each bucket are shuffled and divided into batches, and the order of all batches is shuffled.
+    As each batch only contains recordings of similar length, far less padding is required than with random batches.
+
+    This should be passed to a :class:`torch:torch.utils.data.DataLoader` as the ``batch_sampler`` argument,
+    along with :func:`collate_padded` as the ``collate_fn`` argument.
+
+    .. code-block:: python
+
+        from torch.utils.data import DataLoader
+        from torchfsdd import TorchFSDDGenerator, BucketBatchSampler, collate_padded
+
+        train_set, test_set = TorchFSDDGenerator(version='master').train_test_split()
+        sampler = BucketBatchSampler(train_set.lengths(), batch_size=32, seed=0)
+        loader = DataLoader(train_set, batch_sampler=sampler, collate_fn=collate_padded)
+
+    Parameters
+    ----------
+    lengths: array-like of int
+        The length of each recording in the data set, e.g. as returned by :meth:`TorchFSDD.lengths`.
+
+    batch_size: int
+        Maximum number of recordings in each batch.
+
+    n_buckets: int
+        Number of length buckets.
+
+    shuffle: bool
+        Whether or not to shuffle the recordings within each bucket, and the order of the batches.
+        If `False`, batches are yielded in order of increasing length.
+
+    drop_last: bool
+        Whether or not to drop the last incomplete batch of each bucket.
+
+    seed: int
+        Seed for shuffling. The shuffle order of each epoch is determined by ``seed`` and the epoch number.
+    """
+    def __init__(self, lengths, batch_size, n_buckets=10, shuffle=True, drop_last=False, seed=0):
+        assert batch_size > 0
+        assert n_buckets > 0
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.seed = seed
+        self.epoch = 0
+
+        # Split the indices, ordered by length, into buckets of (approximately) equal size
+        order = np.argsort(self.lengths, kind='stable')
+        self.buckets = [bucket for bucket in np.array_split(order, min(n_buckets, max(len(order), 1))) if len(bucket) > 0]
+
+    def set_epoch(self, epoch):
+        """Sets the epoch number used to seed the next iteration.
+
+        The epoch number is automatically incremented after each iteration,
+        so this is only needed when resuming training, or to share a shuffle order across processes.
+
+        Parameters
+        ----------
+        epoch: int
+            The epoch number.
+        """
+        self.epoch = epoch
+
+    def __iter__(self):
+        rng = np.random.default_rng([self.seed, self.epoch])
+        self.epoch += 1
+
+        batches = []
+        for bucket in self.buckets:
+            if self.shuffle:
+                bucket = rng.permutation(bucket)
+            for start in range(0, len(bucket), self.batch_size):
+                batch = bucket[start:start + self.batch_size]
+                if self.drop_last and len(batch) < self.batch_size:
+                    continue
+                batches.append(batch.tolist())
+
+        if self.shuffle:
+            batches = [batches[i] for i in rng.permutation(len(batches))]
+
+        yield from batches
+
+    def __len__(self):
+        if self.drop_last:
+            return sum(len(bucket) // self.batch_size for bucket in self.buckets)
+        return sum(-(-len(bucket) // self.batch_size) for bucket in self.buckets)
+
+def collate_padded(batch, time_dim=-1, padding_value=0.):
+    """Collates a batch of variable-length items into a padded tensor, sorted by decreasing length.
+
+    The output is ready to be used with :func:`torch:torch.nn.utils.rnn.pack_padded_sequence` (with ``batch_first=True``).
+
+    Parameters
+    ----------
+    batch: list of tuple
+        The ``(x, y)`` items returned by :class:`TorchFSDD`, where ``x`` is either a 1D tensor of audio samples,
+        or a tensor of features such as the ``(n_mfcc, T)`` output of :class:`torchaudio:torchaudio.transforms.MFCC`.
+
+    time_dim: int
+        The time dimension of each ``x``.
+
+    padding_value: float
+        Value to pad the shorter items with.
+
+    Returns
+    -------
+    x: :class:`torch:torch.Tensor`
+        A ``(B, T_max, *)`` tensor of the padded items, where the time dimension has been moved to be the second dimension.
+        For example, 1D audio is collated into a ``(B, T_max)`` tensor and MFCCs into a ``(B, T_max, n_mfcc)`` tensor.
+
+    lengths: :class:`torch:torch.Tensor`
+        The length of each item, in decreasing order.
+
+    y: :class:`torch:torch.Tensor`
+        The label of each item.
+
+    order: :class:`torch:torch.Tensor`
+        The original position of each item in the batch, i.e. ``batch[order[i]]`` is the ``i``-th output item.
+    """
+    xs, ys = zip(*batch)
+    lengths = torch.tensor([x.shape[time_dim] for x in xs], dtype=torch.long)
+    lengths, order = lengths.sort(descending=True)
+    x = pad_sequence([xs[i].movedim(time_dim, 0) for i in order], batch_first=True, padding_value=padding_value)
+    y = torch.tensor([ys[i] for i in order])
+    return x, lengths, y, order
+
+def transform_batch(xs, transforms, indices=None):
+    """Applies batch transformations to a list of variable-length recordings, with a single call on a padded batch.
+
+    Parameters
+    ----------
+    xs: list of torch.Tensor
+        One-dimensional tensors of audio samples.
+
+    transforms: :class:`BatchCompose` or :class:`Batched`
+        Transformations with a ``batch(x, lengths)`` method.
+
+    indices: list of int, optional
+        Indices of the recordings, passed on to transformations that depend on them (such as :class:`Augment`).
+
+    Returns
+    -------
+    xs: list of :class:`torch:torch.Tensor`
+        The transformed recordings, as views of the transformed batch (trimmed to their lengths along the last dimension).
+    """
+    lengths = torch.tensor([len(x) for x in xs], dtype=torch.long)
+    x, lengths = apply_batch(transforms, pad_sequence(list(xs), batch_first=True), lengths, indices)
+    return [x[i, ..., :length] for i, length in enumerate(lengths.tolist())]
+
+class TransformCollate:
+    """A collate function that applies batch transformations to a batch of raw recordings before collating it.
+
+    Unlike the ``transforms`` of :class:`TorchFSDD` which are applied separately to each item,
+    the transformations are applied once to the whole (padded) batch.
+
+    .. code-block:: python
+
+        from torch.utils.data import DataLoader
+        from torchfsdd import TrimSilence, Batched, BatchCompose, TransformCollate
+        from torchaudio.transforms import MFCC
+
+        transforms = BatchCompose([TrimSilence(threshold=0.05), Batched(MFCC(sample_rate=8e3, n_mfcc=13))])
+        loader = DataLoader(train_set, batch_size=32, collate_fn=TransformCollate(transforms))
+
+    Parameters
+    ----------
+    transforms: :class:`BatchCompose` or :class:`Batched`
+        Transformations with a ``batch(x, lengths)`` method.
+
+    collate_fn: callable
+        The collate function to apply to the transformed items.
+    """
+    def __init__(self, transforms, collate_fn=collate_padded):
+        self.transforms = transforms
+        self.collate_fn = collate_fn
+
+    def __call__(self, batch):
+        xs, ys = zip(*batch)
+        return self.collate_fn(list(zip(transform_batch(xs, self.transforms), ys)))
@@ -0,0 +1,334 @@
+import os, glob, types, shutil, hashlib, tempfile, functools, collections, numpy as np, torch
+from .locks import file_lock
+
+__all__ = ['FeatureCache', 'fingerprint']
+
+def fingerprint(obj):
+    """Computes a deterministic hash of a (transformation) object.
+
+    Objects are hashed structurally by their class and attributes, so that two separately
+    constructed transformation pipelines with identical configurations produce the same fingerprint.
+    Tensors (such as the filter banks held by :py:mod:`torchaudio:torchaudio.transforms`) and arrays are hashed by value.
+
+    Functions (including lambdas) are hashed by their name, bytecode, constants, referenced names,
+    default arguments and closure variables, and :py:func:`python:functools.partial` objects by their function and arguments.
+    The values of global variables referenced by functions are not hashed.
+
+    Parameters
+    ----------
+    obj: object
+        The object to fingerprint, e.g. a callable transformation or a dictionary of keyword arguments.
+
+    Returns
+    -------
+    digest: str
+        A hexadecimal SHA-256 digest.
+
+    Raises
+    ------
+    TypeError
+        If ``obj`` contains a callable that cannot be fingerprinted (e.g. a callable extension object without attributes),
+        as two such callables could not be told apart.
+    """
+    h = hashlib.sha256()
+    _update(h, obj, {})
+    return h.hexdigest()
+
+def _update(h, obj, seen):
+    if obj is None or isinstance(obj, (bool, int, float, complex, str, bytes)):
+        h.update(repr(obj).encode())
+    elif isinstance(obj, torch.Tensor):
+        t = obj.detach().cpu().contiguous()
+        h.update(f'Tensor{t.dtype}{tuple(t.shape)}'.encode())
+        h.update(t.numpy().tobytes())
+    elif isinstance(obj, (np.ndarray, np.generic)):
+        a = np.ascontiguousarray(obj)
+        h.update(f'ndarray{a.dtype.str}{a.shape}'.encode())
+        h.update(repr(a.tolist()).encode() if a.dtype.hasobject else a.tobytes())
+    elif isinstance(obj, (torch.dtype, torch.device)):
+        h.update(str(obj).encode())
+    elif id(obj) in seen:
+        h.update(b'<cycle>')
+    else:
+        # Referencing the object keeps its id from being reused by a temporary object
+        seen[id(obj)] = obj
+        if isinstance(obj, (list, tuple)):
+            h.update(type(obj).__name__.encode())
+            for item in obj:
+                _update(h, item, seen)
+        elif isinstance(obj, (set, frozenset)):
+            h.update(type(obj).__name__.encode())
+            for item in sorted(repr(item) for item in obj):
+                h.update(item.encode())
+        elif isinstance(obj, dict):
+            h.update(b'dict')
+            for key in sorted(obj, key=repr):
+                _update(h, key, seen)
+                _update(h, obj[key], seen)
+        else:
+            cls = type(obj)
+            h.update(f'{cls.__module__}.{cls.__qualname__}'.encode())
+            # Callables without (meaningful) attributes are checked first, as functions and partials also have a __dict__
+            if isinstance(obj, types.FunctionType):
+                h.update(f'{obj.__module__}.{obj.__qualname__}'.encode())
+                _update(h, obj.__code__, seen)
+                _update(h, (obj.__defaults__, obj.__kwdefaults__, vars(obj)), seen)
+                _update(h, tuple(cell.cell_contents for cell in obj.__closure__ or ()), seen)
+            elif isinstance(obj, types.CodeType):
+                h.update(obj.co_code)
+                _update(h, (obj.co_consts, obj.co_names, obj.co_varnames), seen)
+            elif isinstance(obj, functools.partial):
+                _update(h, (obj.func, obj.args, obj.keywords), seen)
+            elif isinstance(obj, types.MethodType):
+                _update(h, (obj.__func__, obj.__self__), seen)
+            elif isinstance(obj, (type, types.ModuleType)):
+                h.update(f'{getattr(obj, "__module__", None)}.{getattr(obj, "__qualname__", obj.__name__)}'.encode())
+            elif isinstance(obj, types.BuiltinFunctionType):
+                # Built-in functions are identified by name (and the object they are bound to, if any)
+                h.update(f'{obj.__module__}.{obj.__qualname__}'.encode())
+                if obj.__self__ is not None and not isinstance(obj.__self__, types.ModuleType):
+                    _update(h, obj.__self__, seen)
+            elif hasattr(obj, '__dict__') or hasattr(cls, '__slots__'):
+                slots = [slot for c in cls.__mro__ for slot in _slots(c) if not slot.startswith('__') and hasattr(obj, slot)]
+                _update(h, (getattr(obj, '__dict__', {}), {slot: getattr(obj, slot) for slot in slots}), seen)
+            elif callable(obj) and hasattr(obj, '__name__'):
+                # Stateless extension callables (such as NumPy ufuncs) are identified by name
+                h.update(f'{getattr(obj, "__module__", None)}.{obj.__name__}'.encode())
+            elif callable(obj):
+                raise TypeError(f'Cannot fingerprint {obj!r}, as its state is not accessible')
+            else:
+                h.update(repr(obj).encode())
+
+def _slots(cls):
+    slots = getattr(cls, '__slots__', ())
+    return (slots,) if isinstance(slots, str) else slots
+
+class FeatureCache:
+    """An on-disk cache of transformed recordings, shared by :class:`TorchFSDD` data sets.
+
+    Items are stored as individual files, keyed by a hash of the recording file path, its modification time and size,
+    the keyword arguments passed to :py:func:`torchaudio:torchaudio.load`, and a :func:`fingerprint` of the transformations.
+    Modifying a recording or changing the transformation pipeline therefore never serves stale items.
+
+    .. warning::
+        Only use a cache with deterministic transformations (i.e. no random augmentation),
+        as every epoch after the first is served the same cached items.
+
+    .. note::
+        When used with a :class:`torch:torch.utils.data.DataLoader` with ``num_workers > 0``,
+        each worker process keeps its own :attr:`hits`, :attr:`misses` and :attr:`evictions` counters.
+        The ``max_size`` cap applies to the directory as a whole: the total size of the cache is kept in the directory
+        and updated under a file lock by every process that stores an item, and items are evicted by the process
+        that exceeds the cap (after recomputing the size and recency of every item from the directory).
+
+    Parameters
+    ----------
+    path: str
+        Directory to store the cached items in (created if it does not exist).
+
+    max_size: int, optional
+        Maximum total size of the cache in bytes. When exceeded, the least recently used items are evicted.
+        If not specified, the cache is unbounded.
+    """
+    def __init__(self, path, max_size=None):
+        assert max_size is None or max_size > 0
+        self.path = path
+        self.max_size = max_size
+        self.hits, self.misses, self.evictions = 0, 0, 0
+        os.makedirs(self.path, exist_ok=True)
+        self._sync()
+
+    def _scan(self):
+        # Order existing entries from least to most recently used
+        entries = []
+        for file in glob.glob(os.path.join(self.path, '*', '*.pt')):
+            try:
+                stat = os.stat(file)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, file, stat.st_size))
+        self._entries = collections.OrderedDict((file, size) for _, file, size in sorted(entries))
+        self.size = sum(self._entries.values())
+
+    def _sync(self):
+        # Rescans the directory, and records its total size for the other processes sharing it (if the size is capped)
+        if self.max_size is None:
+            self._scan()
+            return
+        with file_lock(os.path.join(self.path, '.lock')):
+            self._scan()
+            self._write_size(self.size)
+
+    def _read_size(self):
+        try:
+            with open(os.path.join(self.path, '.size')) as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            # Force a rescan if the recorded size is missing or corrupt
+            return float('inf')
+
+    def _write_size(self, size):
+        with open(os.path.join(self.path, '.size'), 'w') as f:
+            f.write(str(size))
+
+    def key(self, file, namespace, member=None):
+        """Generates the cache key for a recording.
+
+        Parameters
+        ----------
+        file: str
+            Path to the WAV audio recording (or the :class:`FSDDArchive` containing it).
+
+        namespace: str
+            A fingerprint of the loading arguments and transformations, as returned by :meth:`namespace`.
+
+        member: str, optional
+            Name of the recording within ``file``, if ``file`` is an archive.
+
+        Returns
+        -------
+        key: str
+            The path of the cached item.
+        """
+        stat = os.stat(file)
+        digest = hashlib.sha256(f'{os.path.abspath(file)}|{member}|{stat.st_mtime_ns}|{stat.st_size}'.encode()).hexdigest()
+        return os.path.join(self.path, namespace, f'{digest}.pt')
+
+    @staticmethod
+    def namespace(transforms, args):
+        """Fingerprints a transformation pipeline along with the :py:func:`torchaudio:torchaudio.load` arguments.
+
+        Parameters
+        ----------
+        transforms: callable, optional
+            The transformations applied to each recording.
+
+        args: dict
+            Keyword arguments passed to :py:func:`torchaudio:torchaudio.load`,
+            along with the ``dtype`` and ``decoder`` of the data set if they are not the defaults.
+
+        Returns
+        -------
+        namespace: str
+            A fingerprint identifying the items produced with these settings.
+
+        Raises
+        ------
+        TypeError
+            If the transformations cannot be fingerprinted, in which case they cannot be cached.
+        """
+        return fingerprint((transforms, args))[:32]
+
+    def get(self, key):
+        """Retrieves an item from the cache.
+
+        Parameters
+        ----------
+        key: str
+            The cache key, as returned by :meth:`key`.
+
+        Returns
+        -------
+        item: tuple, optional
+            The cached ``(x, y)`` item, or `None` if the item is not cached.
+        """
+        try:
+            item = torch.load(key)
+            os.utime(key)
+        except (FileNotFoundError, EOFError, RuntimeError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        if key in self._entries:
+            self._entries.move_to_end(key)
+        return item
+
+    def put(self, key, item):
+        """Stores an item in the cache, evicting least recently used items if the size cap is exceeded.
+
+        Parameters
+        ----------
+        key: str
+            The cache key, as returned by :meth:`key`.
+
+        item: tuple
+            The ``(x, y)`` item to store.
+        """
+        directory = os.path.dirname(key)
+        os.makedirs(directory, exist_ok=True)
+
+        # Tensors may be views (e.g. trimmed slices), which would otherwise save their entire underlying storage
+        item = tuple(v.clone() if isinstance(v, torch.Tensor) else v for v in item)
+
+        try:
+            previous = os.path.getsize(key)
+        except FileNotFoundError:
+            previous = 0
+
+        # Write to a temporary file and rename, so that concurrent readers never see partial items
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                torch.save(item, f)
+            os.replace(tmp, key)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+        size = os.path.getsize(key)
+        self.size += size - self._entries.pop(key, 0)
+        self._entries[key] = size
+        if self.max_size is None:
+            return
+
+        # Other processes (e.g. DataLoader workers) may be storing items in the same directory,
+        # so the cap is checked against the total size recorded in the directory, rather than this process' own
+        with file_lock(os.path.join(self.path, '.lock')):
+            total = self._read_size() + size - previous
+            if total > self.max_size:
+                self._scan()
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                self._evict()
+                total = self.size
+            self._write_size(total)
+
+    def _evict(self):
+        while self.size > self.max_size and len(self._entries) > 1:
+            file, size = self._entries.popitem(last=False)
+            self.size -= size
+            try:
+                os.remove(file)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+
+    def invalidate(self, transforms, args=None):
+        """Removes the cached items produced by a specific transformation pipeline.
+
+        Parameters
+        ----------
+        transforms: callable, optional
+            The transformations applied to each recording.
+
+        args: dict, optional
+            Keyword arguments passed to :py:func:`torchaudio:torchaudio.load`,
+            along with the ``dtype`` and ``decoder`` of the data set if they are not the defaults.
+        """
+        shutil.rmtree(os.path.join(self.path, self.namespace(transforms, args or {})), ignore_errors=True)
+        self._sync()
+
+    def clear(self):
+        """Removes all cached items."""
+        for directory in glob.glob(os.path.join(self.path, '*', '')):
+            shutil.rmtree(directory, ignore_errors=True)
+        self._sync()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return (f'{self.__class__.__name__}(path={self.path!r}, max_size={self.max_size}, '
+            f'hits={self.hits}, misses={self.misses}, evictions={self.evictions})')
\ No newline at end of file
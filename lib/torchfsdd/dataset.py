@@ -1,4 +1,16 @@
-import os, shutil, subprocess, glob, torch, torchaudio
+import os, sys, copy, time, shutil, asyncio, queue, threading, subprocess, glob, collections, numpy as np, torch
+from concurrent.futures import ThreadPoolExecutor
+from .index import MetadataIndex
+from .cache import FeatureCache, fingerprint
+from .storage import PackedRecordings, SharedRecordings, FSDDArchive
+from .batching import transform_batch, collate_padded
+from .helpers import apply_batch
+from .loaders import FileLoader, ArchiveLoader, PackedLoader, ShardLoader
+from .features import FeatureShards
+from .stats import LoadingStats
+from .stream import TorchFSDDStream
+from .mirror import DatasetMirror, default_cache_dir
+from .locks import file_lock
 
 REPOSITORY = {
     'name': 'free-spoken-digit-dataset',
@@ -7,6 +19,21 @@ REPOSITORY = {
 
 N_REC = 50
 
+INDEX_FILE = '.torchfsdd-index.npz'
+
+def _remove_archive(path):
+    # Removes an ingest archive (under its lock, so that it is not removed while it is being written or reused)
+    key = os.path.splitext(os.path.basename(path))[0]
+    try:
+        with file_lock(os.path.join(os.path.dirname(os.path.dirname(path)), 'locks', f'ingest-{key}.lock')):
+            os.remove(path)
+    except OSError:
+        pass
+
+def _as_array(values):
+    # Accept single values as well as any iterable (e.g. a range)
+    return np.atleast_1d(values if np.isscalar(values) else np.asarray(list(values)))
+
 class TorchFSDDGenerator:
     """A :class:`torch:torch.utils.data.Dataset` generator for splits of the Free Spoken Digit Dataset.
 
@@ -19,12 +46,24 @@ class TorchFSDDGenerator:
         Alternatively, if you already have a local copy of the dataset that you would like to use,
         you can set this argument to `'local'` and provide a path to the folder containing the WAV files, as the ``path`` argument.
 
+        If you have exported the dataset to a single-file archive with :meth:`export`,
+        you can set this argument to `'archive'` and provide the path to the archive file as the ``path`` argument.
+        Recordings are then read from a memory map of the archive, instead of opening each WAV file.
+
+        If you have precomputed features with :meth:`export_features`, you can set this argument to `'features'`
+        and provide the path to the shard directory as the ``path`` argument. Items are then read directly from
+        memory-mapped feature shards, without decoding audio or computing features.
+
     path: str, optional
         If ``version`` is a Git branch name or version tag, then this is the path where the Git repository will be cloned to
         (a new folder will be created at the specified path). If none is specified, then :py:func:`python:os.getcwd` is used.
 
         If ``version`` is set to `'local'`, then this is the path to the folder containing the WAV audio recordings.
 
+        If ``version`` is set to `'archive'`, then this is the path to the archive file.
+
+        If ``version`` is set to `'features'`, then this is the path to the feature shard directory.
+
     transforms: callable, optional
         A callable transformation to apply to a 1D :class:`torch:torch.Tensor` of audio samples.
 
@@ -39,13 +78,120 @@ class TorchFSDDGenerator:
 
             :class:`TorchFSDD`
 
+    batch_transforms: :class:`BatchCompose` or :class:`Batched`, optional
+        Transformations to apply to whole batches of recordings, rather than to each item.
+
+        .. seealso::
+
+            :class:`TorchFSDD`
+
+    cache: :class:`FeatureCache` or str, optional
+        An on-disk cache of transformed recordings (or a directory to create one in).
+
+        .. seealso::
+
+            :class:`TorchFSDD`
+
+    num_workers: int
+        Number of threads used to decode recordings in parallel when ``load_all`` is `True`.
+
+        .. seealso::
+
+            :class:`TorchFSDD`
+
+    verbose: bool
+        Whether or not to display loading progress and timing when ``load_all`` is `True`.
+
+    read_headers: bool
+        Whether or not to read the number of samples and sample rate of each recording from its WAV header
+        (without decoding the audio) when building the metadata index.
+
+        .. seealso::
+
+            :class:`MetadataIndex`
+
+    save_index: bool
+        Whether or not to save the metadata index next to the recordings (in a file named ``.torchfsdd-index.npz``),
+        and reuse it on later runs if the recordings are unchanged.
+
+    cache_dir: str, optional
+        If ``version`` is a Git branch name or version tag, a directory for a shared :class:`DatasetMirror` of FSDD versions.
+        The version is then fetched into the mirror only once (and ``path`` is not used), instead of being cloned on every run.
+        This is also the directory that recordings converted at ingest (see ``sample_rate``) are cached in.
+
+    source: str, optional
+        A pre-downloaded tarball or local Git repository to fetch the version from, instead of GitHub (see :meth:`DatasetMirror.fetch`).
+        If specified without ``cache_dir``, the default mirror directory is used.
+
+    stats: :class:`LoadingStats` or bool, optional
+        Statistics to record the loading of items of every generated data set into (or `True` to create them).
+
+        .. seealso::
+
+            :class:`TorchFSDD`
+
+    decoder: str or callable
+        The audio reader used to load WAV files.
+
+        .. seealso::
+
+            :class:`FileLoader`
+
+    dtype: :class:`torch:torch.dtype`
+        The data type of the loaded samples (:class:`torch:torch.float32` or :class:`torch:torch.int16`).
+
+        .. seealso::
+
+            :class:`TorchFSDD`
+
+    shared: str, optional
+        Name of a shared memory segment to load the recordings into (if ``load_all`` is `True`), shared by every process on the host.
+
+        .. seealso::
+
+            :class:`TorchFSDD`
+
+    sample_rate: int, optional
+        Sample rate to convert the recordings to at ingest.
+
+        If ``sample_rate`` or ``normalize_to`` is specified, every recording is decoded, resampled and normalized once
+        (in parallel, with ``num_workers`` threads) into an :class:`FSDDArchive` in the ``ingest`` folder of ``cache_dir``
+        (or the default :class:`DatasetMirror` directory), with samples of the given ``dtype``.
+        The archive is keyed by the names, sizes and modification times of the recordings and the conversion options
+        (including a :func:`~torchfsdd.cache.fingerprint` of a callable ``decoder``, so changing the decoder converts the recordings again),
+        so later runs reuse it, and data sets read the converted recordings from it without any per-item conversion.
+
+        .. code-block:: python
+
+            # Convert the recordings to 16 kHz once, instead of resampling them in transforms on every access
+            fsdd = TorchFSDDGenerator(version='local', path='recordings', sample_rate=16000, normalize_to='peak')
+
+    normalize_to: str, optional
+        How to normalize the level of each recording at ingest: `'peak'` or `'rms'` (see :meth:`FSDDArchive.write`).
+
     **args: optional
         Arbitrary keyword arguments passed on to :py:func:`torchaudio:torchaudio.load`.
+        These are not used if ``version`` is `'archive'` or `'features'`, as the recordings have already been decoded.
     """
-    def __init__(self, version='master', path=None, transforms=None, load_all=False, **args):
+    def __init__(self, version='master', path=None, transforms=None, load_all=False, batch_transforms=None, cache=None, num_workers=0,
+                 verbose=False, read_headers=False, save_index=False, cache_dir=None, source=None, stats=None,
+                 decoder='auto', dtype=torch.float32, shared=None, sample_rate=None, normalize_to=None, **args):
+        self.archive = None
+        self.features = None
+
         if version == 'local':
             if path is None:
                 raise ValueError('Expected path to be a directory containing WAV recordings')
+        elif version == 'archive':
+            if path is None:
+                raise ValueError('Expected path to be a TorchFSDD archive file')
+            self.archive = FSDDArchive(path)
+        elif version == 'features':
+            if path is None:
+                raise ValueError('Expected path to be a TorchFSDD feature shard directory')
+            self.features = FeatureShards(path)
+        elif cache_dir is not None or source is not None:
+            path = DatasetMirror(cache_dir).fetch(version, source=source)
         else:
             path = os.getcwd() if path is None else path
             repo_path = os.path.join(path, REPOSITORY['name'])
@@ -61,8 +207,412 @@ class TorchFSDDGenerator:
         self.path = path
         self.transforms = transforms
         self.load_all = load_all
+        self.batch_transforms = batch_transforms
+        self.cache = FeatureCache(cache) if isinstance(cache, str) else cache
+        self.num_workers = num_workers
+        self.verbose = verbose
+        self.stats = LoadingStats() if stats is True else (stats or None)
+        self.decoder = decoder
+        self.dtype = dtype
+        self.shared = shared
+        self.cache_dir = cache_dir
+        self.sample_rate = sample_rate
+        self.normalize_to = normalize_to
         self.args = args
-        self.all_files = glob.glob(os.path.join(self.path, '*.wav'))
+
+        # Index of the WAV files that are converted at ingest (if any)
+        self._sources = None
+        if sample_rate is not None or normalize_to is not None:
+            if self.archive is not None or self.features is not None:
+                raise ValueError('Recordings can only be converted at ingest from WAV files')
+            self._sources = MetadataIndex.build(glob.glob(os.path.join(self.path, '*.wav')))
+            self.archive = self._ingest(self._sources)
+
+        if self.archive is not None:
+            self.index = MetadataIndex.from_archive(self.archive)
+        elif self.features is not None:
+            self.index = self.features.index
+        else:
+            self.index = self._build_index(glob.glob(os.path.join(self.path, '*.wav')), read_headers, save_index)
+        self.all_files = self.index.paths.tolist()
+        self._full_set = None
+
+    def _ingest(self, sources, reuse=None):
+        files, sample_rate, normalize_to = sources.paths.tolist(), self.sample_rate, self.normalize_to
+        stats = [(os.path.basename(file), int(size), int(mtime)) for file, size, mtime in zip(files, sources.sizes, sources.mtimes)]
+        key = fingerprint((FSDDArchive.FORMAT_VERSION, stats, sample_rate, normalize_to, str(self.dtype), self.decoder, self.args))
+        cache_dir = os.path.abspath(default_cache_dir() if self.cache_dir is None else self.cache_dir)
+        for folder in ('ingest', 'locks'):
+            os.makedirs(os.path.join(cache_dir, folder), exist_ok=True)
+        path = os.path.join(cache_dir, 'ingest', f'{key}.bin')
+
+        # Concurrent jobs wait for a single job to convert the recordings, rather than converting them again
+        with file_lock(os.path.join(cache_dir, 'locks', f'ingest-{key}.lock')):
+            if os.path.isfile(path):
+                try:
+                    return FSDDArchive(path)
+                except ValueError:
+                    pass
+
+            start = time.perf_counter()
+            archive = FSDDArchive.write(path, files, dtype=np.int16 if self.dtype == torch.int16 else np.float32, sample_rate=sample_rate,
+                normalize_to=normalize_to, num_workers=self.num_workers, decoder=self.decoder, reuse=reuse, **self.args)
+            if self.verbose:
+                n_converted = len(files) - len(set(map(os.path.basename, files)) & set(reuse or ()))
+                print(f'Converted {n_converted} recordings in {time.perf_counter() - start:.2f}s', file=sys.stderr)
+            return archive
+
+    def _build_index(self, files, read_headers, save_index):
+        index_path = os.path.join(self.path, INDEX_FILE)
+
+        # Reuse a saved index if it is still up to date with the recordings
+        if save_index and os.path.isfile(index_path):
+            try:
+                index = MetadataIndex.load(index_path)
+                if index.matches(files) and (index.has_headers or not read_headers):
+                    return index
+            except (OSError, ValueError, KeyError):
+                pass
+
+        index = MetadataIndex.build(files, headers=read_headers)
+        if save_index:
+            index.save(index_path)
+        return index
+
+    def refresh(self, save_index=False, remove_replaced=False):
+        """Updates the generator for recordings that have been added to, removed from or changed in ``path``
+        (by modification time or size), e.g. as new recordings are added to a local folder.
+
+        Only the delta is processed: the metadata index is updated without reading the headers of unchanged recordings,
+        recordings converted at ingest (see ``sample_rate``) are written to a new archive with the unchanged recordings copied
+        from the previous one, and if ``load_all`` is `True`, only the new and changed recordings are decoded into the in-memory store
+        (see :meth:`TorchFSDD.update`). Unchanged recordings are never decoded again. Entries of a :class:`FeatureCache`
+        are keyed by the modification time and size of each file, so changed recordings are transformed again when accessed.
+
+        Splits generated after refreshing (e.g. with :meth:`train_test_split`) include the new recordings,
+        while previously generated data sets are unaffected. The archive of recordings converted at ingest that is replaced
+        by a refresh is kept in ``cache_dir``, as other generators, worker processes or jobs sharing the directory may still use it,
+        unless ``remove_replaced`` is `True`.
+
+        .. code-block:: python
+
+            fsdd = TorchFSDDGenerator(version='local', path='recordings', load_all=True)
+            ...
+            changes = fsdd.refresh()
+            train_set, test_set = fsdd.train_test_split()
+
+        Parameters
+        ----------
+        save_index: bool
+            Whether or not to save the updated metadata index of the WAV recordings next to them (in ``.torchfsdd-index.npz``).
+            This also applies to recordings converted at ingest, in which case the index of the original recordings is saved.
+
+        remove_replaced: bool
+            Whether or not to remove the archive of recordings converted at ingest that is replaced by the refresh from ``cache_dir``.
+            Previously generated data sets in this process can still read it, but any other process that opens it
+            (e.g. a new :class:`torch:torch.utils.data.DataLoader` worker process, or another job sharing ``cache_dir``) will fail,
+            so this should only be used if nothing else uses the archive.
+
+        Returns
+        -------
+        changes: dict
+            The sorted paths of the `'added'`, `'removed'` and `'changed'` recordings.
+        """
+        if self.features is not None or (self.archive is not None and self._sources is None):
+            raise ValueError('Only generators of WAV recordings in a directory can be refreshed')
+        if self.load_all and self.shared is not None:
+            raise ValueError('Generators with shared recordings cannot be refreshed')
+
+        files = glob.glob(os.path.join(self.path, '*.wav'))
+        if self._sources is None:
+            index, changes = self.index.update(files)
+            changed = changes['changed']
+            if save_index:
+                index.save(os.path.join(self.path, INDEX_FILE))
+        else:
+            sources, changes = self._sources.update(files)
+            if save_index:
+                sources.save(os.path.join(self.path, INDEX_FILE))
+            if not any(changes.values()):
+                return changes
+
+            # Convert the new and changed recordings into a new archive
+            changed = [os.path.basename(file) for file in changes['changed']]
+            previous, stale, sample_rates = self.archive, set(changed), self.archive.index['sample_rate']
+            reuse = {name: (previous[i], int(sample_rates[i])) for i, name in enumerate(previous.files) if name not in stale}
+            self.archive = self._ingest(sources, reuse=reuse)
+            self._sources = sources
+            index = MetadataIndex.from_archive(self.archive)
+
+            # Existing memory maps of a removed archive remain valid, so only processes that open it again are affected
+            if remove_replaced and os.path.abspath(previous.path) != os.path.abspath(self.archive.path):
+                _remove_archive(os.path.abspath(previous.path))
+            del previous, reuse
+
+        self.index = index
+        self.all_files = index.paths.tolist()
+        if self._full_set is not None and any(changes.values()):
+            self._full_set = self._full_set.update(self.all_files, labels=index.digits, changed=changed, archive=self.archive,
+                num_workers=self.num_workers, verbose=self.verbose)
+        return changes
+
+    def _dataset(self, indices):
+        # Every split is a subset of a single data set for all recordings, so that they share one in-memory store
+        if self._full_set is None:
+            self._full_set = TorchFSDD(self.all_files, self.transforms, self.load_all, cache=self.cache, num_workers=self.num_workers,
+                verbose=self.verbose, archive=self.archive, labels=self.index.digits, batch_transforms=self.batch_transforms,
+                features=self.features, stats=self.stats, decoder=self.decoder, dtype=self.dtype, shared=self.shared,
+                **self.args)
+        return self._full_set.subset(indices)
+
+    def subset(self, indices):
+        """Generates a data set wrapper for a subset of the recordings.
+
+        Parameters
+        ----------
+        indices: array-like of int
+            Indices of the recordings (in :attr:`all_files` and :attr:`index`) to include in the subset.
+
+        Returns
+        -------
+        subset: :class:`TorchFSDD`
+            The :class:`torch:torch.utils.data.Dataset` wrapper for the subset.
+        """
+        return self._dataset(np.asarray(indices, dtype=np.int64))
+
+    def mask(self, digits=None, speakers=None, rec_nums=None):
+        """Computes a boolean mask of the recordings that match a query, as a vectorized operation over the metadata index.
+
+        Parameters
+        ----------
+        digits: int or iterable of int, optional
+            Digits to select.
+
+        speakers: str or iterable of str, optional
+            Names of speakers to select.
+
+        rec_nums: int or iterable of int, optional
+            Recording numbers to select, e.g. ``range(10)``.
+
+        Returns
+        -------
+        mask: :class:`numpy:numpy.ndarray`
+            A boolean array indicating which recordings (in :attr:`all_files` and :attr:`index`) match every given criterion.
+        """
+        mask = np.ones(len(self.index), dtype=bool)
+        if digits is not None:
+            mask &= np.isin(self.index.digits, _as_array(digits))
+        if speakers is not None:
+            speakers = [speakers] if isinstance(speakers, str) else list(speakers)
+            unknown = set(speakers) - set(self.index.speaker_names)
+            if len(unknown) > 0:
+                raise ValueError(f'Unknown speakers: {sorted(unknown)}')
+            codes = [self.index.speaker_names.index(speaker) for speaker in speakers]
+            mask &= np.isin(self.index.speakers, codes)
+        if rec_nums is not None:
+            mask &= np.isin(self.index.rec_nums, _as_array(rec_nums))
+        return mask
+
+    def select(self, digits=None, speakers=None, rec_nums=None, exclude=False):
+        """Generates a data set wrapper for the recordings that match a query.
+
+        .. code-block:: python
+
+            # Hold out a speaker
+            train_set = fsdd.select(speakers='jackson', exclude=True)
+            test_set = fsdd.select(speakers='jackson')
+
+            # Only use a subset of the digits and recordings
+            subset = fsdd.select(digits=[0, 1, 2], rec_nums=range(10))
+
+        Parameters
+        ----------
+        digits: int or iterable of int, optional
+            Digits to select.
+
+        speakers: str or iterable of str, optional
+            Names of speakers to select.
+
+        rec_nums: int or iterable of int, optional
+            Recording numbers to select, e.g. ``range(10)``.
+
+        exclude: bool
+            Whether to select the recordings that do **not** match the query instead.
+
+        Returns
+        -------
+        subset: :class:`TorchFSDD`
+            The :class:`torch:torch.utils.data.Dataset` wrapper for the selected recordings.
+
+        .. seealso::
+
+            :meth:`mask`
+        """
+        mask = self.mask(digits=digits, speakers=speakers, rec_nums=rec_nums)
+        return self._dataset(np.flatnonzero(~mask if exclude else mask))
+
+    def stream(self, **kwargs):
+        """Generates a streaming :class:`torch:torch.utils.data.IterableDataset` over the entire data set.
+
+        Parameters
+        ----------
+        **kwargs: optional
+            Keyword arguments passed on to :class:`TorchFSDDStream`.
+
+        Returns
+        -------
+        stream: :class:`TorchFSDDStream`
+            The streaming data set.
+        """
+        return TorchFSDDStream(self.full(), **kwargs)
+
+    def kfold(self, n_splits=5, shuffle=False, seed=None):
+        """Generates training and test data set wrappers for each fold of a k-fold cross-validation.
+
+        Folds are subsets backed by index arrays, so generating them does not reload any recordings.
+
+        Parameters
+        ----------
+        n_splits: int
+            Number of folds.
+
+        shuffle: bool
+            Whether or not to shuffle the recordings before splitting them into folds.
+
+        seed: int, optional
+            Seed for shuffling.
+
+        Returns
+        -------
+        folds: generator of tuple
+            A generator of ``(train_set, test_set)`` :class:`TorchFSDD` pairs, one for each fold.
+        """
+        assert 1 < n_splits <= len(self.index)
+        positions = np.arange(len(self.index))
+        if shuffle:
+            positions = np.random.default_rng(seed).permutation(positions)
+
+        for test in np.array_split(positions, n_splits):
+            mask = np.zeros(len(self.index), dtype=bool)
+            mask[test] = True
+            yield self._dataset(np.flatnonzero(~mask)), self._dataset(np.flatnonzero(mask))
+
+    def group_kfold(self, n_splits=5, groups='speaker'):
+        """Generates training and test data set wrappers for each fold of a grouped k-fold cross-validation.
+
+        The recordings of each group (e.g. each speaker) are always in the same fold, so each test set only
+        contains groups that are absent from the corresponding training set. Groups are assigned to folds
+        such that the folds are as balanced in size as possible.
+
+        Parameters
+        ----------
+        n_splits: int
+            Number of folds (at most the number of groups).
+
+        groups: str
+            The metadata to group recordings by: `'speaker'`, `'digit'` or `'rec_num'`.
+
+        Returns
+        -------
+        folds: generator of tuple
+            A generator of ``(train_set, test_set)`` :class:`TorchFSDD` pairs, one for each fold.
+        """
+        columns = {'speaker': self.index.speakers, 'digit': self.index.digits, 'rec_num': self.index.rec_nums}
+        if groups not in columns:
+            raise ValueError(f"Expected groups to be one of {list(columns)}, got {groups!r}")
+
+        unique, inverse, counts = np.unique(columns[groups], return_inverse=True, return_counts=True)
+        assert 1 < n_splits <= len(unique)
+
+        # Greedily assign the largest remaining group to the smallest fold
+        group_folds, fold_sizes = np.zeros(len(unique), dtype=np.int64), np.zeros(n_splits, dtype=np.int64)
+        for group in np.argsort(-counts, kind='stable'):
+            fold = np.argmin(fold_sizes)
+            group_folds[group] = fold
+            fold_sizes[fold] += counts[group]
+
+        folds = group_folds[inverse]
+        for fold in range(n_splits):
+            mask = folds == fold
+            yield self._dataset(np.flatnonzero(~mask)), self._dataset(np.flatnonzero(mask))
+
+    def export(self, path, dtype=np.float32):
+        """Exports every recording to a single-file archive.
+
+        The archive can then be copied to other machines and loaded with ``TorchFSDDGenerator(version='archive', path=path)``,
+        which avoids globbing and opening thousands of small WAV files.
+
+        Parameters
+        ----------
+        path: str
+            Path of the archive file to create.
+
+        dtype: :class:`numpy:numpy.dtype`
+            The data type to store the samples as (``float32`` or ``int16``).
+
+        Returns
+        -------
+        archive: :class:`FSDDArchive`
+            The written archive.
+        """
+        if self.archive is not None:
+            raise ValueError('Generator was already loaded from an archive')
+        if self.features is not None:
+            raise ValueError('Generator was loaded from feature shards, which do not contain the recordings')
+        return FSDDArchive.write(path, sorted(self.all_files), dtype=dtype, **self.args)
+
+    def export_features(self, path, transforms=None, batch_transforms=None, shard_size=1000, dtype=np.float32, num_workers=0):
+        """Computes features of every recording and exports them to memory-mappable shards.
+
+        The shards can then be loaded with ``TorchFSDDGenerator(version='features', path=path)``,
+        so that training reads the features directly, without decoding audio or computing features.
+
+        .. code-block:: python
+
+            from torchfsdd import TorchFSDDGenerator, TrimSilence
+            from torchaudio.transforms import MFCC
+            from torchvision.transforms import Compose
+
+            TorchFSDDGenerator(version='local', path='recordings').export_features('fsdd-mfcc', transforms=Compose([
+                TrimSilence(threshold=1e-6),
+                MFCC(sample_rate=8e3, n_mfcc=13)
+            ]), num_workers=4)
+
+            train_set, test_set = TorchFSDDGenerator(version='features', path='fsdd-mfcc').train_test_split()
+
+        Parameters
+        ----------
+        path: str
+            Path of the shard directory to create.
+
+        transforms: callable, optional
+            The transformations that compute the features of a 1D :class:`torch:torch.Tensor` of audio samples.
+            Defaults to the ``transforms`` of the generator.
+
+        batch_transforms: :class:`BatchCompose` or :class:`Batched`, optional
+            Transformations applied after ``transforms``. Defaults to the ``batch_transforms`` of the generator.
+
+        shard_size: int
+            Number of recordings in each shard.
+
+        dtype: :class:`numpy:numpy.dtype`
+            The data type to store the features as.
+
+        num_workers: int
+            Number of threads used to compute features in parallel.
+
+        Returns
+        -------
+        shards: :class:`FeatureShards`
+            The written shards.
+        """
+        if self.features is not None:
+            raise ValueError('Generator was already loaded from feature shards')
+        transforms = self.transforms if transforms is None else transforms
+        batch_transforms = self.batch_transforms if batch_transforms is None else batch_transforms
+        dataset = TorchFSDD(self.all_files, transforms, cache=self.cache, archive=self.archive, labels=self.index.digits,
+            batch_transforms=batch_transforms, decoder=self.decoder, **self.args)
+        return FeatureShards.write(path, dataset, self.index, shard_size=shard_size, dtype=dtype, num_workers=num_workers, verbose=self.verbose)
 
     def full(self):
         """Generates a data set wrapper for the entire data set.
@@ -72,7 +622,7 @@ class TorchFSDDGenerator:
         full_set: :class:`TorchFSDD`
             The :class:`torch:torch.utils.data.Dataset` wrapper for the full data set.
         """
-        return TorchFSDD(self.all_files, self.transforms, self.load_all, **self.args)
+        return self._dataset(np.arange(len(self.index)))
 
     def train_test_split(self, test_size=0.1):
         """Generates training and test data set wrappers.
@@ -92,17 +642,11 @@ class TorchFSDDGenerator:
         """
         assert 0. < test_size < 1.
 
-        train_files, test_files = [], []
         n_test = int(N_REC * test_size)
+        test = self.index.rec_nums + 1 <= n_test
 
-        for file in self.all_files:
-            file_name, ext = os.path.splitext(os.path.basename(file))
-            digit, name, rec_num = file_name.split('_')
-            split = test_files if int(rec_num) + 1 <= n_test else train_files
-            split.append(file)
-
-        train_set = TorchFSDD(train_files, self.transforms, self.load_all, **self.args)
-        test_set = TorchFSDD(test_files, self.transforms, self.load_all, **self.args)
+        train_set = self._dataset(np.flatnonzero(~test))
+        test_set = self._dataset(np.flatnonzero(test))
         return train_set, test_set
 
     def train_val_test_split(self, test_size=0.1, val_size=0.1):
@@ -131,24 +675,14 @@ class TorchFSDDGenerator:
         assert 0. < val_size < 1.
         assert test_size + val_size < 1.
 
-        train_files, val_files, test_files = [], [], []
         n_test, n_val = int(N_REC * test_size), int(N_REC * val_size)
+        rec_nums = self.index.rec_nums + 1
+        test = rec_nums <= n_test
+        val = (n_test < rec_nums) & (rec_nums <= n_test + n_val)
 
-        for file in self.all_files:
-            file_name, ext = os.path.splitext(os.path.basename(file))
-            digit, name, rec_num = file_name.split('_')
-            rec_num = int(rec_num) + 1
-            if rec_num <= n_test:
-                split = test_files
-            elif n_test < rec_num <= n_test + n_val:
-                split = val_files
-            else:
-                split = train_files
-            split.append(file)
-
-        train_set = TorchFSDD(train_files, self.transforms, self.load_all, **self.args)
-        val_set = TorchFSDD(val_files, self.transforms, self.load_all, **self.args)
-        test_set = TorchFSDD(test_files, self.transforms, self.load_all, **self.args)
+        train_set = self._dataset(np.flatnonzero(~(test | val)))
+        val_set = self._dataset(np.flatnonzero(val))
+        test_set = self._dataset(np.flatnonzero(test))
         return train_set, val_set, test_set
 
 class TorchFSDD(torch.utils.data.Dataset):
@@ -200,44 +734,672 @@ class TorchFSDD(torch.utils.data.Dataset):
 
         If this is set to `True`, then the complete set of raw audio recordings and labels
         (for the specified files) can be accessed with ``self.recordings`` and ``self.labels``.
+        Subsets created with :meth:`subset` share these with their parent data set, and index into them with ``self.indices``.
+
+        The recordings are packed into a single contiguous buffer (see :class:`PackedRecordings`),
+        and indexing ``self.recordings`` returns views into this buffer. The labels are stored as a :class:`torch:torch.int8` tensor.
+
+    cache: :class:`FeatureCache`, optional
+        An on-disk cache of transformed recordings.
+
+        If specified, the first access of each item stores the transformed recording in the cache,
+        and subsequent accesses (e.g. in later epochs) are served directly from the cache,
+        without decoding the WAV file or applying the transformations again.
+
+        .. code-block:: python
+
+            from torchfsdd import TorchFSDDGenerator, TrimSilence, FeatureCache
+
+            fsdd = TorchFSDDGenerator(transforms=TrimSilence(threshold=0.1), cache=FeatureCache('fsdd-cache'))
+
+        .. warning::
+            Only deterministic transformations should be cached.
+
+    num_workers: int
+        Number of threads used to decode recordings in parallel when ``load_all`` is `True`.
+        If zero, recordings are decoded sequentially in the calling thread.
+
+        The order of the loaded recordings always matches ``files``.
+        If any recordings fail to load, a :py:class:`python:RuntimeError` listing every failed file is raised.
+
+    verbose: bool
+        Whether or not to display loading progress and timing when ``load_all`` is `True`.
+        The total loading time (in seconds) is also stored as ``self.load_time``.
+
+    archive: :class:`FSDDArchive`, optional
+        An archive to read the recordings from, in which case ``files`` are the names of recordings in the archive.
+        Recordings are returned as zero-copy views of the memory-mapped archive.
+
+    features: :class:`FeatureShards`, optional
+        Precomputed feature shards to read items from, in which case ``files`` are the names of recordings in the shards.
+        Items are the stored features (e.g. ``(n_mfcc, T)`` MFCCs) rather than audio samples, and ``transforms`` are applied to the features.
+        If ``load_all`` is `True`, the shards are read into memory instead of being memory-mapped.
+
+    stats: :class:`LoadingStats` or bool, optional
+        Statistics to record the wall time of each stage of fetching an item into (or `True` to create them),
+        along with the number of items and bytes loaded. Subsets share the statistics of their parent data set,
+        and statistics recorded by :class:`torch:torch.utils.data.DataLoader` worker processes are aggregated
+        by :meth:`loading_stats`. If not specified, no statistics are recorded.
+
+    labels: array-like of int, optional
+        The digit label of each recording (e.g. from a :class:`MetadataIndex`).
+        If not specified, the labels are parsed from the file names.
+
+    batch_transforms: :class:`BatchCompose` or :class:`Batched`, optional
+        Transformations to apply to whole batches of recordings (after ``transforms``), rather than to each item.
+
+        When a :class:`torch:torch.utils.data.DataLoader` fetches a batch of items with :meth:`__getitems__`,
+        the recordings are padded into a single ``(B, T)`` tensor and transformed with one call, and the per-item
+        outputs are recovered using the output lengths. Items accessed individually are transformed as a batch of one.
+
+        .. code-block:: python
+
+            from torchfsdd import TorchFSDDGenerator, TrimSilence, Batched, BatchCompose
+            from torchaudio.transforms import MFCC
+
+            fsdd = TorchFSDDGenerator(batch_transforms=BatchCompose([
+                TrimSilence(threshold=0.05),
+                Batched(MFCC(sample_rate=8e3, n_mfcc=13))
+            ]))
+
+    decoder: str or callable
+        The audio reader used to load WAV files: `'auto'` (a native reader for uncompressed WAV files, falling back to torchaudio),
+        `'native'`, `'torchaudio'`, or a callable that takes a file path and returns a tensor of normalized samples.
+
+        .. seealso::
+
+            :class:`FileLoader`
+
+    dtype: :class:`torch:torch.dtype`
+        The data type of the samples loaded from WAV files. If :class:`torch:torch.int16`, the samples of 16-bit PCM recordings
+        are returned without normalization (halving the memory of ``load_all``), and ``transforms`` receive integer samples.
+        They can be normalized later (e.g. on a GPU) with :class:`Normalize`. This does not apply to archives and feature shards,
+        which store samples in the data type they were exported with.
+
+    shared: str, optional
+        Name of a POSIX shared memory segment to store the recordings in, if ``load_all`` is `True` (requires Python 3.8 or later).
+
+        Instead of every process holding its own copy of the recordings, the first process on the host to create the data set
+        decodes the recordings into the segment, and the other processes (e.g. the other DDP ranks) attach to it by name,
+        waiting until it is loaded. :class:`torch:torch.utils.data.DataLoader` worker processes also attach to the segment,
+        so the host holds a single copy of the recordings. The segment is removed when the creating process exits
+        (see :class:`SharedRecordings`).
+
+        .. code-block:: python
+
+            # In every rank (e.g. launched with torchrun)
+            train_set, test_set = TorchFSDDGenerator(load_all=True, shared='fsdd').train_test_split()
 
     **args: optional
         Arbitrary keyword arguments passed on to :py:func:`torchaudio:torchaudio.load`.
+
+    Notes
+    -----
+    Recordings are loaded by a loading strategy stored as ``self.loader`` (see :class:`FileLoader`, :class:`ArchiveLoader`
+    and :class:`PackedLoader`). Data sets are picklable, so they can be used with :class:`torch:torch.utils.data.DataLoader`
+    worker processes started with any multiprocessing start method (e.g. ``multiprocessing_context='spawn'``),
+    and data sets with different loading strategies (e.g. a ``load_all=True`` training set and a ``load_all=False`` test set)
+    can safely be used together.
     """
-    def __init__(self, files, transforms=None, load_all=False, **args):
+    def __init__(self, files, transforms=None, load_all=False, cache=None, num_workers=0, verbose=False, archive=None, labels=None,
+                 batch_transforms=None, features=None, stats=None, decoder='auto', dtype=torch.float32, shared=None, **args):
         super().__init__()
-        self.files = files
+        self._files = files
+        self.indices = None
         self.transforms = transforms
+        self.batch_transforms = batch_transforms
+        self.cache = cache
+        self.archive = archive
+        self.features = features
+        self._stats = LoadingStats() if stats is True else (stats or None)
+        self._decoder = decoder
+        self._dtype = dtype
         self.args = args
 
-        get_audio = lambda file: torchaudio.load(file, **self.args)[0]
-        get_label = lambda file: int(os.path.basename(file)[0])
+        if self.cache is not None:
+            # Integer samples and other decoders produce different outputs, so they are cached separately
+            options = dict(self.args)
+            if dtype != torch.float32:
+                options['dtype'] = dtype
+            if decoder != 'auto':
+                options['decoder'] = decoder
+            self._namespace = self.cache.namespace(self.transforms, options)
+
+        # Parse the labels once, rather than for every item
+        if labels is None:
+            labels = [int(os.path.basename(file)[0]) for file in self._files]
+        self._labels = torch.as_tensor(np.asarray(labels, dtype=np.int8))
+
+        # Each data set has its own (picklable) loader, rather than sharing loading functions through the class
+        if self.features is not None:
+            if load_all:
+                self.recordings = FeatureShards(self.features.path, mmap=False)
+                self.labels = self._labels
+            self.loader = ShardLoader(self.recordings if load_all else self.features, self._files)
+        elif self.archive is not None:
+            self.loader = ArchiveLoader(self.archive, self._files)
+        else:
+            self.loader = FileLoader(self._files, decoder=decoder, dtype=dtype, **self.args)
+
+        if load_all and self.features is None:
+            if shared is not None:
+                self.recordings = self._share_all(shared, dtype, num_workers, verbose)
+            else:
+                # Pack all recordings into a single buffer, rather than keeping one tensor per recording
+                self.recordings = PackedRecordings.pack(self._decode_all(self.loader, num_workers, verbose))
+            self.labels = self._labels
+            self.loader = PackedLoader(self.recordings)
+
+    def _load(self, position):
+        return self.loader(position), int(self._labels[position])
+
+    def _share_all(self, name, dtype, num_workers, verbose):
+        # Identify the recordings by their names and how they are decoded (fingerprinting callable decoders by their code),
+        # so that mismatched data sets do not attach
+        if self.archive is not None:
+            stat = os.stat(self.archive.path)
+            source = (os.path.abspath(self.archive.path), stat.st_size, stat.st_mtime_ns)
+        else:
+            source = (self.loader.decoder, self.args)
+        key = bytes.fromhex(fingerprint(([os.path.basename(file) for file in self._files], str(dtype), source)))
+        lengths = self.loader.lengths(np.arange(len(self._files)))
+        if self.archive is not None:
+            dtype = self.archive.recordings.data.dtype
+
+        # Exactly one process creates the segment and decodes the recordings, while the others wait to attach
+        try:
+            recordings = SharedRecordings.create(name, lengths, dtype=dtype, fingerprint=key)
+        except FileExistsError:
+            return SharedRecordings.attach(name, fingerprint=key)
+
+        def store(position, x):
+            if len(x) != lengths[position]:
+                raise ValueError(f'Expected {int(lengths[position])} samples from {self._files[position]}, got {len(x)}')
+            recordings[position].copy_(x)
+
+        try:
+            self._decode_all(self.loader, num_workers, verbose, store=store)
+        except BaseException:
+            recordings.fail()
+            raise
+        recordings.ready()
+        return recordings
+
+    def _decode_all(self, loader, num_workers, verbose, store=None, positions=None):
+        def decode(position):
+            try:
+                return loader(position), None
+            except Exception as e:
+                return None, e
+
+        positions = range(len(self._files)) if positions is None else positions
+        n_files, start = len(positions), time.perf_counter()
+        recordings, errors = [], []
+        step = max(n_files // 10, 1)
+
+        # Executor.map yields results in submission order, so the order of the files is preserved
+        with ThreadPoolExecutor(max_workers=max(num_workers, 1)) as executor:
+            results = executor.map(decode, positions) if num_workers > 0 else map(decode, positions)
+            for i, (position, (x, error)) in enumerate(zip(positions, results), start=1):
+                if error is None and store is not None:
+                    try:
+                        store(position, x)
+                    except Exception as e:
+                        error = e
+                if error is not None:
+                    errors.append(f'{self._files[position]}: {error!r}')
+                if store is None:
+                    recordings.append(x)
+                if verbose and (i % step == 0 or i == n_files):
+                    print(f'Loaded {i}/{n_files} recordings ({time.perf_counter() - start:.2f}s)', file=sys.stderr)
+
+        self.load_time = time.perf_counter() - start
+        if verbose:
+            rate = n_files / self.load_time if self.load_time > 0 else float('inf')
+            print(f'Loaded {n_files} recordings in {self.load_time:.2f}s ({rate:.0f} recordings/s, num_workers={num_workers})', file=sys.stderr)
+
+        if len(errors) > 0:
+            raise RuntimeError(f'Failed to load {len(errors)} of {n_files} recordings:\n' + '\n'.join(errors))
+
+        return recordings
+
+    def lengths(self):
+        """Retrieves the number of (raw) audio samples in each recording, without decoding the recordings if possible.
+
+        The lengths are provided by the loader: from the in-memory store if ``load_all`` is `True`,
+        from the index if an archive is used, or otherwise from the WAV file headers, which are parsed with
+        :func:`torchfsdd.audio.read_wav_header` (falling back to :py:func:`torchaudio:torchaudio.info` for unsupported formats).
+
+        .. note::
+            These are the lengths of the recordings before transformations are applied.
+            For feature shards, these are the numbers of frames of the stored features.
+
+        Returns
+        -------
+        lengths: :class:`torch:torch.Tensor`
+            The length of each recording.
+        """
+        positions = np.arange(len(self._files)) if self.indices is None else self.indices
+        return self.loader.lengths(positions)
+
+    def loading_stats(self):
+        """Summarizes the loading statistics recorded by the data set (and its subsets), across all processes.
+
+        Returns
+        -------
+        summary: dict or None
+            The :meth:`LoadingStats.summary`, or `None` if statistics are not being recorded.
+        """
+        return None if self._stats is None else self._stats.summary()
+
+    @property
+    def files(self):
+        """list of str: The file paths (or archive names) of the recordings in the data set."""
+        if self.indices is None:
+            return self._files
+        return [self._files[position] for position in self.indices]
+
+    def subset(self, indices):
+        """Creates a data set for a subset of the recordings.
+
+        The subset is backed by an array of indices into this data set, and shares its file list, labels,
+        transformations and cache, as well as the in-memory store of recordings if ``load_all`` is `True`.
+        No recordings are loaded (or copied) when creating a subset.
+
+        Parameters
+        ----------
+        indices: array-like of int
+            Indices of the recordings (in this data set) to include in the subset.
+
+        Returns
+        -------
+        subset: :class:`TorchFSDD`
+            The data set for the subset.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        subset = copy.copy(self)
+        subset.indices = indices if self.indices is None else self.indices[indices]
+        return subset
+
+    def update(self, files, labels=None, changed=(), archive=None, num_workers=0, verbose=False):
+        """Creates a data set for an updated list of recordings, without loading unchanged recordings again.
 
-        if load_all:
-            self.recordings, self.labels = [], []
-            for file in self.files:
-                self.recordings.append(get_audio(file))
-                self.labels.append(get_label(file))
+        The updated data set has the same transformations, cache and loading options as this data set.
+        If ``load_all`` is `True`, recordings that are also in this data set (by file name) and not in ``changed``
+        are copied from the in-memory store, and only the other recordings are decoded.
 
-            def _load(self, index):
-                return self.recordings[index], self.labels[index]
+        Parameters
+        ----------
+        files: list of str
+            List of file paths (or archive names) of the recordings for the updated data set.
+
+        labels: array-like of int, optional
+            The digit label of each recording. If not specified, the labels are parsed from the file names.
+
+        changed: list of str
+            File paths (or names) of recordings that have changed since this data set was created.
+
+        archive: :class:`FSDDArchive`, optional
+            An archive to read the recordings from, instead of the archive of this data set (if any).
+
+        num_workers: int
+            Number of threads used to decode the new and changed recordings in parallel when ``load_all`` is `True`.
+
+        verbose: bool
+            Whether or not to display loading progress and timing when ``load_all`` is `True`.
+
+        Returns
+        -------
+        dataset: :class:`TorchFSDD`
+            The updated data set.
+        """
+        if self.features is not None:
+            raise ValueError('Data sets of precomputed features cannot be updated')
+        if isinstance(getattr(self, 'recordings', None), SharedRecordings):
+            raise ValueError('Data sets with shared recordings cannot be updated')
+
+        dataset = copy.copy(self)
+        dataset._files, dataset.indices = files, None
+        dataset.archive = self.archive if archive is None else archive
+        if labels is None:
+            labels = [int(os.path.basename(file)[0]) for file in files]
+        dataset._labels = torch.as_tensor(np.asarray(labels, dtype=np.int8))
+        if dataset.archive is not None:
+            loader = ArchiveLoader(dataset.archive, files)
         else:
-            def _load(self, index):
-                file = self.files[index]
-                return get_audio(file), get_label(file)
+            loader = FileLoader(files, decoder=self._decoder, dtype=self._dtype, **self.args)
 
-        setattr(self.__class__, '_load', _load)
+        if not isinstance(self.loader, PackedLoader):
+            dataset.loader = loader
+            return dataset
+
+        # Copy the unchanged recordings from the in-memory store, and only decode the others
+        changed = {os.path.basename(file) for file in changed}
+        previous = {os.path.basename(file): position for position, file in enumerate(self._files)}
+        reuse = [previous.get(name) if name not in changed else None for name in map(os.path.basename, files)]
+        missing = [position for position, old in enumerate(reuse) if old is None]
+        decoded = iter(dataset._decode_all(loader, num_workers, verbose, positions=missing))
+        dataset.recordings = PackedRecordings.pack([next(decoded) if old is None else self.recordings[old] for old in reuse])
+        dataset.labels = dataset._labels
+        dataset.loader = PackedLoader(dataset.recordings)
+        return dataset
+
+    def _position(self, index):
+        # Position of an item in the (possibly shared) file list and in-memory store
+        return index if self.indices is None else int(self.indices[index])
 
     def __len__(self):
-        return len(self.files)
+        if self.indices is None:
+            return len(self._files)
+        return len(self.indices)
+
+    def __getitems__(self, indices):
+        """Fetches a batch of items, applying ``batch_transforms`` (if any) to the whole batch at once.
+
+        This is used by :class:`torch:torch.utils.data.DataLoader` (in PyTorch versions that support it)
+        to fetch each batch, instead of calling :meth:`__getitem__` for each item.
+
+        Parameters
+        ----------
+        indices: list of int
+            Indices of the items in the batch.
+
+        Returns
+        -------
+        items: list of tuple
+            The ``(x, y)`` items.
+        """
+        items = [self._item(index) for index in indices]
+        if self.batch_transforms is None or len(items) == 0:
+            return items
+        xs, ys = zip(*items)
+        start = time.perf_counter()
+        xs = transform_batch(xs, self.batch_transforms, indices=[self._position(index) for index in indices])
+        if self._stats is not None:
+            self._stats.record('batch_transforms', time.perf_counter() - start)
+        return list(zip(xs, ys))
 
     def __getitem__(self, index):
-        # Fetch the audio and corresponding label
-        x, y = self._load(index)
-        x = x.flatten()
+        x, y = self._item(index)
+        if self.batch_transforms is not None:
+            start = time.perf_counter()
+            x = transform_batch([x], self.batch_transforms, indices=[self._position(index)])[0]
+            if self._stats is not None:
+                self._stats.record('batch_transforms', time.perf_counter() - start)
+        return x, y
+
+    async def aget(self, index, executor=None):
+        """Fetches an item without blocking the event loop, by loading it in an executor.
+
+        .. code-block:: python
+
+            x, y = await dataset.aget(0)
+
+        Parameters
+        ----------
+        index: int
+            Index of the item.
+
+        executor: :class:`python:concurrent.futures.Executor`, optional
+            The executor to load the item in. If not specified, the default executor of the event loop is used.
+            A :class:`python:concurrent.futures.ThreadPoolExecutor` with a fixed number of threads limits the number of
+            items that are loaded concurrently.
+
+        Returns
+        -------
+        item: tuple
+            The ``(x, y)`` item.
+        """
+        return await asyncio.get_event_loop().run_in_executor(executor, self.__getitem__, index)
+
+    async def abatches(self, batch_size, indices=None, prefetch=2, max_workers=None, executor=None, collate_fn=None):
+        """Asynchronously iterates over batches of items, loading upcoming batches in the background.
+
+        Each batch is loaded with :meth:`__getitems__` (so ``batch_transforms`` are applied to each batch at once) in a thread,
+        and up to ``prefetch`` batches are loaded concurrently while the current batch is being processed,
+        overlapping disk I/O and decoding with e.g. model execution on the event loop, without a :class:`torch:torch.utils.data.DataLoader`.
+
+        .. code-block:: python
+
+            async for x, lengths, y, order in dataset.abatches(batch_size=32, collate_fn=collate_padded):
+                ...
+
+        Parameters
+        ----------
+        batch_size: int
+            Number of items in each batch (the last batch may be smaller).
+
+        indices: array-like of int, optional
+            Indices of the items to iterate over, in order (e.g. a permutation for shuffling). Defaults to every item.
+
+        prefetch: int
+            Maximum number of batches loaded ahead of the batch being processed.
+
+        max_workers: int, optional
+            Number of threads that load batches, if ``executor`` is not specified. Defaults to ``prefetch``.
+
+        executor: :class:`python:concurrent.futures.Executor`, optional
+            An existing executor to load batches in, instead of a thread pool created for the iteration.
+
+        collate_fn: callable, optional
+            A function applied to the list of items of each batch (in the loading thread), such as :func:`collate_padded`.
+
+        Yields
+        ------
+        batch: list of tuple
+            The ``(x, y)`` items of the batch, or the output of ``collate_fn``.
+        """
+        assert batch_size > 0 and prefetch > 0
+        loop = asyncio.get_event_loop()
+        indices = np.arange(len(self)) if indices is None else np.asarray(indices, dtype=np.int64)
+        batches = (indices[start:start + batch_size].tolist() for start in range(0, len(indices), batch_size))
+        owned = executor is None
+        if owned:
+            executor = ThreadPoolExecutor(max_workers=max_workers or prefetch)
+
+        def load(batch):
+            items = self.__getitems__(batch)
+            return items if collate_fn is None else collate_fn(items)
+
+        pending = collections.deque()
+        try:
+            # Keep up to `prefetch` batches loading while the caller processes the current one
+            for batch in batches:
+                pending.append(loop.run_in_executor(executor, load, batch))
+                if len(pending) > prefetch:
+                    yield await pending.popleft()
+            while len(pending) > 0:
+                yield await pending.popleft()
+        finally:
+            for future in pending:
+                future.cancel()
+            if owned:
+                executor.shutdown(wait=False)
+
+    def batches(self, batch_size, indices=None, drop_last=False, prefetch=1, pin_memory=False):
+        """Iterates over padded batches, preparing upcoming batches in a background thread.
+
+        If ``load_all`` is `True` (and there are no ``transforms`` or ``cache``), each batch is gathered directly
+        from the contiguous buffer of :class:`PackedRecordings` into a padded tensor with a single indexing operation,
+        and ``batch_transforms`` are applied to the padded batch. This avoids fetching, padding and collating each item
+        separately, as well as the inter-process communication of :class:`torch:torch.utils.data.DataLoader` worker processes.
+        Otherwise, each batch is fetched with :meth:`__getitems__` and collated with :func:`collate_padded`.
+
+        Batches are the same as those of :func:`collate_padded` in both cases.
+
+        .. code-block:: python
+
+            train_set = TorchFSDDGenerator(load_all=True).full()
+            for epoch in range(n_epochs):
+                for x, lengths, y, order in train_set.batches(32, indices=np.random.permutation(len(train_set)), pin_memory=True):
+                    x, y = x.to('cuda', non_blocking=True), y.to('cuda', non_blocking=True)
+                    ...
+
+        Parameters
+        ----------
+        batch_size: int
+            Number of items in each batch.
+
+        indices: array-like of int, optional
+            Indices of the items to iterate over, in order (e.g. a permutation for shuffling). Defaults to every item.
+
+        drop_last: bool
+            Whether or not to drop the last batch if it is smaller than ``batch_size``.
+
+        prefetch: int
+            Maximum number of prepared batches waiting to be consumed.
+            While the current batch is being processed, the background thread prepares up to ``prefetch`` more.
+
+        pin_memory: bool
+            Whether or not to copy the batches into page-locked memory (in the background thread),
+            for faster (and asynchronous) transfers to CUDA devices. Requires CUDA to be available.
+
+        Yields
+        ------
+        x: :class:`torch:torch.Tensor`
+            A ``(B, T_max, *)`` tensor of the padded items.
+
+        lengths: :class:`torch:torch.Tensor`
+            The length of each item, in decreasing order.
+
+        y: :class:`torch:torch.Tensor`
+            The label of each item.
+
+        order: :class:`torch:torch.Tensor`
+            The position of each item in the batch, i.e. the ``i``-th output item is ``indices[start + order[i]]``
+            where ``start`` is the position of the first item of the batch in ``indices``.
+        """
+        assert batch_size > 0 and prefetch > 0
+        indices = np.arange(len(self)) if indices is None else np.asarray(indices, dtype=np.int64)
+        stop = len(indices) - len(indices) % batch_size if drop_last else len(indices)
+        batches = (indices[start:start + batch_size] for start in range(0, stop, batch_size))
+        packed = isinstance(self.loader, PackedLoader) and self.transforms is None and self.cache is None
+
+        def load(batch):
+            out = self._gather(batch) if packed else collate_padded(self.__getitems__(batch.tolist()))
+            return tuple(t.pin_memory() for t in out) if pin_memory else out
+
+        # Batches (or the exception raised while preparing them) are passed to the caller through a bounded queue
+        ready, done = queue.Queue(maxsize=prefetch), threading.Event()
+        def put(item):
+            while not done.is_set():
+                try:
+                    ready.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+
+        def produce():
+            try:
+                for batch in batches:
+                    if done.is_set():
+                        return
+                    put((load(batch), None))
+            except BaseException as e:
+                put((None, e))
+            put(None)
+
+        thread = threading.Thread(target=produce, name='TorchFSDD.batches', daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = ready.get()
+                if item is None:
+                    break
+                out, error = item
+                if error is not None:
+                    raise error
+                yield out
+        finally:
+            done.set()
+            thread.join()
+
+    def _gather(self, indices):
+        # Gathers a padded batch from the packed buffer, in decreasing order of length
+        positions = torch.as_tensor(indices if self.indices is None else self.indices[indices], dtype=torch.long)
+        offsets = self.recordings.offsets
+        lengths = offsets[positions + 1] - offsets[positions]
+        lengths, order = lengths.sort(descending=True)
+        positions = positions[order]
+
+        # Padding gathers the first sample of the buffer, and is then zeroed
+        steps = torch.arange(int(lengths[0]) if len(lengths) > 0 else 0)
+        padding = steps >= lengths.unsqueeze(1)
+        x = self.recordings.data[(offsets[positions].unsqueeze(1) + steps).masked_fill_(padding, 0)].masked_fill_(padding, 0)
+        y = self._labels[positions].long()
+
+        if self.batch_transforms is not None and len(positions) > 0:
+            start = time.perf_counter()
+            x, lengths = apply_batch(self.batch_transforms, x, lengths, indices=positions.tolist())
+            # Match collate_padded: sort by the transformed lengths, zero the padding and move time to the second dimension
+            lengths, resort = lengths.sort(descending=True)
+            x, y, order = x[resort], y[resort], order[resort]
+            steps = torch.arange(x.shape[-1])[:int(lengths[0])]
+            padding = (steps >= lengths.unsqueeze(1)).view(len(lengths), *[1] * (x.ndim - 2), -1)
+            x = x[..., :len(steps)].masked_fill(padding, 0).movedim(-1, 1).contiguous()
+            if self._stats is not None:
+                self._stats.record('batch_transforms', time.perf_counter() - start)
+
+        if self._stats is not None:
+            self._stats.count('items', len(positions))
+        return x, lengths, y, order
+
+    def _item(self, index):
+        # Statistics are only timed when enabled, so that disabled statistics only cost a few checks per item
+        stats = self._stats
+        if stats is not None:
+            start = time.perf_counter()
+            item = self._fetch(index, stats)
+            stats.record('total', time.perf_counter() - start)
+            stats.count('items')
+            return item
+        return self._fetch(index, None)
+
+    def _fetch(self, index, stats):
+        position = self._position(index)
+
+        # Serve the transformed item from the cache if possible
+        if self.cache is not None:
+            if self.features is not None:
+                key = self.cache.key(os.path.join(self.features.path, 'meta.json'), self._namespace, member=self._files[position])
+            elif self.archive is not None:
+                key = self.cache.key(self.archive.path, self._namespace, member=self._files[position])
+            else:
+                key = self.cache.key(self._files[position], self._namespace)
+            if stats is None:
+                item = self.cache.get(key)
+            else:
+                start = time.perf_counter()
+                item = self.cache.get(key)
+                stats.record('cache_get', time.perf_counter() - start)
+                stats.count('cache_misses' if item is None else 'cache_hits')
+            if item is not None:
+                return item
+
+        # Fetch the audio (or features) and corresponding label
+        if stats is None:
+            x, y = self._load(position)
+        else:
+            start = time.perf_counter()
+            x, y = self._load(position)
+            stats.record('load', time.perf_counter() - start)
+            stats.count('bytes', x.numel() * x.element_size())
 
         # Transform data if a transformation is given
         if self.transforms is not None:
-            x = self.transforms(x)
+            if stats is None:
+                x = self.transforms(x)
+            else:
+                start = time.perf_counter()
+                x = self.transforms(x)
+                stats.record('transforms', time.perf_counter() - start)
+
+        if self.cache is not None:
+            if stats is None:
+                self.cache.put(key, (x, y))
+            else:
+                start = time.perf_counter()
+                self.cache.put(key, (x, y))
+                stats.record('cache_put', time.perf_counter() - start)
 
         return x, y
\ No newline at end of file
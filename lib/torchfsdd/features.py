@@ -0,0 +1,209 @@
+import os, sys, json, time, shutil, tempfile, numpy as np, torch
+from concurrent.futures import ThreadPoolExecutor
+from .index import MetadataIndex
+from .cache import fingerprint
+
+__all__ = ['FeatureShards']
+
+class FeatureShards:
+    """A directory of precomputed features (e.g. MFCCs) of FSDD recordings, stored in memory-mappable NumPy shards.
+
+    The features of each recording are stored as a ``(T, F)`` matrix of ``T`` frames, and the frame matrices of
+    consecutive recordings are concatenated into shards (``shard-00000.npy``, ``shard-00001.npy``, ...).
+    An index of the shard, frame offset and number of frames of each recording (``items.npy``),
+    the :class:`MetadataIndex` of the recordings (``index.npz``) and a description of the features (``meta.json``) are stored alongside.
+
+    Shards are opened lazily with :py:func:`numpy:numpy.load` using ``mmap_mode``, and features are returned as
+    tensor views of the memory maps, so reading them requires neither decoding audio nor computing features,
+    and processes reading the same shards share the operating system's page cache.
+
+    Shards are created with :meth:`write` (or :meth:`TorchFSDDGenerator.export_features`),
+    and can be loaded with ``TorchFSDDGenerator(version='features', path=...)``.
+
+    Parameters
+    ----------
+    path: str
+        Path to the shard directory.
+
+    mmap: bool
+        Whether or not to memory-map the shards. Otherwise, every shard is read into memory when the shards are opened.
+    """
+    FORMAT_VERSION = 1
+    ITEM_DTYPE = np.dtype([('shard', '<u4'), ('offset', '<u8'), ('length', '<u8')])
+
+    def __init__(self, path, mmap=True):
+        self.path = path
+        self.mmap = mmap
+        self._open()
+
+    def _open(self):
+        try:
+            with open(os.path.join(self.path, 'meta.json'), 'r') as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            raise ValueError(f'{self.path!r} is not a TorchFSDD feature shard directory')
+        if meta['format_version'] != self.FORMAT_VERSION:
+            raise ValueError(f"Unsupported feature shard format version {meta['format_version']} (expected {self.FORMAT_VERSION})")
+
+        self.feature_shape = tuple(meta['feature_shape'])
+        self.transforms = meta['transforms']
+        self.items = np.load(os.path.join(self.path, 'items.npy'))
+        self.index = MetadataIndex.load(os.path.join(self.path, 'index.npz'))
+        self.files = self.index.paths.tolist()
+        self._n_shards = meta['n_shards']
+        self._shards = [None] * self._n_shards
+        self._positions = {name: i for i, name in enumerate(self.files)}
+
+        # Shards that are not memory-mapped are read into memory up front
+        if not self.mmap:
+            for shard in range(self._n_shards):
+                self._shard(shard)
+
+    @classmethod
+    def write(cls, path, dataset, index, shard_size=1000, dtype=np.float32, num_workers=0, verbose=False):
+        """Computes the features of every item of a data set and writes them to shards.
+
+        Items are computed (in parallel if ``num_workers`` is positive) and written one shard at a time,
+        into a temporary directory which is moved into place once complete.
+
+        Parameters
+        ----------
+        path: str
+            Path of the shard directory to create (replacing any existing shards).
+
+        dataset: :class:`TorchFSDD`
+            The data set whose (transformed) items are stored. Each item must be a tensor with time as its last dimension,
+            e.g. the ``(n_mfcc, T)`` output of :class:`torchaudio:torchaudio.transforms.MFCC`.
+
+        index: :class:`MetadataIndex`
+            The metadata of the items of the data set, in the same order.
+
+        shard_size: int
+            Number of recordings in each shard.
+
+        dtype: :class:`numpy:numpy.dtype`
+            The data type to store the features as.
+
+        num_workers: int
+            Number of threads used to compute items in parallel. If zero, items are computed sequentially in the calling thread.
+
+        verbose: bool
+            Whether or not to display progress.
+
+        Returns
+        -------
+        shards: :class:`FeatureShards`
+            The written shards.
+        """
+        assert shard_size > 0
+        assert len(dataset) == len(index)
+        if len(dataset) == 0:
+            raise ValueError('Expected a non-empty data set to write feature shards of')
+        n_items, start = len(dataset), time.perf_counter()
+        items = np.zeros(n_items, dtype=cls.ITEM_DTYPE)
+        feature_shape = None
+
+        path = os.path.abspath(path)
+        tmp = tempfile.mkdtemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with ThreadPoolExecutor(max_workers=max(num_workers, 1)) as executor:
+                # Compute one shard at a time, so that only a single shard of features is held in memory
+                for shard, first in enumerate(range(0, n_items, shard_size)):
+                    positions = range(first, min(first + shard_size, n_items))
+                    results = executor.map(dataset.__getitem__, positions) if num_workers > 0 else map(dataset.__getitem__, positions)
+
+                    frames, offset = [], 0
+                    for position, (x, _) in zip(positions, results):
+                        if feature_shape is None:
+                            feature_shape = tuple(x.shape[:-1])
+                        elif tuple(x.shape[:-1]) != feature_shape:
+                            raise ValueError(f'Expected features of shape {feature_shape} (excluding time), got {tuple(x.shape[:-1])}')
+                        x = x.detach().cpu().reshape(-1, x.shape[-1]).T.numpy().astype(dtype)
+                        items[position] = (shard, offset, len(x))
+                        frames.append(x)
+                        offset += len(x)
+
+                    np.save(os.path.join(tmp, f'shard-{shard:05d}.npy'), np.concatenate(frames))
+                    if verbose:
+                        print(f'Wrote {positions.stop}/{n_items} items ({time.perf_counter() - start:.2f}s)', file=sys.stderr)
+
+            np.save(os.path.join(tmp, 'items.npy'), items)
+            names = [os.path.basename(file) for file in index.paths]
+            MetadataIndex(names, index.digits, index.speakers, index.speaker_names, index.rec_nums).save(os.path.join(tmp, 'index.npz'))
+            meta = {
+                'format_version': cls.FORMAT_VERSION,
+                'feature_shape': list(feature_shape or ()),
+                'dtype': np.dtype(dtype).name,
+                'n_shards': -(-n_items // shard_size),
+                'transforms': fingerprint((dataset.transforms, dataset.batch_transforms)),
+            }
+            with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+                json.dump(meta, f)
+            os.chmod(tmp, 0o755)
+
+            # Move any existing shards aside, so that the new shards are installed with a single rename
+            if os.path.exists(path):
+                old = tempfile.mkdtemp(dir=os.path.dirname(path), prefix='.tmp-')
+                os.rename(path, os.path.join(old, 'old'))
+                shutil.rmtree(old)
+            os.rename(tmp, path)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+        return cls(path)
+
+    def _shard(self, shard):
+        if self._shards[shard] is None:
+            # Copy-on-write mapping: tensor views are writable without ever modifying the shards
+            self._shards[shard] = np.load(os.path.join(self.path, f'shard-{shard:05d}.npy'), mmap_mode='c' if self.mmap else None)
+        return self._shards[shard]
+
+    @property
+    def lengths(self):
+        """:class:`torch:torch.Tensor`: The number of frames of each recording."""
+        return torch.from_numpy(self.items['length'].astype(np.int64))
+
+    @property
+    def labels(self):
+        """:class:`numpy:numpy.ndarray`: The digit label of each recording."""
+        return self.index.digits
+
+    def position(self, name):
+        """Finds the position of a recording within the shards.
+
+        Parameters
+        ----------
+        name: str
+            File name (or path) of the recording, e.g. ``0_george_0.wav``.
+
+        Returns
+        -------
+        position: int
+            The index of the recording.
+        """
+        return self._positions[os.path.basename(name)]
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f'Recording index {index} out of range for {len(self)} recordings')
+        shard, offset, length = self.items[index].tolist()
+        frames = torch.from_numpy(self._shard(shard)[offset:offset + length])
+        return frames.T.reshape(*self.feature_shape, length)
+
+    def __getstate__(self):
+        # Re-open the shards instead of pickling their contents
+        return {'path': self.path, 'mmap': self.mmap}
+
+    def __setstate__(self, state):
+        self.path = state['path']
+        self.mmap = state['mmap']
+        self._open()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(path={self.path!r}, n_recordings={len(self)}, feature_shape={self.feature_shape})'
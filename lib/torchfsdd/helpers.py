@@ -1,3 +1,5 @@
+import abc, numpy as np, torch, torchaudio
+
 class TrimSilence:
     """Removes the silence at the beginning and end of the passed audio data.
 
@@ -26,17 +28,822 @@ class TrimSilence:
         x: :class:`torch:torch.Tensor`
             The original tensor trimmed for silence.
         """
-        start, end = 0, 0
+        # Positions of all samples louder than the threshold (in a single pass)
+        loud = (x.abs() > self.threshold).nonzero()
+
+        # Entirely silent recordings are trimmed to an empty slice
+        if len(loud) == 0:
+            return x[0:0]
+
+        start, end = int(loud[0]), int(loud[-1]) + 1
+        return x[start:end]
+
+    def batch(self, x, lengths):
+        """Applies the transformation to a batch of padded recordings.
+
+        Parameters
+        ----------
+        x: torch.Tensor
+            A two-dimensional ``(B, T)`` tensor of WAV audio samples, padded to a common length.
+
+        lengths: torch.Tensor
+            A one-dimensional tensor of the ``B`` original (unpadded) recording lengths.
+
+        Returns
+        -------
+        x: :class:`torch:torch.Tensor`
+            A ``(B, T')`` tensor of the trimmed recordings, left-aligned and zero-padded to the longest trimmed length.
+
+        lengths: :class:`torch:torch.Tensor`
+            The lengths of the trimmed recordings.
+        """
+        assert x.ndim == 2
+        lengths = torch.as_tensor(lengths, dtype=torch.long, device=x.device)
+        n, T = x.shape
+
+        if T == 0:
+            return x, torch.zeros_like(lengths)
+
+        # Ignore any samples in the padded region of each row
+        positions = torch.arange(T, device=x.device)
+        loud = (x.abs() > self.threshold) & (positions < lengths.unsqueeze(1))
+        any_loud = loud.any(dim=1)
+
+        # argmax returns the first maximal index, so the flipped mask gives the last loud sample
+        loud = loud.to(torch.uint8)
+        start = loud.argmax(dim=1).masked_fill(~any_loud, 0)
+        end = (T - loud.flip(dims=(1,)).argmax(dim=1)).masked_fill(~any_loud, 0)
+        trimmed_lengths = end - start
+
+        # Gather each trimmed row into a left-aligned padded tensor
+        T_out = int(trimmed_lengths.max()) if n > 0 else 0
+        offsets = torch.arange(T_out, device=x.device)
+        index = (start.unsqueeze(1) + offsets).clamp(max=T - 1)
+        trimmed = x.gather(1, index).masked_fill(offsets >= trimmed_lengths.unsqueeze(1), 0)
+
+        return trimmed, trimmed_lengths
+
+class Normalize:
+    """Converts integer PCM samples (e.g. :class:`torch:torch.int16` recordings loaded with ``dtype=torch.int16``)
+    to floating point samples in :math:`[-1, 1)`, in the same way as :py:func:`torchaudio:torchaudio.load`.
+
+    Floating point samples are returned unchanged. As integer samples take half the memory of normalized samples,
+    normalization can be deferred until after batches have been collated (and e.g. moved to a GPU),
+    by applying this to a padded batch, or with :class:`BatchCompose`.
+
+    Parameters
+    ----------
+    bits: int
+        Number of bits per integer sample.
+
+    dtype: :class:`torch:torch.dtype`
+        The floating point data type of the normalized samples.
+    """
+    def __init__(self, bits=16, dtype=torch.float32):
+        self.bits = bits
+        self.dtype = dtype
+
+    def __call__(self, x):
+        """Applies the transformation.
+
+        Parameters
+        ----------
+        x: torch.Tensor
+            A tensor of integer (or already normalized) samples.
+
+        Returns
+        -------
+        x: :class:`torch:torch.Tensor`
+            The normalized samples.
+        """
+        if x.is_floating_point():
+            return x
+        return x.to(self.dtype).mul_(2. ** -(self.bits - 1))
+
+    def batch(self, x, lengths):
+        """Applies the transformation to a batch of padded recordings.
+
+        Parameters
+        ----------
+        x: torch.Tensor
+            A tensor of padded recordings.
+
+        lengths: torch.Tensor
+            The lengths of the recordings.
+
+        Returns
+        -------
+        x: :class:`torch:torch.Tensor`
+            The normalized batch.
+
+        lengths: :class:`torch:torch.Tensor`
+            The (unchanged) lengths.
+        """
+        return self(x), lengths
+
+class Batched:
+    """Wraps a transformation so that it can be applied to a batch of padded recordings at once.
+
+    Transformations from :py:mod:`torchaudio:torchaudio.transforms` accept batched input, so applying them to a
+    ``(B, T)`` tensor performs a single (vectorized) call, instead of ``B`` separate calls with their per-call overhead.
+    The lengths of the outputs are computed from the input lengths so that the per-item outputs can be recovered.
+
+    .. note::
+        For spectrogram-based transformations such as :class:`torchaudio:torchaudio.transforms.MFCC`,
+        the padding of shorter recordings can affect the last frame or two of their outputs (which would otherwise be
+        computed from reflection padding of the recording itself), so batched outputs may differ slightly from
+        per-item outputs at the end of each recording.
+
+    Parameters
+    ----------
+    transform: callable
+        The transformation to apply, which must accept a ``(B, 1, T)`` tensor (i.e. with a channel dimension)
+        and return a tensor with the batch and channel as its first two dimensions, and time as its last dimension.
+
+    hop_length: int, optional
+        Number of samples between successive output frames, for transformations that produce frames (e.g. spectrograms).
+        If not specified, this is inferred from :class:`torchaudio:torchaudio.transforms.Spectrogram`-based transformations
+        (such as :class:`torchaudio:torchaudio.transforms.MelSpectrogram` and :class:`torchaudio:torchaudio.transforms.MFCC`),
+        and the output lengths are otherwise assumed to be the input lengths.
+    """
+    def __init__(self, transform, hop_length=None):
+        self.transform = transform
+        self.hop_length = hop_length
+
+        # Find the spectrogram that determines the frames of the output, if any
+        spectrogram = getattr(transform, 'MelSpectrogram', transform)
+        spectrogram = getattr(spectrogram, 'spectrogram', spectrogram)
+        self._n_fft = getattr(spectrogram, 'n_fft', None)
+        self._center = getattr(spectrogram, 'center', True)
+        if self.hop_length is None:
+            self.hop_length = getattr(spectrogram, 'hop_length', None)
+
+    def __call__(self, x):
+        return self.transform(x)
+
+    def lengths(self, lengths):
+        """Computes the output lengths of the transformation.
+
+        Parameters
+        ----------
+        lengths: torch.Tensor
+            The input lengths.
+
+        Returns
+        -------
+        lengths: :class:`torch:torch.Tensor`
+            The output lengths.
+        """
+        if self.hop_length is None:
+            return lengths
+        if self._center or self._n_fft is None:
+            return lengths // self.hop_length + 1
+        return ((lengths - self._n_fft) // self.hop_length + 1).clamp(min=0)
+
+    def batch(self, x, lengths):
+        """Applies the transformation to a batch of padded recordings.
+
+        Parameters
+        ----------
+        x: torch.Tensor
+            A ``(B, T)`` tensor of padded recordings.
+
+        lengths: torch.Tensor
+            The lengths of the recordings.
+
+        Returns
+        -------
+        x: :class:`torch:torch.Tensor`
+            The transformed batch.
+
+        lengths: :class:`torch:torch.Tensor`
+            The lengths (along the last dimension) of the transformed recordings.
+        """
+        # Add a channel dimension, as torchaudio treats the first of three or more dimensions as the batch
+        # (e.g. so that the top_db clamping of MFCC is relative to the maximum of each recording, not the whole batch)
+        return self.transform(x.unsqueeze(1)).squeeze(1), self.lengths(lengths)
+
+class TrimMFCC:
+    """Trims silence and computes MFCCs in a single fused pass, for single recordings or batches of padded recordings.
+
+    This replaces ``Compose([TrimSilence(threshold), MFCC(...)])`` (or the equivalent :class:`BatchCompose`).
+    Instead of trimming each recording into a new tensor and then framing the whole trimmed recording,
+    the peak amplitude of every ``hop_length`` block of samples is computed once, silence is trimmed at block granularity,
+    and the short-time Fourier transform, mel filterbank, log and DCT are only computed for the frames of the kept region,
+    which are gathered directly from the input as strided views (without copying the frames).
+
+    .. note::
+        The kept region is the region that :class:`TrimSilence` keeps, extended to the enclosing ``hop_length`` blocks,
+        and its frames are centered on the same samples as those of :class:`torchaudio:torchaudio.transforms.MFCC` applied
+        to the kept region. However, the first and last frames are computed from the neighbouring samples of the recording
+        (or zeros beyond the recording) rather than from reflection padding, so the features differ slightly at either end
+        from those of the chained transformations. Entirely silent recordings have no frames.
+
+    .. code-block:: python
+
+        from torchfsdd import TorchFSDDGenerator, TrimMFCC
+
+        fsdd = TorchFSDDGenerator(batch_transforms=TrimMFCC(threshold=0.05, sample_rate=8000, n_mfcc=13))
+
+    Parameters
+    ----------
+    threshold: float
+        The maximum amount of noise that is considered silence (see :class:`TrimSilence`).
+
+    sample_rate: int
+        Sample rate of the recordings.
+
+    n_mfcc: int
+        Number of MFC coefficients to retain.
+
+    dct_type: int
+        The type of DCT (only type 2 is supported).
+
+    norm: str
+        The norm to use for the DCT.
+
+    log_mels: bool
+        Whether or not to use log mel spectrograms instead of decibel-scaled mel spectrograms.
+
+    melkwargs: dict, optional
+        Arguments for :class:`torchaudio:torchaudio.transforms.MelSpectrogram`, as for :class:`torchaudio:torchaudio.transforms.MFCC`
+        Frames are always centered, so ``center`` must be `True` and ``pad_mode`` must be `'reflect'` (the defaults),
+        and ``power`` must be 2, ``normalized`` must be `False` and ``pad`` must be 0.
+    """
+    def __init__(self, threshold, sample_rate=8000, n_mfcc=13, dct_type=2, norm='ortho', log_mels=False, melkwargs=None):
+        assert 0. <= threshold <= 1.
+        self.threshold = threshold
+
+        # Use the parameters (window, filterbank and DCT matrix) of the equivalent torchaudio transformation
+        mfcc = torchaudio.transforms.MFCC(sample_rate=sample_rate, n_mfcc=n_mfcc, dct_type=dct_type, norm=norm, log_mels=log_mels, melkwargs=melkwargs or {})
+        spectrogram = mfcc.MelSpectrogram.spectrogram
+        assert spectrogram.power == 2. and not spectrogram.normalized and spectrogram.pad == 0
+        assert getattr(spectrogram, 'center', True) and getattr(spectrogram, 'pad_mode', 'reflect') == 'reflect'
+        self.n_fft, self.hop_length = spectrogram.n_fft, spectrogram.hop_length
+        self.log_mels = log_mels
+        self.top_db = mfcc.amplitude_to_DB.top_db
+
+        # The window is zero-padded to the FFT size, as in torch.stft
+        left = (self.n_fft - len(spectrogram.window)) // 2
+        self.window = torch.nn.functional.pad(spectrogram.window, (left, self.n_fft - len(spectrogram.window) - left))
+        self.fb = mfcc.MelSpectrogram.mel_scale.fb
+        self.dct = mfcc.dct_mat
+
+    def __call__(self, x):
+        """Applies the transformation.
+
+        Parameters
+        ----------
+        x: torch.Tensor
+            A one-dimensional tensor of WAV audio samples.
+
+        Returns
+        -------
+        mfcc: :class:`torch:torch.Tensor`
+            A ``(n_mfcc, T)`` tensor of the MFCCs of the trimmed recording.
+        """
+        mfcc, lengths = self.batch(x.unsqueeze(0), torch.tensor([len(x)]))
+        return mfcc[0, :, :int(lengths[0])]
+
+    def batch(self, x, lengths):
+        """Applies the transformation to a batch of padded recordings.
+
+        Parameters
+        ----------
+        x: torch.Tensor
+            A two-dimensional ``(B, T)`` tensor of WAV audio samples, padded to a common length.
+
+        lengths: torch.Tensor
+            A one-dimensional tensor of the ``B`` original (unpadded) recording lengths.
+
+        Returns
+        -------
+        mfcc: :class:`torch:torch.Tensor`
+            A ``(B, n_mfcc, T')`` tensor of the MFCCs of the trimmed recordings, zero-padded to the largest number of frames.
+
+        lengths: :class:`torch:torch.Tensor`
+            The number of frames of each recording.
+        """
+        assert x.ndim == 2
+        lengths = torch.as_tensor(lengths, dtype=torch.long, device=x.device)
+        n, T = x.shape
+        hop, n_fft = self.hop_length, self.n_fft
+
+        # Find the first and last loud blocks of each recording, ignoring the padded region of each row
+        n_blocks = -(-T // hop)
+        loud = (x.abs() > self.threshold) & (torch.arange(T, device=x.device) < lengths.unsqueeze(1))
+        any_loud = loud.any(dim=1)
+        loud = torch.nn.functional.pad(loud.to(torch.uint8), (0, n_blocks * hop - T)).view(n, n_blocks, hop).amax(dim=2)
+        start = loud.argmax(dim=1) * hop if n_blocks > 0 else torch.zeros_like(lengths)
+        end = torch.min((n_blocks - loud.flip(dims=(1,)).argmax(dim=1)) * hop, lengths) if n_blocks > 0 else lengths
+        n_frames = ((end - start) // hop + 1).masked_fill_(~any_loud, 0)
+
+        n_out = int(n_frames.max()) if n > 0 else 0
+        if n_out == 0:
+            return x.new_zeros(n, self.dct.shape[1], 0), n_frames
+
+        # Gather the samples spanned by the kept frames (zero outside each recording), and frame them as strided views
+        positions = start.unsqueeze(1) - n_fft // 2 + torch.arange((n_out - 1) * hop + n_fft, device=x.device)
+        outside = (positions < 0) | (positions >= lengths.unsqueeze(1))
+        samples = x.gather(1, positions.clamp(0, T - 1)).masked_fill_(outside, 0)
+        frames = samples.unfold(1, n_fft, hop)
+        # Shape: B x T' x n_fft
+
+        window, fb, dct = (tensor.to(device=x.device, dtype=x.dtype) for tensor in (self.window, self.fb, self.dct))
+        spectrum = torch.fft.rfft(frames * window, dim=2)
+        mel = (spectrum.real.pow(2) + spectrum.imag.pow(2)) @ fb
+        # Shape: B x T' x n_mels
+
+        valid = torch.arange(n_out, device=x.device) < n_frames.unsqueeze(1)
+        if self.log_mels:
+            mel = torch.log(mel + 1e-6)
+        else:
+            mel = 10. * torch.log10(mel.clamp(min=1e-10))
+            if self.top_db is not None:
+                # The dynamic range is relative to the maximum of each recording (over its kept frames)
+                peak = mel.masked_fill(~valid.unsqueeze(2), float('-inf')).amax(dim=(1, 2))
+                mel = torch.max(mel, (peak - self.top_db).view(-1, 1, 1))
+
+        mfcc = (mel @ dct).masked_fill_(~valid.unsqueeze(2), 0)
+        return mfcc.transpose(1, 2), n_frames
+
+class BatchCompose:
+    """Composes transformations that can be applied to batches of padded recordings, such as :class:`TrimSilence` and :class:`Batched`.
+
+    This can be used as the ``batch_transforms`` argument of :class:`TorchFSDD`,
+    or with :class:`TransformCollate` as the ``collate_fn`` of a :class:`torch:torch.utils.data.DataLoader`.
+    It can also be called on a single recording, like :class:`torchvision:torchvision.transforms.Compose`.
+
+    .. code-block:: python
+
+        from torchfsdd import TrimSilence, Batched, BatchCompose
+        from torchaudio.transforms import MFCC
+
+        transforms = BatchCompose([
+            TrimSilence(threshold=0.05),
+            Batched(MFCC(sample_rate=8e3, n_mfcc=13))
+        ])
+
+    Parameters
+    ----------
+    transforms: list of callable
+        The transformations to compose, each of which must have a ``batch(x, lengths)`` method.
+    """
+    indexed = True
+
+    def __init__(self, transforms):
+        self.transforms = transforms
+
+    def __call__(self, x):
+        for transform in self.transforms:
+            x = transform(x)
+        return x
+
+    def batch(self, x, lengths, indices=None):
+        """Applies each transformation to a batch of padded recordings.
+
+        Parameters
+        ----------
+        x: torch.Tensor
+            A ``(B, T)`` tensor of padded recordings.
+
+        lengths: torch.Tensor
+            The lengths of the recordings.
+
+        indices: array-like of int, optional
+            Indices of the recordings, passed on to transformations that depend on them (such as :class:`Augment`).
+
+        Returns
+        -------
+        x: :class:`torch:torch.Tensor`
+            The transformed batch.
+
+        lengths: :class:`torch:torch.Tensor`
+            The lengths (along the last dimension) of the transformed recordings.
+        """
+        for transform in self.transforms:
+            x, lengths = apply_batch(transform, x, lengths, indices)
+        return x, lengths
+
+def apply_batch(transform, x, lengths, indices=None):
+    """Applies a batch transformation, passing on the indices of the recordings to transformations that depend on them
+    (those with a truthy ``indexed`` attribute, such as :class:`Augment` and :class:`BatchCompose`).
+
+    Parameters
+    ----------
+    transform: callable
+        A transformation with a ``batch(x, lengths)`` method.
+
+    x: torch.Tensor
+        A tensor of padded recordings.
+
+    lengths: torch.Tensor
+        The lengths of the recordings.
+
+    indices: array-like of int, optional
+        Indices of the recordings.
+
+    Returns
+    -------
+    x: :class:`torch:torch.Tensor`
+        The transformed batch.
+
+    lengths: :class:`torch:torch.Tensor`
+        The lengths of the transformed recordings.
+    """
+    if indices is not None and getattr(transform, 'indexed', False):
+        return transform.batch(x, lengths, indices=indices)
+    return transform.batch(x, lengths)
+
+_GOLDEN = np.uint64(0x9e3779b97f4a7c15)
+
+def _mix(z):
+    # The splitmix64 finalizer: a bijective hash of 64-bit unsigned integers
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+    return z ^ (z >> np.uint64(31))
+
+def _combine(keys, values):
+    # Derives new keys from keys and integer values (broadcast together)
+    values = np.atleast_1d(np.asarray(values, dtype=np.int64)).astype(np.uint64)
+    return _mix(keys ^ _mix(values + _GOLDEN))
+
+class Augment:
+    """Applies random augmentations to batches of padded recordings, with the random parameters of each recording
+    determined only by a seed, the epoch and the index of the recording.
+
+    The random parameters of every recording in a batch are generated at once, by hashing a key derived from
+    ``(seed, epoch, index)`` with a counter, and each augmentation is applied to the whole batch with vectorized tensor operations.
+    As the parameters do not depend on the other recordings of the batch, or on the process that loads the batch,
+    augmented recordings are identical for any batch size, sampler or number of :class:`torch:torch.utils.data.DataLoader`
+    worker processes.
+
+    When used as (or within a :class:`BatchCompose` used as) the ``batch_transforms`` of :class:`TorchFSDD`,
+    the index of each recording is its position in the data set that subsets were created from,
+    so a recording is augmented in the same way in any subset.
+
+    .. code-block:: python
+
+        from torch.utils.data import DataLoader
+        from torchfsdd import TorchFSDDGenerator, TrimSilence, BatchCompose, collate_padded
+        from torchfsdd import Augment, TimeShift, Gain, AddNoise, SpeedPerturb
+
+        augment = Augment([TimeShift(max_shift=400), Gain(), AddNoise(p=0.5), SpeedPerturb()], seed=0)
+        fsdd = TorchFSDDGenerator(batch_transforms=BatchCompose([TrimSilence(threshold=0.05), augment]))
+        train_set, test_set = fsdd.train_test_split()
+
+        for epoch in range(n_epochs):
+            augment.set_epoch(epoch)
+            for x, lengths, y, order in DataLoader(train_set, batch_size=32, collate_fn=collate_padded):
+                ...
+
+    .. note::
+        The epoch must be set before each epoch's :class:`torch:torch.utils.data.DataLoader` iterator is created,
+        as worker processes receive a copy of the data set (so ``persistent_workers`` cannot be used).
+
+        If no indices are available (e.g. when used with :class:`TransformCollate`), the keys are drawn from
+        PyTorch's global random number generator, so augmentations are random but not reproducible across different numbers of workers.
+
+    Parameters
+    ----------
+    transforms: list of augmentations
+        The augmentations to apply, in order, e.g. :class:`TimeShift`, :class:`Gain`, :class:`AddNoise`,
+        :class:`SpeedPerturb`, :class:`TimeMask` and :class:`FrequencyMask`.
+
+    seed: int
+        Seed for the random parameters.
+    """
+    indexed = True
+
+    def __init__(self, transforms, seed=0):
+        self.transforms = transforms
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        """Sets the epoch number used to derive the random parameters.
+
+        Parameters
+        ----------
+        epoch: int
+            The epoch number.
+        """
+        self.epoch = epoch
+
+    def keys(self, indices):
+        """Derives the keys that determine the random parameters of recordings.
+
+        Parameters
+        ----------
+        indices: array-like of int
+            Indices of the recordings.
+
+        Returns
+        -------
+        keys: :class:`numpy:numpy.ndarray`
+            A :class:`numpy:numpy.uint64` key for each recording.
+        """
+        return _combine(_combine(_combine(np.zeros(1, dtype=np.uint64), self.seed), self.epoch), indices)
+
+    def __call__(self, x, index=None):
+        """Applies the augmentations to a single recording.
+
+        Parameters
+        ----------
+        x: torch.Tensor
+            A one-dimensional tensor of audio samples (or a tensor with time as its last dimension).
+
+        index: int, optional
+            Index of the recording.
+
+        Returns
+        -------
+        x: :class:`torch:torch.Tensor`
+            The augmented recording, which is identical to the recording augmented as part of any batch.
+        """
+        x, lengths = self.batch(x.unsqueeze(0), torch.tensor([x.shape[-1]]), indices=None if index is None else [index])
+        return x[0, ..., :int(lengths[0])]
+
+    def batch(self, x, lengths, indices=None):
+        """Applies the augmentations to a batch of padded recordings.
+
+        Parameters
+        ----------
+        x: torch.Tensor
+            A ``(B, T)`` tensor of padded recordings (or a ``(B, ..., T)`` tensor of features, for :class:`TimeMask` and :class:`FrequencyMask`).
+
+        lengths: torch.Tensor
+            The lengths of the recordings.
+
+        indices: array-like of int, optional
+            Indices of the recordings.
+
+        Returns
+        -------
+        x: :class:`torch:torch.Tensor`
+            The augmented batch.
+
+        lengths: :class:`torch:torch.Tensor`
+            The lengths of the augmented recordings.
+        """
+        lengths = torch.as_tensor(lengths, dtype=torch.long, device=x.device)
+        if indices is None:
+            keys = torch.randint(2 ** 62, (len(x),), dtype=torch.int64).numpy().astype(np.uint64)
+        else:
+            keys = self.keys(indices)
+        # Each augmentation draws from independent streams
+        for i, transform in enumerate(self.transforms):
+            x, lengths = transform.augment(x, lengths, _combine(keys, i))
+        return x, lengths
 
-        for i, sample in enumerate(x):
-            if abs(sample) > self.threshold:
-                start = i
-                break
+    def __repr__(self):
+        return f'{self.__class__.__name__}(transforms={self.transforms!r}, seed={self.seed}, epoch={self.epoch})'
 
-        # Reverse the array for trimming the end
-        for i, sample in enumerate(x.flip(dims=(0,))):
-            if abs(sample) > self.threshold:
-                end = len(x) - i
-                break
+class _Augmentation(abc.ABC):
+    def __init__(self, p):
+        assert 0. <= p <= 1.
+        self.p = p
+
+    def _uniform(self, keys, n, x):
+        # n uniform samples in [0, 1) for each row, determined only by the key of the row
+        counters = keys[:, None] + np.arange(1, n + 1, dtype=np.uint64) * _GOLDEN
+        return torch.from_numpy((_mix(counters) >> np.uint64(11)) * 2. ** -53).to(x.device)
+
+    @abc.abstractmethod
+    def augment(self, x, lengths, keys):
+        """Applies the augmentation to a batch of padded recordings (this is called by :class:`Augment`).
+
+        Parameters
+        ----------
+        x: torch.Tensor
+            A tensor of padded recordings.
+
+        lengths: torch.Tensor
+            The lengths of the recordings.
+
+        keys: numpy.ndarray
+            A :class:`numpy:numpy.uint64` key for each recording, which determines its random parameters.
+
+        Returns
+        -------
+        x: :class:`torch:torch.Tensor`
+            The augmented batch.
+
+        lengths: :class:`torch:torch.Tensor`
+            The lengths of the augmented recordings.
+        """
+
+    def __repr__(self):
+        params = ', '.join(f'{key}={value!r}' for key, value in self.__dict__.items())
+        return f'{self.__class__.__name__}({params})'
+
+class TimeShift(_Augmentation):
+    """Shifts each recording by a random number of samples, within its original length (filling with zeros).
+
+    Parameters
+    ----------
+    max_shift: int
+        Maximum number of samples to shift by (in either direction).
+
+    p: float
+        Probability of shifting each recording.
+    """
+    def __init__(self, max_shift, p=1.):
+        super().__init__(p)
+        assert max_shift >= 0
+        self.max_shift = max_shift
+
+    def augment(self, x, lengths, keys):
+        assert x.ndim == 2
+        u = self._uniform(keys, 2, x)
+        shift = (u[:, 1] * (2 * self.max_shift + 1)).long() - self.max_shift
+        shift = shift.masked_fill(u[:, 0] >= self.p, 0)
+
+        positions = torch.arange(x.shape[1], device=x.device)
+        source = positions - shift.unsqueeze(1)
+        valid = (source >= 0) & (source < lengths.unsqueeze(1)) & (positions < lengths.unsqueeze(1))
+        return x.gather(1, source.clamp(0, max(x.shape[1] - 1, 0))).masked_fill(~valid, 0), lengths
+
+class Gain(_Augmentation):
+    """Scales each recording by a random gain.
+
+    Parameters
+    ----------
+    min_gain_db: float
+        Minimum gain, in decibels.
+
+    max_gain_db: float
+        Maximum gain, in decibels.
+
+    p: float
+        Probability of scaling each recording.
+    """
+    def __init__(self, min_gain_db=-6., max_gain_db=6., p=1.):
+        super().__init__(p)
+        assert min_gain_db <= max_gain_db
+        self.min_gain_db = min_gain_db
+        self.max_gain_db = max_gain_db
+
+    def augment(self, x, lengths, keys):
+        u = self._uniform(keys, 2, x)
+        gain_db = self.min_gain_db + u[:, 1] * (self.max_gain_db - self.min_gain_db)
+        gain = torch.pow(10., gain_db / 20.).masked_fill(u[:, 0] >= self.p, 1.)
+        return x * gain.to(x.dtype).view(-1, *[1] * (x.ndim - 1)), lengths
+
+class AddNoise(_Augmentation):
+    """Adds white Gaussian noise to each recording, at a random signal-to-noise ratio.
+
+    The noise parameters and samples are generated for the whole batch at once. Each noise sample is generated
+    (with the Box-Muller transform) from a hash of the key of its recording and its position,
+    so that the noise of a recording does not depend on the padded length of the batch.
+
+    Parameters
+    ----------
+    min_snr_db: float
+        Minimum signal-to-noise ratio, in decibels.
+
+    max_snr_db: float
+        Maximum signal-to-noise ratio, in decibels.
+
+    p: float
+        Probability of adding noise to each recording.
+    """
+    def __init__(self, min_snr_db=10., max_snr_db=40., p=1.):
+        super().__init__(p)
+        assert min_snr_db <= max_snr_db
+        self.min_snr_db = min_snr_db
+        self.max_snr_db = max_snr_db
+
+    def augment(self, x, lengths, keys):
+        assert x.ndim == 2
+        u = self._uniform(keys, 2, x)
+        snr_db = self.min_snr_db + u[:, 1] * (self.max_snr_db - self.min_snr_db)
+        power = x.pow(2).sum(dim=1).double() / lengths.clamp(min=1)
+        std = (power / torch.pow(10., snr_db / 10.)).sqrt().to(x.dtype)
+
+        rows = torch.nonzero(u[:, 0] < self.p).flatten()
+        if len(rows) == 0:
+            return x, lengths
+
+        # One 64-bit hash of a separate stream of each recording's key per sample, split into two uniform samples
+        counters = _combine(keys[rows.cpu().numpy()], -1)[:, None] + np.arange(1, x.shape[1] + 1, dtype=np.uint64) * _GOLDEN
+        bits = _mix(counters)
+        u1 = ((bits >> np.uint64(32)) + np.uint64(1)) * 2. ** -32
+        u2 = (bits & np.uint64(0xffffffff)) * 2. ** -32
+        noise = torch.from_numpy(np.sqrt(-2. * np.log(u1)) * np.cos(2. * np.pi * u2)).to(device=x.device, dtype=x.dtype)
+
+        # Only add noise to the samples of each recording (not to its padding)
+        noise *= (torch.arange(x.shape[1], device=x.device) < lengths[rows].unsqueeze(1)) * std[rows].unsqueeze(1)
+        return x.index_add(0, rows, noise), lengths
+
+class SpeedPerturb(_Augmentation):
+    """Changes the speed (and pitch) of each recording by a randomly chosen factor, with linear interpolation.
+
+    Unlike resampling each recording separately, all recordings of a batch are interpolated with a single gather,
+    which does not low-pass filter the recordings that are sped up.
+
+    Parameters
+    ----------
+    factors: list of float
+        The speed factors to choose from (e.g. `1.1` shortens recordings by about 10%).
+
+    p: float
+        Probability of perturbing each recording.
+    """
+    def __init__(self, factors=(0.9, 1., 1.1), p=1.):
+        super().__init__(p)
+        assert len(factors) > 0 and all(factor > 0 for factor in factors)
+        self.factors = tuple(factors)
+
+    def augment(self, x, lengths, keys):
+        assert x.ndim == 2
+        u = self._uniform(keys, 2, x)
+        choice = (u[:, 1] * len(self.factors)).long().clamp(max=len(self.factors) - 1)
+        factor = torch.tensor(self.factors, dtype=torch.float64, device=x.device)[choice].masked_fill(u[:, 0] >= self.p, 1.)
+
+        # Each output sample interpolates the two input samples around its (fractional) source position
+        new_lengths = torch.where(lengths > 0, ((lengths - 1) / factor).floor().long() + 1, torch.zeros_like(lengths))
+        T_out = int(new_lengths.max()) if len(x) > 0 else 0
+        positions = torch.arange(T_out, dtype=torch.float64, device=x.device) * factor.unsqueeze(1)
+        last = (lengths - 1).clamp(min=0).unsqueeze(1)
+        left = torch.min(positions.floor().long(), last)
+        right = torch.min(left + 1, last)
+        weight = (positions - left).clamp(max=1.).to(x.dtype)
+
+        y = x.gather(1, left) * (1 - weight) + x.gather(1, right) * weight
+        return y.masked_fill(torch.arange(T_out, device=x.device) >= new_lengths.unsqueeze(1), 0), new_lengths
+
+class _Mask(_Augmentation):
+    def __init__(self, max_width, n_masks, p, value):
+        super().__init__(p)
+        assert max_width >= 0 and n_masks >= 0
+        self.max_width = max_width
+        self.n_masks = n_masks
+        self.value = value
+
+    def _mask(self, keys, x, extents, size):
+        # A (B, size) mask of n_masks random bands (within the extent of each row)
+        u = self._uniform(keys, 1 + 2 * self.n_masks, x)
+        positions = torch.arange(size, device=x.device)
+        mask = torch.zeros(len(x), size, dtype=torch.bool, device=x.device)
+        for i in range(self.n_masks):
+            width = torch.min((u[:, 1 + 2 * i] * (self.max_width + 1)).long(), extents)
+            start = (u[:, 2 + 2 * i] * (extents - width + 1)).long()
+            mask |= (positions >= start.unsqueeze(1)) & (positions < (start + width).unsqueeze(1))
+        return mask & (u[:, 0] < self.p).unsqueeze(1)
+
+class TimeMask(_Mask):
+    """Masks random bands of consecutive time steps of each recording (as in SpecAugment).
+
+    This can be applied to waveforms, or to features with time as their last dimension, such as the
+    ``(B, n_mels, T)`` output of ``Batched(MelSpectrogram(...))``.
+
+    Parameters
+    ----------
+    max_width: int
+        Maximum width of each band (which is also limited to the length of the recording).
+
+    n_masks: int
+        Number of bands to mask in each recording.
+
+    p: float
+        Probability of masking each recording.
+
+    value: float
+        The value to fill masked bands with.
+    """
+    def __init__(self, max_width, n_masks=1, p=1., value=0.):
+        super().__init__(max_width, n_masks, p, value)
+
+    def augment(self, x, lengths, keys):
+        mask = self._mask(keys, x, lengths, x.shape[-1])
+        return x.masked_fill(mask.view(len(x), *[1] * (x.ndim - 2), x.shape[-1]), self.value), lengths
+
+class FrequencyMask(_Mask):
+    """Masks random bands of consecutive frequency bins (or other features) of each recording (as in SpecAugment).
+
+    This must be applied to features with frequency as their second-to-last dimension, such as the
+    ``(B, n_mels, T)`` output of ``Batched(MelSpectrogram(...))``.
+
+    Parameters
+    ----------
+    max_width: int
+        Maximum width of each band.
+
+    n_masks: int
+        Number of bands to mask in each recording.
+
+    p: float
+        Probability of masking each recording.
+
+    value: float
+        The value to fill masked bands with.
+    """
+    def __init__(self, max_width, n_masks=1, p=1., value=0.):
+        super().__init__(max_width, n_masks, p, value)
 
-        return x[start:end]
\ No newline at end of file
+    def augment(self, x, lengths, keys):
+        assert x.ndim >= 3
+        n_bins = x.shape[-2]
+        mask = self._mask(keys, x, torch.full_like(lengths, n_bins), n_bins)
+        return x.masked_fill(mask.view(len(x), *[1] * (x.ndim - 3), n_bins, 1), self.value), lengths
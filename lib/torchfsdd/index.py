@@ -0,0 +1,247 @@
+import os, numpy as np
+from .audio import read_wav_header
+
+__all__ = ['MetadataIndex']
+
+class MetadataIndex:
+    """A columnar index of the metadata of FSDD recordings.
+
+    The digit, speaker and recording number of each recording are parsed from its file name once,
+    and stored as arrays so that splits and filters can be computed with vectorized array operations.
+    The modification time and size of each file are also recorded, so that a persisted index can be validated against the recordings.
+
+    Optionally, the number of samples and sample rate of each recording can be read from the WAV headers
+    (without decoding the audio).
+
+    Parameters
+    ----------
+    paths: array-like of str
+        File paths of the recordings.
+
+    digits: array-like of int
+        The digit spoken in each recording.
+
+    speakers: array-like of int
+        The speaker of each recording, as an index into ``speaker_names``.
+
+    speaker_names: list of str
+        The names of the speakers.
+
+    rec_nums: array-like of int
+        The recording number of each recording.
+
+    mtimes: array-like of int, optional
+        The modification time of each file (in nanoseconds).
+
+    sizes: array-like of int, optional
+        The size of each file (in bytes).
+
+    num_samples: array-like of int, optional
+        The number of samples (frames) of each recording.
+
+    sample_rates: array-like of int, optional
+        The sample rate of each recording.
+    """
+    COLUMNS = ['paths', 'digits', 'speakers', 'rec_nums', 'mtimes', 'sizes', 'num_samples', 'sample_rates']
+
+    def __init__(self, paths, digits, speakers, speaker_names, rec_nums, mtimes=None, sizes=None, num_samples=None, sample_rates=None):
+        self.paths = np.asarray(paths, dtype=str)
+        self.digits = np.asarray(digits, dtype=np.int8)
+        self.speakers = np.asarray(speakers, dtype=np.int16)
+        self.speaker_names = list(speaker_names)
+        self.rec_nums = np.asarray(rec_nums, dtype=np.int16)
+        self.mtimes = None if mtimes is None else np.asarray(mtimes, dtype=np.int64)
+        self.sizes = None if sizes is None else np.asarray(sizes, dtype=np.int64)
+        self.num_samples = None if num_samples is None else np.asarray(num_samples, dtype=np.int64)
+        self.sample_rates = None if sample_rates is None else np.asarray(sample_rates, dtype=np.int32)
+
+    @classmethod
+    def build(cls, files, headers=False):
+        """Builds an index by parsing the names (and optionally the WAV headers) of recordings.
+
+        Parameters
+        ----------
+        files: list of str
+            File paths to the WAV audio recordings, named in FSDD format, e.g. ``0_george_0.wav``.
+
+        headers: bool
+            Whether or not to read the number of samples and sample rate of each recording from its WAV header.
+
+        Returns
+        -------
+        index: :class:`MetadataIndex`
+            The index of the recordings, sorted by path.
+        """
+        files = sorted(files)
+        digits, speaker_ids, speaker_names, rec_nums = cls._parse(files)
+        stats = [os.stat(file) for file in files]
+
+        num_samples, sample_rates = None, None
+        if headers:
+            wav_headers = [read_wav_header(file) for file in files]
+            num_samples = [header.num_frames * header.num_channels for header in wav_headers]
+            sample_rates = [header.sample_rate for header in wav_headers]
+
+        return cls(
+            files, digits, speaker_ids, speaker_names, rec_nums,
+            mtimes=[stat.st_mtime_ns for stat in stats], sizes=[stat.st_size for stat in stats],
+            num_samples=num_samples, sample_rates=sample_rates
+        )
+
+    @staticmethod
+    def _parse(files):
+        # Parses the digit, speaker and recording number from the name of each recording
+        digits, speakers, rec_nums = [], [], []
+        for file in files:
+            digit, speaker, rec_num = os.path.splitext(os.path.basename(file))[0].split('_')
+            digits.append(int(digit))
+            speakers.append(speaker)
+            rec_nums.append(int(rec_num))
+        speaker_names, speaker_ids = np.unique(np.asarray(speakers, dtype=str), return_inverse=True)
+        return digits, speaker_ids, speaker_names.tolist(), rec_nums
+
+    def update(self, files, headers=None):
+        """Updates the index for recordings that have been added, removed or changed since it was built.
+
+        Recordings are compared by path, modification time and size. The WAV headers of unchanged recordings are not read again.
+        If the index has no modification times or sizes (e.g. if it was built from an archive), every recording is treated as changed.
+
+        Parameters
+        ----------
+        files: list of str
+            File paths to the current WAV audio recordings.
+
+        headers: bool, optional
+            Whether or not to include the number of samples and sample rate of each recording.
+            Defaults to whether this index includes them.
+
+        Returns
+        -------
+        index: :class:`MetadataIndex`
+            The updated index, sorted by path.
+
+        changes: dict
+            The sorted paths of the `'added'`, `'removed'` and `'changed'` recordings.
+        """
+        headers = self.has_headers if headers is None else headers
+        files = sorted(files)
+        stats = [os.stat(file) for file in files]
+        mtimes = np.array([stat.st_mtime_ns for stat in stats], dtype=np.int64)
+        sizes = np.array([stat.st_size for stat in stats], dtype=np.int64)
+
+        # Position of each recording in this index (or -1 if it was added)
+        previous = {path: i for i, path in enumerate(self.paths.tolist())}
+        positions = np.array([previous.get(file, -1) for file in files], dtype=np.int64)
+        known = positions >= 0
+        unchanged = np.zeros(len(files), dtype=bool)
+        if self.mtimes is not None and self.sizes is not None:
+            unchanged[known] = (self.mtimes[positions[known]] == mtimes[known]) & (self.sizes[positions[known]] == sizes[known])
+
+        changes = {
+            'added': [files[i] for i in np.flatnonzero(~known)],
+            'removed': sorted(set(previous) - set(files)),
+            'changed': [files[i] for i in np.flatnonzero(known & ~unchanged)]
+        }
+
+        num_samples, sample_rates = None, None
+        if headers:
+            num_samples = np.zeros(len(files), dtype=np.int64)
+            sample_rates = np.zeros(len(files), dtype=np.int32)
+            reuse = unchanged & self.has_headers
+            if self.has_headers:
+                num_samples[reuse] = self.num_samples[positions[reuse]]
+                sample_rates[reuse] = self.sample_rates[positions[reuse]]
+            for i in np.flatnonzero(~reuse):
+                header = read_wav_header(files[i])
+                num_samples[i] = header.num_frames * header.num_channels
+                sample_rates[i] = header.sample_rate
+
+        digits, speaker_ids, speaker_names, rec_nums = self._parse(files)
+        index = type(self)(
+            files, digits, speaker_ids, speaker_names, rec_nums,
+            mtimes=mtimes, sizes=sizes, num_samples=num_samples, sample_rates=sample_rates
+        )
+        return index, changes
+
+    @classmethod
+    def from_archive(cls, archive):
+        """Builds an index from the index of an :class:`FSDDArchive`.
+
+        Parameters
+        ----------
+        archive: :class:`FSDDArchive`
+            The archive.
+
+        Returns
+        -------
+        index: :class:`MetadataIndex`
+            The index of the archived recordings.
+        """
+        index = archive.index
+        return cls(
+            archive.files, index['label'], index['speaker'], archive.speaker_names, index['rec_num'],
+            num_samples=index['length'], sample_rates=index['sample_rate']
+        )
+
+    def save(self, path):
+        """Saves the index to a NumPy ``.npz`` file.
+
+        Parameters
+        ----------
+        path: str
+            Path of the file to save the index to.
+        """
+        columns = {column: getattr(self, column) for column in self.COLUMNS if getattr(self, column) is not None}
+        with open(path, 'wb') as f:
+            np.savez(f, speaker_names=np.asarray(self.speaker_names, dtype=str), **columns)
+
+    @classmethod
+    def load(cls, path):
+        """Loads an index saved with :meth:`save`.
+
+        Parameters
+        ----------
+        path: str
+            Path of the saved index.
+
+        Returns
+        -------
+        index: :class:`MetadataIndex`
+            The loaded index.
+        """
+        with np.load(path) as data:
+            columns = {column: data[column] for column in cls.COLUMNS if column in data.files}
+            return cls(speaker_names=data['speaker_names'].tolist(), **columns)
+
+    def matches(self, files):
+        """Checks whether the index is up to date with a set of recordings.
+
+        Parameters
+        ----------
+        files: list of str
+            File paths to the WAV audio recordings.
+
+        Returns
+        -------
+        matches: bool
+            Whether the index contains exactly these files, with unchanged modification times and sizes.
+        """
+        files = sorted(files)
+        if self.mtimes is None or self.sizes is None or files != self.paths.tolist():
+            return False
+        stats = [os.stat(file) for file in files]
+        return (
+            np.array_equal(self.mtimes, [stat.st_mtime_ns for stat in stats]) and
+            np.array_equal(self.sizes, [stat.st_size for stat in stats])
+        )
+
+    @property
+    def has_headers(self):
+        """bool: Whether the index contains the number of samples and sample rate of each recording."""
+        return self.num_samples is not None and self.sample_rates is not None
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(n_recordings={len(self)}, n_speakers={len(self.speaker_names)}, headers={self.has_headers})'
\ No newline at end of file
@@ -0,0 +1,166 @@
+import numpy as np, torch, torchaudio
+from .audio import read_wav, read_wav_header, UnsupportedWavFormat
+
+__all__ = ['FileLoader', 'ArchiveLoader', 'PackedLoader', 'ShardLoader', 'DECODERS']
+
+DECODERS = ('auto', 'native', 'torchaudio')
+
+def _quantize(x):
+    # Converts normalized float samples to 16-bit integer samples
+    return (x * 32768.).round_().clamp_(-32768, 32767).to(torch.int16)
+
+class FileLoader:
+    """Loads recordings from their WAV files.
+
+    Each loader returns an item as a single tensor: a one-dimensional tensor of samples for audio recordings.
+
+    Loaders are plain picklable objects, so data sets using them can be sent to
+    :class:`torch:torch.utils.data.DataLoader` worker processes with any multiprocessing start method.
+
+    Parameters
+    ----------
+    files: list of str
+        File paths to the WAV audio recordings.
+
+    decoder: str or callable
+        The audio reader to use:
+
+        - `'auto'`: Uncompressed (integer PCM or IEEE float) WAV files, such as those of FSDD, are read with the native
+          :func:`torchfsdd.audio.read_wav` reader, which parses the header and reads the samples directly, without the
+          per-call overhead of a general-purpose decoder. Any other files (or any files, if ``**args`` are given)
+          are loaded with :py:func:`torchaudio:torchaudio.load`.
+        - `'native'`: Always use the native reader (raising :class:`torchfsdd.audio.UnsupportedWavFormat` for other files).
+        - `'torchaudio'`: Always use :py:func:`torchaudio:torchaudio.load`.
+        - A callable that takes a file path and returns a tensor of normalized samples.
+
+    dtype: :class:`torch:torch.dtype`
+        The data type of the returned samples: :class:`torch:torch.float32` for normalized samples in :math:`[-1, 1)`,
+        or :class:`torch:torch.int16` for (unnormalized) 16-bit integer samples, which are returned without any conversion
+        for 16-bit PCM files, halving their memory usage. Integer samples can be normalized later
+        (e.g. after being moved to a GPU) with :class:`torchfsdd.Normalize`.
+
+        If ``normalize=False`` is passed on to :py:func:`torchaudio:torchaudio.load`, the samples are returned as decoded.
+
+    **args: optional
+        Arbitrary keyword arguments passed on to :py:func:`torchaudio:torchaudio.load`, such as ``normalize`` or ``backend``.
+    """
+    def __init__(self, files, decoder='auto', dtype=torch.float32, **args):
+        assert callable(decoder) or decoder in DECODERS
+        assert dtype in (torch.float32, torch.int16)
+        self.files = files
+        self.decoder = decoder
+        self.dtype = dtype
+        self.args = args
+        self._native = decoder == 'native' or (decoder == 'auto' and len(args) == 0)
+
+    def __call__(self, position):
+        file = self.files[position]
+        if self._native:
+            try:
+                samples, _ = read_wav(file, normalize=self.dtype != torch.int16)
+                if samples.dtype not in (np.float32, np.int16):
+                    # Integer samples that are not 16-bit are requantized from their normalized values
+                    samples, _ = read_wav(file)
+                x = torch.from_numpy(samples).flatten()
+                return x if x.dtype == self.dtype else self._convert(x)
+            except UnsupportedWavFormat:
+                if self.decoder == 'native':
+                    raise
+
+        if callable(self.decoder):
+            x = self.decoder(file).flatten()
+        else:
+            x = torchaudio.load(file, **self.args)[0].flatten()
+            if not self.args.get('normalize', True):
+                return x
+        return x if x.dtype == self.dtype else self._convert(x)
+
+    def _convert(self, x):
+        if self.dtype == torch.int16:
+            return _quantize(x.float())
+        if x.dtype == torch.int16:
+            return x.float().mul_(2. ** -15)
+        return x.to(self.dtype)
+
+    def lengths(self, positions):
+        lengths = []
+        for position in positions:
+            file = self.files[position]
+            try:
+                header = read_wav_header(file)
+                lengths.append(header.num_frames * header.num_channels)
+            except ValueError:
+                info = torchaudio.info(file)
+                lengths.append(info.num_frames * info.num_channels)
+        return torch.tensor(lengths, dtype=torch.long)
+
+    def __len__(self):
+        return len(self.files)
+
+class ArchiveLoader:
+    """Loads recordings from an :class:`FSDDArchive`, as zero-copy views of the memory-mapped archive.
+
+    Parameters
+    ----------
+    archive: :class:`FSDDArchive`
+        The archive to read recordings from.
+
+    files: list of str
+        Names of the recordings in the archive.
+    """
+    def __init__(self, archive, files):
+        self.archive = archive
+        self.positions = np.array([archive.position(file) for file in files], dtype=np.int64)
+
+    def __call__(self, position):
+        return self.archive[int(self.positions[position])]
+
+    def lengths(self, positions):
+        return self.archive.recordings.lengths[torch.as_tensor(self.positions[positions])]
+
+    def __len__(self):
+        return len(self.positions)
+
+class PackedLoader:
+    """Loads recordings from a :class:`PackedRecordings` in-memory store.
+
+    Parameters
+    ----------
+    recordings: :class:`PackedRecordings`
+        The packed recordings.
+    """
+    def __init__(self, recordings):
+        self.recordings = recordings
+
+    def __call__(self, position):
+        return self.recordings[position]
+
+    def lengths(self, positions):
+        return self.recordings.lengths[torch.as_tensor(positions)]
+
+    def __len__(self):
+        return len(self.recordings)
+
+class ShardLoader:
+    """Loads precomputed features from :class:`FeatureShards`, as views of the memory-mapped shards.
+
+    Parameters
+    ----------
+    shards: :class:`FeatureShards`
+        The shards to read features from.
+
+    files: list of str
+        Names of the recordings in the shards.
+    """
+    def __init__(self, shards, files):
+        self.shards = shards
+        self.positions = np.array([shards.position(file) for file in files], dtype=np.int64)
+
+    def __call__(self, position):
+        return self.shards[int(self.positions[position])]
+
+    def lengths(self, positions):
+        return self.shards.lengths[torch.as_tensor(self.positions[positions])]
+
+    def __len__(self):
+        return len(self.positions)
\ No newline at end of file
@@ -0,0 +1,23 @@
+import fcntl
+from contextlib import contextmanager
+
+__all__ = ['file_lock']
+
+@contextmanager
+def file_lock(path):
+    """Holds an exclusive advisory lock on a file, for the duration of the ``with`` block.
+
+    The lock is taken with ``flock``, so it serializes processes on the same machine, and jobs sharing a
+    network file system that supports locking. The lock file is created if it does not exist, but is never removed.
+
+    Parameters
+    ----------
+    path: str
+        The path of the lock file. Its directory must already exist.
+    """
+    with open(path, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,279 @@
+import os, shutil, tarfile, tempfile, hashlib, subprocess
+from urllib.parse import quote
+from .locks import file_lock
+
+__all__ = ['DatasetMirror']
+
+REPOSITORY_URL = 'https://github.com/Jakobovski/free-spoken-digit-dataset'
+
+MANIFEST_FILE = 'MANIFEST'
+
+def _sha256(file, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(file, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _write_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def default_cache_dir():
+    """Returns the default directory for cached data: the ``TORCHFSDD_CACHE`` environment variable if set, or otherwise ``~/.cache/torchfsdd``."""
+    return os.environ.get('TORCHFSDD_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'torchfsdd'))
+
+class DatasetMirror:
+    """A content-addressed local mirror of FSDD versions, which can be shared by concurrent jobs.
+
+    Each version of the recordings is fetched once, and installed into ``cache_dir/objects/<digest>``,
+    where ``<digest>`` is the SHA-256 hash of a manifest listing the SHA-256 hash and size of every recording.
+    A reference file ``cache_dir/refs/<version>`` records the digest of each fetched version.
+    Later requests for the same version reuse the installed recordings, without contacting the source.
+
+    Installation is atomic: recordings are extracted and checksummed in a temporary directory within ``cache_dir``,
+    which is then renamed into place, so a partially installed version is never visible.
+    Fetches of the same version are serialized with a file lock, so concurrent jobs sharing ``cache_dir``
+    (e.g. on a network file system that supports locking) wait for a single fetch rather than racing.
+
+    Recordings can be fetched from:
+
+    - the upstream GitHub repository, with a shallow clone of a single branch or tag (the default),
+    - a pre-downloaded tarball of the repository (e.g. a GitHub release archive) or of the recordings,
+    - a local Git repository (bare or not), from which the ``recordings`` folder of the version is read with ``git archive``.
+
+    .. code-block:: python
+
+        from torchfsdd import DatasetMirror, TorchFSDDGenerator
+
+        # Offline, from a pre-downloaded release archive
+        mirror = DatasetMirror('/shared/cache/torchfsdd')
+        path = mirror.fetch('v1.0.10', source='/shared/downloads/free-spoken-digit-dataset-1.0.10.tar.gz')
+        fsdd = TorchFSDDGenerator(version='local', path=path)
+
+    Parameters
+    ----------
+    cache_dir: str, optional
+        The directory of the mirror. If not specified, the ``TORCHFSDD_CACHE`` environment variable is used if set,
+        or otherwise ``~/.cache/torchfsdd``.
+
+    url: str
+        URL of the Git repository to clone versions from, when no ``source`` is given to :meth:`fetch`.
+    """
+    def __init__(self, cache_dir=None, url=REPOSITORY_URL):
+        if cache_dir is None:
+            cache_dir = default_cache_dir()
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.url = url
+        for folder in ('objects', 'refs', 'locks', 'tmp'):
+            os.makedirs(os.path.join(self.cache_dir, folder), exist_ok=True)
+
+    def _ref_path(self, version):
+        return os.path.join(self.cache_dir, 'refs', quote(version, safe=''))
+
+    def object_path(self, digest):
+        """Returns the directory of the recordings with a given digest.
+
+        Parameters
+        ----------
+        digest: str
+            The digest of the recordings.
+
+        Returns
+        -------
+        path: str
+            The directory containing the WAV recordings and their manifest.
+        """
+        return os.path.join(self.cache_dir, 'objects', digest)
+
+    def digest(self, version):
+        """Returns the digest of the recordings of an installed version.
+
+        Parameters
+        ----------
+        version: str
+            The branch name or version tag.
+
+        Returns
+        -------
+        digest: str or None
+            The digest of the recordings, or `None` if the version has not been installed.
+        """
+        try:
+            with open(self._ref_path(version), 'r') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def verify(self, digest, checksums=False):
+        """Checks that installed recordings are intact.
+
+        Parameters
+        ----------
+        digest: str
+            The digest of the recordings.
+
+        checksums: bool
+            Whether or not to recompute the SHA-256 hash of every recording.
+            Otherwise, only the presence and size of each recording listed in the manifest is checked.
+
+        Returns
+        -------
+        intact: bool
+            Whether the recordings match their manifest.
+        """
+        path = self.object_path(digest)
+        try:
+            with open(os.path.join(path, MANIFEST_FILE), 'r') as f:
+                manifest = f.read()
+        except FileNotFoundError:
+            return False
+
+        if hashlib.sha256(manifest.encode()).hexdigest() != digest:
+            return False
+
+        for line in manifest.splitlines():
+            sha, size, name = line.split(' ', 2)
+            file = os.path.join(path, name)
+            try:
+                if os.path.getsize(file) != int(size):
+                    return False
+            except FileNotFoundError:
+                return False
+            if checksums and _sha256(file) != sha:
+                return False
+        return True
+
+    def fetch(self, version='master', source=None, checksum=None, refresh=False, verify=False):
+        """Returns the directory of the recordings of a version, fetching and installing them if necessary.
+
+        Parameters
+        ----------
+        version: str
+            The branch name or version tag, e.g. `'v1.0.10'`.
+
+        source: str, optional
+            Path to a tarball (``.tar``, ``.tar.gz``, ``.tgz``, ``.tar.bz2`` or ``.tar.xz``)
+            or a local Git repository to fetch the recordings from.
+            If not specified, the version is cloned from :attr:`url`.
+
+        checksum: str, optional
+            The expected SHA-256 hash of the ``source`` tarball.
+
+        refresh: bool
+            Whether or not to fetch the version again even if it is already installed (e.g. for branches such as `'master'`).
+
+        verify: bool
+            Whether or not to recompute the checksums of installed recordings before reusing them.
+            Recordings are otherwise only checked against the sizes in their manifest.
+
+        Returns
+        -------
+        path: str
+            The directory containing the WAV recordings.
+        """
+        if not refresh:
+            digest = self.digest(version)
+            if digest is not None and self.verify(digest, checksums=verify):
+                return self.object_path(digest)
+
+        with file_lock(os.path.join(self.cache_dir, 'locks', quote(version, safe='') + '.lock')):
+            # Another process may have installed the version while waiting for the lock
+            if not refresh:
+                digest = self.digest(version)
+                if digest is not None and self.verify(digest, checksums=verify):
+                    return self.object_path(digest)
+
+            tmp_path = tempfile.mkdtemp(dir=os.path.join(self.cache_dir, 'tmp'))
+            try:
+                recordings = os.path.join(tmp_path, 'recordings')
+                os.mkdir(recordings)
+                self._extract(version, source, checksum, recordings, tmp_path)
+                digest = self._install(recordings)
+            finally:
+                shutil.rmtree(tmp_path, ignore_errors=True)
+
+            _write_atomic(self._ref_path(version), digest)
+            return self.object_path(digest)
+
+    def _extract(self, version, source, checksum, recordings, tmp_path):
+        if source is None:
+            clone_path = os.path.join(tmp_path, 'clone')
+            subprocess.run(['git', 'clone', '--quiet', '--depth', '1', '--branch', version, self.url, clone_path], check=True)
+            for name in os.listdir(os.path.join(clone_path, 'recordings')):
+                if name.endswith('.wav'):
+                    os.rename(os.path.join(clone_path, 'recordings', name), os.path.join(recordings, name))
+        elif os.path.isfile(source):
+            if checksum is not None and _sha256(source) != checksum.lower():
+                raise ValueError(f'Checksum mismatch for {source}')
+            with tarfile.open(source, 'r:*') as tar:
+                self._extract_tar(tar, recordings)
+        elif os.path.isdir(source):
+            command = ['git', '--git-dir', self._git_dir(source), 'archive', '--format=tar', version, 'recordings']
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            try:
+                with tarfile.open(fileobj=process.stdout, mode='r|') as tar:
+                    self._extract_tar(tar, recordings)
+            except tarfile.ReadError:
+                pass
+            finally:
+                process.stdout.close()
+            error = process.stderr.read().decode(errors='replace').strip()
+            if process.wait() != 0:
+                raise ValueError(f'Could not read version {version} from Git repository {source}: {error}')
+        else:
+            raise ValueError('Expected source to be a tarball or a Git repository')
+
+        if not any(name.endswith('.wav') for name in os.listdir(recordings)):
+            raise ValueError(f'No WAV recordings found for version {version}')
+
+    @staticmethod
+    def _git_dir(source):
+        # Non-bare repositories keep their Git directory in a .git subfolder
+        git_dir = os.path.join(source, '.git')
+        return git_dir if os.path.isdir(git_dir) else source
+
+    @staticmethod
+    def _extract_tar(tar, recordings):
+        # Only the WAV files are extracted, by name, so member paths cannot write outside of the directory
+        for member in tar:
+            name = os.path.basename(member.name)
+            if member.isfile() and name.endswith('.wav') and not name.startswith('.'):
+                with tar.extractfile(member) as src, open(os.path.join(recordings, name), 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+
+    def _install(self, recordings):
+        names = sorted(os.listdir(recordings))
+        manifest = ''.join(
+            f'{_sha256(os.path.join(recordings, name))} {os.path.getsize(os.path.join(recordings, name))} {name}\n'
+            for name in names
+        )
+        digest = hashlib.sha256(manifest.encode()).hexdigest()
+        with open(os.path.join(recordings, MANIFEST_FILE), 'w') as f:
+            f.write(manifest)
+        for name in names:
+            os.chmod(os.path.join(recordings, name), 0o444)
+        os.chmod(recordings, 0o755)
+
+        path = self.object_path(digest)
+        if self.verify(digest, checksums=True):
+            return digest
+
+        # Move any damaged copy aside, so that it can be replaced by a single rename
+        if os.path.exists(path):
+            stale = tempfile.mkdtemp(dir=os.path.join(self.cache_dir, 'tmp'))
+            os.rename(path, os.path.join(stale, 'stale'))
+            shutil.rmtree(stale, ignore_errors=True)
+        os.rename(recordings, path)
+        return digest
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(cache_dir={self.cache_dir!r})'
@@ -0,0 +1,199 @@
+import os, math, numpy as np, torch
+
+__all__ = ['LoadingStats']
+
+class LoadingStats:
+    """Per-stage timing histograms and counters of the items loaded by :class:`TorchFSDD` data sets.
+
+    The wall time of each stage of fetching an item (reading the cache, loading the recording, applying the
+    transformations and batch transformations, and writing to the cache) is recorded in a histogram with
+    logarithmically spaced bins, along with counters of the number of items, bytes loaded and cache hits/misses.
+
+    Statistics are stored in a :ref:`shared memory <torch:multiprocessing-best-practices>` tensor with one slot per process,
+    so :class:`torch:torch.utils.data.DataLoader` worker processes (started with any multiprocessing start method)
+    record into their own slots without any locking, and :meth:`summary` aggregates every slot from the main process.
+
+    .. code-block:: python
+
+        from torch.utils.data import DataLoader
+        from torchfsdd import TorchFSDDGenerator, LoadingStats
+
+        stats = LoadingStats()
+        stats.add_callback(lambda summary: print(summary['stages']['load']['mean_ms']))
+
+        train_set, test_set = TorchFSDDGenerator(stats=stats).train_test_split()
+        for x, y in DataLoader(train_set, num_workers=4):
+            ...
+
+        stats.report()
+
+    Parameters
+    ----------
+    slots: int
+        Maximum number of processes that record statistics (the main process, and one per worker process).
+        Worker processes beyond this number share slots, in which case their updates may race.
+
+    min_seconds: float
+        Upper edge of the first histogram bin (shorter times are counted in the first bin).
+
+    max_seconds: float
+        Lower edge of the last histogram bin (longer times are counted in the last bin).
+
+    bins_per_decade: int
+        Number of histogram bins per power of ten.
+    """
+    STAGES = ('cache_get', 'load', 'transforms', 'batch_transforms', 'cache_put', 'total')
+    COUNTERS = ('items', 'bytes', 'cache_hits', 'cache_misses')
+
+    def __init__(self, slots=64, min_seconds=1e-6, max_seconds=10., bins_per_decade=10):
+        assert slots > 0
+        assert 0 < min_seconds < max_seconds
+        self.slots = slots
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self.bins_per_decade = bins_per_decade
+        self.n_bins = int(math.ceil(math.log10(max_seconds / min_seconds) * bins_per_decade)) + 2
+
+        # The last column of each histogram holds the total time of the stage
+        self.times = torch.zeros(slots, len(self.STAGES), self.n_bins + 1, dtype=torch.float64).share_memory_()
+        self.counters = torch.zeros(slots, len(self.COUNTERS), dtype=torch.int64).share_memory_()
+        self.callbacks = []
+        self._attach()
+
+    def _attach(self):
+        # NumPy views of the shared tensors, which are much cheaper to update element-wise
+        self._times = self.times.numpy()
+        self._counters = self.counters.numpy()
+        self._stages = {stage: i for i, stage in enumerate(self.STAGES)}
+        self._counter_ids = {counter: i for i, counter in enumerate(self.COUNTERS)}
+        self._log_min = math.log10(self.min_seconds)
+        self._pid, self._slot = None, 0
+
+    def _current_slot(self):
+        # The slot only changes between processes, so it is looked up once per process
+        pid = os.getpid()
+        if pid != self._pid:
+            worker = torch.utils.data.get_worker_info()
+            self._pid, self._slot = pid, 0 if worker is None else (worker.id + 1) % self.slots
+        return self._slot
+
+    def record(self, stage, seconds):
+        """Records the wall time of a stage.
+
+        Parameters
+        ----------
+        stage: str
+            The stage, one of :attr:`STAGES`.
+
+        seconds: float
+            The wall time of the stage.
+        """
+        if seconds < self.min_seconds:
+            b = 0
+        else:
+            b = min(int((math.log10(seconds) - self._log_min) * self.bins_per_decade) + 1, self.n_bins - 1)
+        row = self._times[self._current_slot(), self._stages[stage]]
+        row[b] += 1
+        row[-1] += seconds
+
+    def count(self, counter, n=1):
+        """Increments a counter.
+
+        Parameters
+        ----------
+        counter: str
+            The counter, one of :attr:`COUNTERS`.
+
+        n: int
+            The amount to increment the counter by.
+        """
+        self._counters[self._current_slot(), self._counter_ids[counter]] += n
+
+    @property
+    def bin_edges(self):
+        """:class:`numpy:numpy.ndarray`: The ``n_bins + 1`` edges (in seconds) of the histogram bins, including zero and infinity."""
+        inner = self.min_seconds * 10 ** (np.arange(self.n_bins - 1) / self.bins_per_decade)
+        return np.concatenate([[0.], inner, [np.inf]])
+
+    def summary(self):
+        """Aggregates the statistics of every process.
+
+        Returns
+        -------
+        summary: dict
+            A dictionary with the following keys:
+
+            - ``'stages'``: for each stage, the ``count``, ``total_s`` and ``mean_ms`` of the recorded times,
+              the ``p50_ms``, ``p95_ms`` and ``p99_ms`` percentiles (estimated from the histogram, as the upper edge of the bin),
+              and the ``histogram`` bin counts (see :attr:`bin_edges`),
+            - ``'counters'``: the total of each counter,
+            - ``'workers'``: the number of items loaded by each slot that has loaded any (slot 0 is the main process).
+        """
+        times = self._times.sum(axis=0)
+        counters = self._counters.sum(axis=0)
+        edges = self.bin_edges
+
+        stages = {}
+        for stage, row in zip(self.STAGES, times):
+            histogram, total = row[:-1], row[-1]
+            count = int(histogram.sum())
+            cumulative = np.cumsum(histogram)
+            percentile = lambda q: float(edges[min(np.searchsorted(cumulative, q * count) + 1, len(edges) - 1)] * 1e3) if count > 0 else None
+            stages[stage] = {
+                'count': count,
+                'total_s': float(total),
+                'mean_ms': float(total / count * 1e3) if count > 0 else None,
+                'p50_ms': percentile(0.5),
+                'p95_ms': percentile(0.95),
+                'p99_ms': percentile(0.99),
+                'histogram': histogram.astype(np.int64).tolist()
+            }
+
+        items = self._counters[:, self._counter_ids['items']]
+        return {
+            'stages': stages,
+            'counters': {counter: int(value) for counter, value in zip(self.COUNTERS, counters)},
+            'workers': {int(slot): int(items[slot]) for slot in np.flatnonzero(items)}
+        }
+
+    def add_callback(self, callback):
+        """Adds a callback (e.g. an exporter to a metrics system) that is called with the :meth:`summary` on every :meth:`report`.
+
+        Parameters
+        ----------
+        callback: callable
+            A function of the summary dictionary.
+        """
+        self.callbacks.append(callback)
+
+    def report(self):
+        """Computes the :meth:`summary` and passes it to every callback.
+
+        Returns
+        -------
+        summary: dict
+            The summary.
+        """
+        summary = self.summary()
+        for callback in self.callbacks:
+            callback(summary)
+        return summary
+
+    def reset(self):
+        """Resets all statistics to zero."""
+        self.times.zero_()
+        self.counters.zero_()
+
+    def __getstate__(self):
+        # Callbacks are only called in the main process (and may not be picklable)
+        state = {key: value for key, value in self.__dict__.items() if not key.startswith('_')}
+        state['callbacks'] = []
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._attach()
+
+    def __repr__(self):
+        counters = self._counters.sum(axis=0)
+        return f'{self.__class__.__name__}(items={int(counters[0])}, bytes={int(counters[1])})'
@@ -0,0 +1,551 @@
+import os, sys, json, time, struct, weakref, threading, tempfile, numpy as np, torch, torchaudio
+from .audio import read_wav_header
+from concurrent.futures import ThreadPoolExecutor
+from .loaders import FileLoader, _quantize
+
+__all__ = ['PackedRecordings', 'SharedRecordings', 'FSDDArchive']
+
+class PackedRecordings:
+    """A contiguous in-memory store of variable-length audio recordings.
+
+    All samples are stored in a single flat buffer, with an offsets array marking where each recording starts and ends.
+    Indexing returns views into the buffer, so no per-recording tensors are allocated,
+    and forked :class:`torch:torch.utils.data.DataLoader` worker processes share the buffer instead of copying it.
+
+    Parameters
+    ----------
+    data: torch.Tensor
+        A one-dimensional tensor of the samples of all recordings, concatenated.
+
+    offsets: torch.Tensor
+        A one-dimensional :class:`torch:torch.long` tensor of ``N + 1`` offsets into ``data``,
+        where recording ``i`` is ``data[offsets[i]:offsets[i + 1]]``.
+    """
+    def __init__(self, data, offsets):
+        assert data.ndim == 1 and offsets.ndim == 1
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def pack(cls, recordings):
+        """Packs a sequence of recordings into a single buffer.
+
+        Parameters
+        ----------
+        recordings: list of torch.Tensor
+            The recordings to pack (each is flattened).
+
+        Returns
+        -------
+        packed: :class:`PackedRecordings`
+            The packed recordings.
+        """
+        recordings = [x.flatten() for x in recordings]
+        lengths = torch.tensor([len(x) for x in recordings], dtype=torch.long)
+        offsets = torch.zeros(len(recordings) + 1, dtype=torch.long)
+        torch.cumsum(lengths, dim=0, out=offsets[1:])
+        data = torch.cat(recordings) if len(recordings) > 0 else torch.zeros(0)
+        return cls(data, offsets)
+
+    @property
+    def lengths(self):
+        """:class:`torch:torch.Tensor`: The number of samples in each recording."""
+        return self.offsets[1:] - self.offsets[:-1]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f'Recording index {index} out of range for {len(self)} recordings')
+        return self.data[self.offsets[index]:self.offsets[index + 1]]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(n_recordings={len(self)}, n_samples={len(self.data)}, dtype={self.data.dtype})'
+
+class SharedRecordings(PackedRecordings):
+    """Packed recordings stored in a named POSIX shared memory segment, so that every process on a host
+    (e.g. every DDP rank, and the :class:`torch:torch.utils.data.DataLoader` worker processes of each rank) can
+    attach to a single copy of the recordings instead of holding its own.
+
+    A segment is created (and loaded) by a single process with :meth:`create`, and other processes :meth:`attach` to it by name,
+    waiting until it has finished loading. Attached recordings are pickled by name, so worker processes started with any
+    multiprocessing start method attach to the segment rather than copying it.
+
+    The segment is removed from the system (unlinked) when the process that created it calls :meth:`close`,
+    exits, or garbage collects it. Processes that have already attached keep their mapping until they close it,
+    so the creating process should outlive any processes that have yet to attach (e.g. by attaching before training).
+    The creating process also registers the segment with the :py:mod:`python:multiprocessing` resource tracker,
+    so that it is unlinked even if the process is killed.
+
+    This is normally used through the ``shared`` argument of :class:`TorchFSDD` (or :class:`TorchFSDDGenerator`).
+
+    .. note::
+        Shared memory segments require Python 3.8 or later.
+    """
+    MAGIC = b'TFSDDSHM'
+    HEADER = struct.Struct('<8sIIQQ32s')
+    LOADING, READY, FAILED = 0, 1, 2
+    DTYPES = {0: torch.float32, 1: torch.int16}
+    ALIGNMENT = 64
+
+    _lock = threading.Lock()
+
+    def __init__(self, shm, owner=False):
+        self._shm = shm
+        self.name = shm.name.lstrip('/')
+        self.owner = owner
+        magic, status, dtype, count, n_samples, self.fingerprint = self.HEADER.unpack_from(shm.buf)
+        if magic != self.MAGIC:
+            raise ValueError(f'Shared memory segment {self.name!r} does not contain TorchFSDD recordings')
+
+        # Tensors are NumPy views of the segment, which keep it mapped while they are in use
+        dtype = self.DTYPES[dtype]
+        offsets_start = self._align(self.HEADER.size, self.ALIGNMENT)
+        data_start = self._align(offsets_start + 8 * (count + 1), self.ALIGNMENT)
+        offsets = np.ndarray((count + 1,), dtype=np.int64, buffer=shm.buf, offset=offsets_start)
+        data = np.ndarray((n_samples,), dtype=torch.empty(0, dtype=dtype).numpy().dtype, buffer=shm.buf, offset=data_start)
+        super().__init__(torch.from_numpy(data), torch.from_numpy(offsets))
+
+        # Only the creating process unlinks the segment (and not processes forked from it)
+        self._finalizer = weakref.finalize(self, self._unlink, shm, os.getpid()) if owner else None
+
+    @classmethod
+    def create(cls, name, lengths, dtype=torch.float32, fingerprint=b''):
+        """Creates a shared memory segment for recordings with the given lengths, to be filled by the calling process.
+
+        The segment is created atomically, so if several processes try to create the same segment, exactly one succeeds.
+        The recordings can be written into :attr:`data` (e.g. with ``recordings[i].copy_(x)``), after which :meth:`ready`
+        must be called to allow other processes to attach.
+
+        Parameters
+        ----------
+        name: str
+            Name of the segment, e.g. ``'fsdd'`` (which should be short on macOS, where names are limited to 30 characters).
+
+        lengths: array-like of int
+            The number of samples of each recording.
+
+        dtype: :class:`torch:torch.dtype`
+            The data type of the samples (:class:`torch:torch.float32` or :class:`torch:torch.int16`).
+
+        fingerprint: bytes
+            Up to 32 bytes identifying the contents of the recordings, which attaching processes can check.
+
+        Returns
+        -------
+        recordings: :class:`SharedRecordings`
+            The (empty) recordings, owned by the calling process.
+
+        Raises
+        ------
+        FileExistsError
+            If a segment with the same name already exists.
+        """
+        shared_memory = cls._shared_memory()
+        codes = {dtype: code for code, dtype in cls.DTYPES.items()}
+        if dtype not in codes:
+            raise ValueError(f'Unsupported shared recording data type {dtype} (expected torch.float32 or torch.int16)')
+        assert len(fingerprint) <= 32
+
+        lengths = np.asarray(lengths, dtype=np.int64)
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        offsets_start = cls._align(cls.HEADER.size, cls.ALIGNMENT)
+        data_start = cls._align(offsets_start + offsets.nbytes, cls.ALIGNMENT)
+        size = data_start + int(offsets[-1]) * torch.empty(0, dtype=dtype).element_size()
+
+        shm = shared_memory.SharedMemory(name=name, create=True, size=max(size, 1))
+        cls.HEADER.pack_into(shm.buf, 0, cls.MAGIC, cls.LOADING, codes[dtype], len(lengths), int(offsets[-1]), fingerprint)
+        shm.buf[offsets_start:offsets_start + offsets.nbytes] = offsets.tobytes()
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name, fingerprint=None, timeout=600.):
+        """Attaches to a shared memory segment created by another process, waiting until it has finished loading.
+
+        Parameters
+        ----------
+        name: str
+            Name of the segment.
+
+        fingerprint: bytes, optional
+            The expected fingerprint of the recordings.
+
+        timeout: float
+            Maximum number of seconds to wait for the segment to be created and loaded.
+
+        Returns
+        -------
+        recordings: :class:`SharedRecordings`
+            The recordings.
+        """
+        shared_memory = cls._shared_memory()
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                shm = cls._open(shared_memory, name)
+                break
+            except FileNotFoundError:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f'Timed out waiting for shared memory segment {name!r} to be created')
+                time.sleep(0.01)
+
+        while True:
+            status = struct.unpack_from('<I', shm.buf, 8)[0]
+            if status == cls.READY:
+                break
+            if status == cls.FAILED or time.monotonic() > deadline:
+                shm.close()
+                raise RuntimeError(f'Shared memory segment {name!r} ' + ('failed to load' if status == cls.FAILED else
+                    'did not finish loading in time (if it was left behind by a killed process, remove it from /dev/shm)'))
+            time.sleep(0.01)
+
+        recordings = cls(shm)
+        if fingerprint is not None and recordings.fingerprint != fingerprint.ljust(32, b'\0'):
+            recordings.close()
+            raise ValueError(f'Shared memory segment {name!r} contains different recordings')
+        return recordings
+
+    @classmethod
+    def share(cls, name, recordings):
+        """Copies packed recordings into a new shared memory segment.
+
+        Parameters
+        ----------
+        name: str
+            Name of the segment.
+
+        recordings: :class:`PackedRecordings`
+            The recordings to copy.
+
+        Returns
+        -------
+        shared: :class:`SharedRecordings`
+            The shared recordings, owned by the calling process.
+        """
+        shared = cls.create(name, recordings.lengths.numpy(), dtype=recordings.data.dtype)
+        shared.data.copy_(recordings.data)
+        shared.ready()
+        return shared
+
+    @staticmethod
+    def _shared_memory():
+        if sys.version_info < (3, 8):
+            raise RuntimeError('Shared recordings require Python 3.8 or later')
+        from multiprocessing import shared_memory
+        return shared_memory
+
+    @classmethod
+    def _open(cls, shared_memory, name):
+        # Attaching processes do not own the segment, so the resource tracker must not unlink it when they exit
+        if sys.version_info >= (3, 13):
+            return shared_memory.SharedMemory(name=name, track=False)
+        from multiprocessing import resource_tracker
+        with cls._lock:
+            register = resource_tracker.register
+            resource_tracker.register = lambda name, rtype: None
+            try:
+                return shared_memory.SharedMemory(name=name)
+            finally:
+                resource_tracker.register = register
+
+    @staticmethod
+    def _unlink(shm, pid):
+        if os.getpid() == pid:
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _align(offset, alignment):
+        return -(-offset // alignment) * alignment
+
+    def _set_status(self, status):
+        struct.pack_into('<I', self._shm.buf, 8, status)
+
+    def ready(self):
+        """Marks the recordings as loaded, allowing other processes to attach."""
+        assert self.owner
+        self._set_status(self.READY)
+
+    def fail(self):
+        """Marks the recordings as failed to load (so that waiting processes raise an error), and unlinks the segment."""
+        assert self.owner
+        self._set_status(self.FAILED)
+        self._finalizer()
+
+    def close(self):
+        """Releases this process' mapping of the segment, and unlinks the segment if this process created it.
+
+        Tensors returned by indexing the recordings must not be used after closing them.
+        """
+        if self._shm is None:
+            return
+        if self._finalizer is not None:
+            self._finalizer()
+        shm, self._shm = self._shm, None
+        self.data = self.offsets = None
+        try:
+            shm.close()
+        except BufferError:
+            # Views of the recordings are still referenced, so the mapping is released once they are
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __reduce__(self):
+        # Other processes attach to the segment instead of copying it
+        return self.attach, (self.name, self.fingerprint, 0.)
+
+class FSDDArchive:
+    """A single-file binary archive of FSDD recordings, read through a memory map.
+
+    An archive consists of a fixed-size header, a JSON table of file and speaker names, an index of
+    per-recording offsets, lengths, labels, speakers, recording numbers and sample rates, followed by the
+    raw PCM samples of every recording. Opening an archive is a single ``open`` and ``mmap``,
+    and recordings are returned as zero-copy tensor views of the memory map, so processes reading the same archive
+    share the operating system's page cache.
+
+    Archives are created with :meth:`write` (or :meth:`TorchFSDDGenerator.export`),
+    and can be loaded with ``TorchFSDDGenerator(version='archive', path=...)``.
+
+    Parameters
+    ----------
+    path: str
+        Path to the archive file.
+    """
+    MAGIC = b'TFSDDARC'
+    FORMAT_VERSION = 1
+    HEADER = struct.Struct('<8sHHQQQQQ')
+    INDEX_DTYPE = np.dtype([
+        ('offset', '<u8'), ('length', '<u8'), ('sample_rate', '<u4'),
+        ('label', 'u1'), ('speaker', '<u2'), ('rec_num', '<u2')
+    ])
+    DTYPES = {0: np.dtype('<f4'), 1: np.dtype('<i2')}
+    ALIGNMENT = 64
+    NORMALIZATIONS = ('peak', 'rms')
+    RMS_LEVEL = 0.1
+    CHUNK_SIZE = 256
+
+    def __init__(self, path):
+        self.path = path
+        self._open()
+
+    def _open(self):
+        with open(self.path, 'rb') as f:
+            header = f.read(self.HEADER.size)
+            if len(header) < self.HEADER.size or not header.startswith(self.MAGIC):
+                raise ValueError(f'{self.path!r} is not a TorchFSDD archive')
+
+            magic, version, dtype, count, n_samples, meta_size, index_offset, data_offset = self.HEADER.unpack(header)
+            if version != self.FORMAT_VERSION:
+                raise ValueError(f'Unsupported archive format version {version} (expected {self.FORMAT_VERSION})')
+
+            meta = json.loads(f.read(meta_size).decode('utf8'))
+            f.seek(index_offset)
+            self.index = np.fromfile(f, dtype=self.INDEX_DTYPE, count=count)
+
+        self.dtype = self.DTYPES[dtype]
+        self.files = meta['files']
+        self.speaker_names = meta['speakers']
+        self._positions = {name: i for i, name in enumerate(self.files)}
+
+        # Copy-on-write mapping: tensor views are writable without ever modifying the archive
+        if n_samples > 0:
+            self._data = np.memmap(self.path, dtype=self.dtype, mode='c', offset=data_offset, shape=(n_samples,))
+        else:
+            self._data = np.zeros(0, dtype=self.dtype)
+
+        offsets = np.zeros(count + 1, dtype=np.int64)
+        offsets[1:] = self.index['offset'] + self.index['length']
+        self.recordings = PackedRecordings(torch.from_numpy(self._data), torch.from_numpy(offsets))
+
+    @classmethod
+    def write(cls, path, files, dtype=np.float32, sample_rate=None, normalize_to=None, num_workers=0, decoder='auto', reuse=None, **args):
+        """Decodes WAV recordings and writes them to an archive.
+
+        Recordings are decoded (and flattened), optionally converted to a canonical sample rate and level,
+        and streamed into the archive in order, which is written to a temporary file and atomically moved into place once complete.
+
+        Parameters
+        ----------
+        path: str
+            Path of the archive file to create.
+
+        files: list of str
+            List of file paths to the WAV audio recordings, named in FSDD format, e.g. ``0_george_0.wav``.
+
+        dtype: :class:`numpy:numpy.dtype`
+            The data type to store the samples as: ``float32`` for normalized samples, or ``int16`` for 16-bit integer samples
+            (which halves the size of the archive, and are returned as :class:`torch:torch.int16` tensors).
+
+        sample_rate: int, optional
+            Sample rate to resample the recordings to (with :class:`torchaudio:torchaudio.transforms.Resample`).
+            If not specified, recordings are stored at their original sample rates.
+
+        normalize_to: str, optional
+            How to normalize the level of each recording: `'peak'` scales the recording so that its maximum absolute sample is 1,
+            and `'rms'` scales it to a root mean square level of :attr:`RMS_LEVEL` (clipping any samples beyond :math:`[-1, 1]`).
+            If not specified, recordings are stored at their original levels.
+
+        num_workers: int
+            Number of threads used to decode and convert recordings in parallel.
+            If zero, recordings are decoded sequentially in the calling thread.
+
+        decoder: str or callable
+            The audio reader used to load WAV files (see :class:`FileLoader`).
+
+        reuse: dict, optional
+            Already converted recordings to store instead of decoding their files, as a mapping of file names
+            to ``(samples, sample_rate)`` tuples, e.g. the unchanged recordings of an archive written with the same options.
+
+        **args: optional
+            Arbitrary keyword arguments passed on to :py:func:`torchaudio:torchaudio.load`.
+
+        Returns
+        -------
+        archive: :class:`FSDDArchive`
+            The written archive.
+        """
+        names = [os.path.basename(file) for file in files]
+        speakers = sorted({name.split('_')[1] for name in names})
+        speaker_ids = {speaker: i for i, speaker in enumerate(speakers)}
+
+        meta = json.dumps({'files': names, 'speakers': speakers}).encode('utf8')
+        index = np.zeros(len(files), dtype=cls.INDEX_DTYPE)
+        index_offset = cls._align(cls.HEADER.size + len(meta), 8)
+        data_offset = cls._align(index_offset + index.nbytes, cls.ALIGNMENT)
+        codes = {dtype: code for code, dtype in cls.DTYPES.items()}
+        dtype = np.dtype(dtype).newbyteorder('<')
+        if dtype not in codes:
+            raise ValueError(f'Unsupported archive data type {dtype} (expected float32 or int16)')
+        code = codes[dtype]
+        if normalize_to not in (None,) + cls.NORMALIZATIONS:
+            raise ValueError(f'Unknown normalization {normalize_to!r} (expected one of {cls.NORMALIZATIONS})')
+
+        # Converted recordings are decoded as normalized samples, and only quantized once converted
+        convert = sample_rate is not None or normalize_to is not None
+        loader = FileLoader(files, decoder=decoder, dtype=torch.int16 if dtype.kind == 'i' and not convert else torch.float32, **args)
+        resamplers, lock = {}, threading.Lock()
+
+        def decode(position):
+            if reuse is not None and names[position] in reuse:
+                x, sr = reuse[names[position]]
+                return np.asarray(x).astype(dtype, copy=False), sr
+            x, sr = loader(position), cls._sample_rate(files[position])
+            if sample_rate is not None and sr != sample_rate:
+                with lock:
+                    if sr not in resamplers:
+                        resamplers[sr] = torchaudio.transforms.Resample(sr, sample_rate)
+                x, sr = resamplers[sr](x), sample_rate
+            if normalize_to is not None:
+                x = cls._normalize(x, normalize_to)
+            if convert and dtype.kind == 'i':
+                x = _quantize(x)
+            return x.numpy().astype(dtype, copy=False), sr
+
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f, ThreadPoolExecutor(max_workers=max(num_workers, 1)) as executor:
+                # Stream the samples of each recording into the data section, decoding a chunk of recordings at a time
+                f.seek(data_offset)
+                n_samples = 0
+                for start in range(0, len(files), cls.CHUNK_SIZE):
+                    positions = range(start, min(start + cls.CHUNK_SIZE, len(files)))
+                    results = executor.map(decode, positions) if num_workers > 0 else map(decode, positions)
+                    for i, (x, sr) in zip(positions, results):
+                        digit, speaker, rec_num = os.path.splitext(names[i])[0].split('_')
+                        index[i] = (n_samples, len(x), sr, int(digit), speaker_ids[speaker], int(rec_num))
+                        f.write(x.tobytes())
+                        n_samples += len(x)
+
+                # Write the header, name table and index now that every offset is known
+                f.seek(0)
+                f.write(cls.HEADER.pack(cls.MAGIC, cls.FORMAT_VERSION, code, len(files), n_samples, len(meta), index_offset, data_offset))
+                f.write(meta)
+                f.seek(index_offset)
+                f.write(index.tobytes())
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+        return cls(path)
+
+    @classmethod
+    def _normalize(cls, x, normalize):
+        if len(x) == 0:
+            return x
+        if normalize == 'peak':
+            scale = x.abs().max()
+        else:
+            scale = x.pow(2).mean().sqrt() / cls.RMS_LEVEL
+        return (x / scale).clamp_(-1., 1.) if scale > 0 else x
+
+    @staticmethod
+    def _sample_rate(file):
+        try:
+            return read_wav_header(file).sample_rate
+        except ValueError:
+            return torchaudio.info(file).sample_rate
+
+    @staticmethod
+    def _align(offset, alignment):
+        return -(-offset // alignment) * alignment
+
+    @property
+    def labels(self):
+        """:class:`numpy:numpy.ndarray`: The digit label of each recording."""
+        return self.index['label']
+
+    @property
+    def speakers(self):
+        """list of str: The speaker of each recording."""
+        return [self.speaker_names[i] for i in self.index['speaker']]
+
+    def position(self, name):
+        """Finds the position of a recording within the archive.
+
+        Parameters
+        ----------
+        name: str
+            File name (or path) of the recording, e.g. ``0_george_0.wav``.
+
+        Returns
+        -------
+        position: int
+            The index of the recording in the archive.
+        """
+        return self._positions[os.path.basename(name)]
+
+    def __len__(self):
+        return len(self.files)
+
+    def __getitem__(self, index):
+        return self.recordings[index]
+
+    def __getstate__(self):
+        # Re-open the memory map instead of pickling its contents
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.path = state['path']
+        self._open()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(path={self.path!r}, n_recordings={len(self)})'
@@ -0,0 +1,174 @@
+import numpy as np, torch
+
+__all__ = ['TorchFSDDStream']
+
+class TorchFSDDStream(torch.utils.data.IterableDataset):
+    """A streaming :class:`torch:torch.utils.data.IterableDataset` of ``(x, y)`` items from a :class:`TorchFSDD` data set.
+
+    Unlike a map-style data set (where the sampler decides the order in which files are read), recordings are read
+    in (approximately) sequential order, which avoids random seeks on network file systems:
+
+    - If ``shuffle`` is `True`, the recordings are split into contiguous blocks of ``block_size`` recordings,
+      and the order of the blocks is shuffled every epoch.
+    - The resulting stream is sharded deterministically across distributed ranks, with each rank receiving every
+      ``world_size``-th recording (so each rank receives the same number of recordings).
+    - Each rank's stream is shuffled locally with a shuffle buffer of ``buffer_size`` recordings.
+    - The rank's stream is then divided between :class:`torch:torch.utils.data.DataLoader` worker processes
+      in round-robin chunks of ``chunk_size`` recordings.
+
+    All shuffling is performed on indices (before any recordings are loaded), and depends only on ``seed``, the epoch and the rank,
+    so the stream of each rank is identical regardless of the number of workers. If ``chunk_size`` is set to the batch size
+    of the :class:`torch:torch.utils.data.DataLoader`, then the order of the items produced by the data loader (which fetches batches
+    from workers in round-robin order) is exactly the rank's stream, so training can be resumed from a checkpointed position.
+
+    .. code-block:: python
+
+        from torch.utils.data import DataLoader
+        from torchfsdd import TorchFSDDGenerator, TorchFSDDStream
+
+        train_set, test_set = TorchFSDDGenerator(version='archive', path='fsdd.bin').train_test_split()
+        stream = TorchFSDDStream(train_set, shuffle=True, seed=0, chunk_size=32)
+        loader = DataLoader(stream, batch_size=32, num_workers=4, collate_fn=collate_padded)
+
+        for epoch in range(n_epochs):
+            stream.set_epoch(epoch)
+            for x, lengths, y, order in loader:
+                ...
+
+    Parameters
+    ----------
+    dataset: :class:`TorchFSDD`
+        The data set to stream items from.
+
+    shuffle: bool
+        Whether or not to shuffle the stream (by blocks, and with a shuffle buffer).
+
+    block_size: int
+        Number of consecutive recordings in each block, when ``shuffle`` is `True`.
+
+    buffer_size: int
+        Size of the shuffle buffer, when ``shuffle`` is `True`.
+
+    seed: int
+        Seed for shuffling.
+
+    rank: int, optional
+        Rank of the current process. Defaults to the rank in the default :py:mod:`torch:torch.distributed` process group
+        if it has been initialized, or otherwise zero.
+
+    world_size: int, optional
+        Number of distributed processes. Defaults to the size of the default :py:mod:`torch:torch.distributed` process group
+        if it has been initialized, or otherwise one.
+
+    chunk_size: int
+        Number of consecutive items of the rank's stream that are assigned to each worker process in turn.
+    """
+    def __init__(self, dataset, shuffle=False, block_size=64, buffer_size=256, seed=0, rank=None, world_size=None, chunk_size=1):
+        super().__init__()
+        assert block_size > 0 and buffer_size > 0 and chunk_size > 0
+
+        distributed = torch.distributed.is_available() and torch.distributed.is_initialized()
+        if world_size is None:
+            world_size = torch.distributed.get_world_size() if distributed else 1
+        if rank is None:
+            rank = torch.distributed.get_rank() if distributed else 0
+        assert 0 <= rank < world_size
+
+        self.dataset = dataset
+        self.shuffle = shuffle
+        self.block_size = block_size
+        self.buffer_size = buffer_size
+        self.seed = seed
+        self.rank = rank
+        self.world_size = world_size
+        self.chunk_size = chunk_size
+        self.epoch = 0
+        self.position = 0
+
+    def set_epoch(self, epoch):
+        """Sets the epoch number, which determines the shuffle order. This should be called before every epoch.
+
+        Changing the epoch resets the position in the stream.
+
+        Parameters
+        ----------
+        epoch: int
+            The epoch number.
+        """
+        if epoch != self.epoch:
+            self.position = 0
+        self.epoch = epoch
+
+    def state_dict(self):
+        """Returns the current epoch and position in the rank's stream, for checkpointing.
+
+        .. note::
+            The position is only tracked automatically when iterating in the main process.
+            When using worker processes, the position should be set to the number of items consumed so far in the epoch.
+
+        Returns
+        -------
+        state: dict
+            The ``epoch`` and ``position``.
+        """
+        return {'epoch': self.epoch, 'position': self.position}
+
+    def load_state_dict(self, state):
+        """Resumes the stream from a checkpointed epoch and position.
+
+        Parameters
+        ----------
+        state: dict
+            The ``epoch`` and ``position`` (the number of items of the rank's stream that were already consumed in the epoch).
+        """
+        self.epoch = state['epoch']
+        self.position = state['position']
+
+    def _rank_indices(self):
+        # Sequential order, or the order of shuffled contiguous blocks
+        indices = np.arange(len(self.dataset))
+        if self.shuffle:
+            rng = np.random.default_rng([self.seed, self.epoch])
+            blocks = [indices[start:start + self.block_size] for start in range(0, len(indices), self.block_size)]
+            indices = np.concatenate([blocks[i] for i in rng.permutation(len(blocks))]) if len(blocks) > 0 else indices
+
+        # Every rank receives the same number of recordings
+        n = len(indices) // self.world_size * self.world_size
+        return indices[self.rank:n:self.world_size]
+
+    def _rank_stream(self):
+        indices = self._rank_indices()
+        if not self.shuffle or self.buffer_size == 1:
+            yield from indices.tolist()
+            return
+
+        rng = np.random.default_rng([self.seed, self.epoch, self.rank, 1])
+        buffer = []
+        for index in indices.tolist():
+            if len(buffer) < self.buffer_size:
+                buffer.append(index)
+                continue
+            i = int(rng.integers(self.buffer_size))
+            yield buffer[i]
+            buffer[i] = index
+        yield from (buffer[i] for i in rng.permutation(len(buffer)))
+
+    def __iter__(self):
+        worker = torch.utils.data.get_worker_info()
+        worker_id, num_workers = (0, 1) if worker is None else (worker.id, worker.num_workers)
+
+        for j, index in enumerate(self._rank_stream()):
+            # Skip already consumed items (without loading them), and items assigned to other workers
+            if j < self.position or (j // self.chunk_size) % num_workers != worker_id:
+                continue
+            item = self.dataset[index]
+            if worker is None:
+                self.position = j + 1
+            yield item
+
+        # A complete pass in the main process starts the next iteration from the beginning
+        if worker is None:
+            self.position = 0
+
+    def __len__(self):
+        return len(self.dataset) // self.world_size
\ No newline at end of file
@@ -0,0 +1,85 @@
+"""Measures the CPU latency and throughput of the DeepGRU digit classifier, per clip and with micro-batching.
+
+Clips are random ``(T, 13)`` feature matrices with lengths in the range of the MFCCs of FSDD recordings,
+so no trained weights or recordings are needed.
+
+Usage::
+
+    python notebooks/bench_inference.py [--n-clips 512] [--clients 1 8 32] [--max-batch-size 32] [--max-latency 0.005]
+                                        [--compile script] [--threads 1]
+"""
+
+import argparse, json, time, threading, numpy as np, torch
+from model import DeepGRU
+from inference import DigitClassifier, MicroBatcher
+
+def summarize(latencies, seconds):
+    latencies = np.asarray(latencies) * 1e3
+    return {
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'clips_per_s': len(latencies) / seconds
+    }
+
+def bench_sequential(classifier, clips):
+    # One clip at a time, as a server without batching would
+    latencies, start = [], time.perf_counter()
+    for clip in clips:
+        t = time.perf_counter()
+        classifier.predict([clip])
+        latencies.append(time.perf_counter() - t)
+    return summarize(latencies, time.perf_counter() - start)
+
+def bench_offline(classifier, clips):
+    start = time.perf_counter()
+    classifier.predict(clips)
+    seconds = time.perf_counter() - start
+    return {'seconds': seconds, 'clips_per_s': len(clips) / seconds}
+
+def bench_micro_batching(classifier, clips, n_clients, max_batch_size, max_latency):
+    # Each client submits its share of the clips one at a time, waiting for each result (a closed-loop load)
+    latencies, lock = [], threading.Lock()
+    def client(shard):
+        for clip in shard:
+            t = time.perf_counter()
+            batcher.submit(clip).result()
+            with lock:
+                latencies.append(time.perf_counter() - t)
+
+    with MicroBatcher(classifier, max_batch_size=max_batch_size, max_latency=max_latency) as batcher:
+        threads = [threading.Thread(target=client, args=(clips[i::n_clients],)) for i in range(n_clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - start
+    return dict(summarize(latencies, seconds), clients=n_clients)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--n-clips', type=int, default=512)
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--max-batch-size', type=int, default=32)
+    parser.add_argument('--max-latency', type=float, default=0.005)
+    parser.add_argument('--compile', choices=['script', 'compile'], default=None)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    torch.manual_seed(args.seed)
+    rng = np.random.default_rng(args.seed)
+    clips = [torch.randn(int(length), 13) for length in rng.integers(10, 80, size=args.n_clips)]
+    classifier = DigitClassifier(DeepGRU(n_features=13, n_classes=10), max_batch_size=args.max_batch_size, compile=args.compile)
+
+    # Warm up (e.g. to compile the model)
+    classifier.predict(clips[:args.max_batch_size])
+
+    results = {
+        'sequential': bench_sequential(classifier, clips),
+        'offline': bench_offline(classifier, clips),
+        'micro_batching': [bench_micro_batching(classifier, clips, n, args.max_batch_size, args.max_latency) for n in args.clients]
+    }
+    print(json.dumps(results, indent=2))
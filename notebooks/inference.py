@@ -0,0 +1,253 @@
+"""Serving utilities for a trained digit classifier (e.g. the DeepGRU model in ``model.py``).
+
+:class:`DigitClassifier` classifies lists of clips with length-aware batching,
+and :class:`MicroBatcher` groups clips submitted concurrently (e.g. by request handler threads) into micro-batches,
+dispatching each batch once it is full or its oldest clip has waited for a maximum latency.
+
+.. code-block:: python
+
+    from model import DeepGRU
+    from inference import DigitClassifier, MicroBatcher
+
+    model = DeepGRU(n_features=13, n_classes=10)
+    model.load_state_dict(torch.load('deepgru.pt'))
+    classifier = DigitClassifier(model, transforms=features, compile='script')
+
+    with MicroBatcher(classifier, max_batch_size=32, max_latency=0.005) as batcher:
+        digit = batcher.submit(audio).result().argmax()
+"""
+
+import time, queue, threading, torch
+from concurrent.futures import Future
+from torch.nn.utils.rnn import pad_sequence
+
+__all__ = ['DigitClassifier', 'MicroBatcher']
+
+# torch.inference_mode was introduced in PyTorch 1.9
+inference_mode = getattr(torch, 'inference_mode', torch.no_grad)
+
+class DigitClassifier:
+    """Classifies variable-length clips with a sequence model that takes a padded ``(B, T_max, D)`` batch and its lengths.
+
+    Clips are sorted by length and split into batches of similar lengths (so that little computation is spent on padding),
+    and the outputs are returned in the original order. The model is run in evaluation mode under
+    :py:func:`torch:torch.inference_mode`, and the caller's tensors are never modified.
+
+    Parameters
+    ----------
+    model: torch.nn.Module
+        The trained model, which is called as ``model(x, lengths)`` and returns a ``(B, n_classes)`` tensor.
+
+    transforms: callable, optional
+        Transformations that convert a clip into a ``(T, D)`` tensor of features (e.g. the MFCC pipeline used in training).
+        If not specified, clips are expected to already be features.
+
+    max_batch_size: int
+        Maximum number of clips in each batch.
+
+    max_padding: float
+        Maximum fraction of padding in each batch, relative to the length of its longest clip.
+        A clip that is shorter than this starts a new batch.
+
+    compile: str, optional
+        How to compile the model: `'script'` for :py:func:`torch:torch.jit.script`, `'compile'` for ``torch.compile``
+        (PyTorch 2.0 or later), or `None` to run the model eagerly.
+
+    device: str or torch.device
+        The device to run the model on.
+    """
+    def __init__(self, model, transforms=None, max_batch_size=32, max_padding=0.25, compile=None, device='cpu'):
+        assert max_batch_size > 0
+        assert 0. <= max_padding <= 1.
+        assert compile in (None, 'script', 'compile')
+        self.device = torch.device(device)
+        self.transforms = transforms
+        self.max_batch_size = max_batch_size
+        self.max_padding = max_padding
+
+        model = model.to(self.device).eval()
+        if compile == 'script':
+            model = torch.jit.script(model)
+        elif compile == 'compile':
+            model = torch.compile(model, dynamic=True)
+        self.model = model
+
+    def features(self, clip):
+        """Converts a clip into features.
+
+        Parameters
+        ----------
+        clip: torch.Tensor
+            The clip.
+
+        Returns
+        -------
+        features: :class:`torch:torch.Tensor`
+            A ``(T, D)`` tensor of features.
+        """
+        with inference_mode():
+            return clip if self.transforms is None else self.transforms(clip)
+
+    def batches(self, lengths):
+        """Splits clips into batches of similar lengths.
+
+        Parameters
+        ----------
+        lengths: list of int
+            The number of frames of each clip.
+
+        Returns
+        -------
+        batches: list of list of int
+            The positions of the clips in each batch, in decreasing order of length.
+        """
+        order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+        batches = []
+        for i in order:
+            if len(batches) > 0:
+                batch = batches[-1]
+                longest = lengths[batch[0]]
+                if len(batch) < self.max_batch_size and longest - lengths[i] <= self.max_padding * longest:
+                    batch.append(i)
+                    continue
+            batches.append([i])
+        return batches
+
+    def predict_features(self, features):
+        """Classifies clips from their features.
+
+        Parameters
+        ----------
+        features: list of torch.Tensor
+            A ``(T, D)`` tensor of features for each clip.
+
+        Returns
+        -------
+        outputs: :class:`torch:torch.Tensor`
+            A ``(N, n_classes)`` tensor of the model outputs (e.g. log probabilities) for each clip, in the original order.
+        """
+        lengths = [len(x) for x in features]
+        outputs = [None] * len(features)
+        with inference_mode():
+            for batch in self.batches(lengths):
+                x = pad_sequence([features[i] for i in batch], batch_first=True).to(self.device)
+                y = self.model(x, torch.tensor([lengths[i] for i in batch], device=self.device)).cpu()
+                for i, row in zip(batch, y):
+                    outputs[i] = row
+        return torch.stack(outputs) if len(outputs) > 0 else torch.zeros(0, 0)
+
+    def predict(self, clips):
+        """Classifies clips.
+
+        Parameters
+        ----------
+        clips: list of torch.Tensor
+            The clips.
+
+        Returns
+        -------
+        outputs: :class:`torch:torch.Tensor`
+            A ``(N, n_classes)`` tensor of the model outputs for each clip, in the original order.
+        """
+        return self.predict_features([self.features(clip) for clip in clips])
+
+class MicroBatcher:
+    """Groups clips submitted concurrently into micro-batches for a :class:`DigitClassifier`.
+
+    Each submitted clip is converted to features in the submitting thread, and queued. A background thread
+    takes the oldest queued clip and collects further clips until either ``max_batch_size`` clips are collected,
+    or ``max_latency`` seconds have passed since the oldest clip was submitted. The collected clips are then
+    classified together, in batches of similar lengths (see :meth:`DigitClassifier.batches`).
+
+    Parameters
+    ----------
+    classifier: :class:`DigitClassifier`
+        The classifier.
+
+    max_batch_size: int
+        Maximum number of clips in each micro-batch.
+
+    max_latency: float
+        Maximum number of seconds that a clip waits for other clips before its micro-batch is dispatched.
+    """
+    def __init__(self, classifier, max_batch_size=32, max_latency=0.005):
+        assert max_batch_size > 0
+        assert max_latency >= 0.
+        self.classifier = classifier
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self._queue = queue.Queue()
+        self._closed = False
+        # Guards closing against concurrent submissions, so that no clip is queued after the sentinel
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='MicroBatcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, clip):
+        """Submits a clip for classification.
+
+        Parameters
+        ----------
+        clip: torch.Tensor
+            The clip.
+
+        Returns
+        -------
+        future: :class:`python:concurrent.futures.Future`
+            A future of the ``(n_classes,)`` model output for the clip.
+        """
+        if self._closed:
+            raise RuntimeError('Cannot submit clips to a closed micro-batcher')
+        future = Future()
+        try:
+            features = self.classifier.features(clip)
+        except Exception as e:
+            future.set_exception(e)
+            return future
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('Cannot submit clips to a closed micro-batcher')
+            self._queue.put((time.monotonic(), features, future))
+        return future
+
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch, deadline = [item], item[0] + self.max_latency
+            while len(batch) < self.max_batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0.))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            # Cancelled clips are not classified
+            pending = [(x, future) for _, x, future in batch if future.set_running_or_notify_cancel()]
+            try:
+                outputs = self.classifier.predict_features([x for x, _ in pending])
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+            else:
+                for (_, future), output in zip(pending, outputs):
+                    future.set_result(output)
+
+    def close(self):
+        """Classifies any queued clips, and stops the background thread."""
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._queue.put(None)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
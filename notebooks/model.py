@@ -1,7 +1,6 @@
 import torch
 from torch import nn
 from torch.nn import functional as F
-from torch.nn.utils.rnn import pack_padded_sequence, pad_packed_sequence
 
 class DeepGRU(nn.Module):
     def __init__(self, n_features, n_classes, dims={'gru1': 512, 'gru2': 256, 'gru3': 128, 'fc': 256}):
@@ -13,8 +12,9 @@ class DeepGRU(nn.Module):
         })
 
     def forward(self, x, x_lengths):
-        h, h_last = self.model['enc'](x, x_lengths)
-        o_attn = self.model['attn'](h, h_last)
+        # Sequences may be in any order, and the input tensors are never modified
+        h, h_last, mask = self.model['enc'](x, x_lengths)
+        o_attn = self.model['attn'](h, h_last, mask)
         return self.model['clf'](o_attn)
 
 class _EncoderNetwork(nn.Module):
@@ -28,18 +28,22 @@ class _EncoderNetwork(nn.Module):
         })
 
     def forward(self, x, x_lengths):
-        # Pack the padded Tensor into a PackedSequence
-        x_packed = pack_padded_sequence(x, x_lengths, batch_first=True)
+        # Pass the padded Tensor through the GRUs (which are unidirectional,
+        # so the outputs at the valid time steps of each sequence do not depend on its padding)
+        h, _ = self.model['gru1'](x)
+        h, _ = self.model['gru2'](h)
+        h, _ = self.model['gru3'](h)
+        # Shape: B x T_max x D_out
 
-        # Pass the PackedSequence through the GRUs
-        h_packed, _ = self.model['gru1'](x_packed)
-        h_packed, _ = self.model['gru2'](h_packed)
-        h_packed, h_last = self.model['gru3'](h_packed)
+        # Mask of the valid time steps of each sequence
+        lengths = x_lengths.to(device=h.device, dtype=torch.long).clamp(min=1)
+        mask = torch.arange(h.shape[1], device=h.device).unsqueeze(0) < lengths.unsqueeze(1)
+        # Shape: B x T_max
 
-        # Unpack the hidden state PackedSequence into a padded Tensor
-        h_padded = pad_packed_sequence(h_packed, batch_first=True, padding_value=0.0, total_length=max(x_lengths))
-        return h_padded[0], h_last
-        # Shape: B x T_max x D_out, 1 x B x D_out
+        # Gather the hidden state of the last valid time step of each sequence, and zero the padding
+        h_last = h.gather(1, (lengths - 1).view(-1, 1, 1).expand(-1, 1, h.shape[2]))
+        return h * mask.unsqueeze(2).to(h.dtype), h_last, mask
+        # Shape: B x T_max x D_out, B x 1 x D_out, B x T_max
 
 class _AttentionModule(nn.Module):
     def __init__(self, dims):
@@ -52,18 +56,14 @@ class _AttentionModule(nn.Module):
         # Auxilliary context
         self.attn_gru = nn.GRU(input_size=self.dims['in'], hidden_size=self.dims['in'])
 
-    def forward(self, h, h_last):
-        h_last.transpose_(1, 0)
-        # Shape: B x 1 x D_out
-
-        # Calculate attentional context
-        h.transpose_(1, 2)
-        c = F.softmax(self.W_c(h_last) @ h, dim=0)
-        c = (c @ h.transpose(2, 1)).transpose(1, 0)
+    def forward(self, h, h_last, mask):
+        # Calculate attentional context over the valid time steps of each sequence
+        scores = (self.W_c(h_last) @ h.transpose(1, 2)).masked_fill(~mask.unsqueeze(1), float('-inf'))
+        c = (F.softmax(scores, dim=2) @ h).transpose(0, 1)
         # Shape: 1 x B x D_out
 
         # Calculate auxilliary context
-        c_aux, _ = self.attn_gru(c, h_last.transpose(1, 0))
+        c_aux, _ = self.attn_gru(c, h_last.transpose(0, 1).contiguous())
         # Shape: 1 x B x D_out
 
         # Combine attentional and auxilliary context
@@ -1,8 +1,7 @@
 #!/usr/bin/env python
 # -*- encoding: utf-8 -*-
 
-import re, platform
-from pkg_resources import packaging
+import re, sys
 from setuptools import setup, find_packages
 from pathlib import Path
 
@@ -18,8 +17,8 @@ with open('README.md', 'r', encoding='utf8') as fh:
     long_description = fh.read()
 
 # Backports for importlib.metadata for Python versions < v3.8
-install_requires = []
-if packaging.version.parse(platform.python_version()) < packaging.version.parse('3.8'):
+install_requires = ['numpy']
+if sys.version_info < (3, 8):
     install_requires.append('importlib_metadata')
 
 setup(